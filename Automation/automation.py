@@ -2,14 +2,19 @@
 Automation utilities for historical backfills and daily realtime updates.
 
 This module orchestrates the existing stage1 → stage4 pipeline and exposes
-two command line entrypoints:
+three command line entrypoints:
 
 - historical: run a full backfill across a range of timeline keys.
 - daily: fetch and process the most recent news for today only.
+- watch: keep polling the newest timeline key and ingest new articles of
+  the day as they are published.
 
 Example:
     python automation.py historical --start-key 500 --end-key 1000
-    python automation.py daily --keys 500 501 502 --symbol ACB
+    python automation.py historical --start-date 2024-01-01 --end-date 2024-01-31
+    python automation.py daily --keys 1 2 3 --symbol ACB
+    python automation.py daily --since 2025-02-22T09:00:00
+    python automation.py watch --interval 60 --symbol ACB
 """
 
 from __future__ import annotations
@@ -19,26 +24,31 @@ import json
 import os
 import pickle
 import time
+from contextlib import nullcontext
 from dataclasses import dataclass
 from datetime import date, datetime
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
-import pandas as pd
-from tqdm import tqdm
-from vnstock3 import Vnstock
+import urllib3
 
+from Automation.dag import TaskGraph
+from Automation.key_index import KeyIndex
+from Automation.ledger import FETCHED, JobLedger, atomic_open
+from Automation.rate_control import AdaptiveRateController
+from stage1 import FetchError
 from stage1 import url_extract as fetch_timeline_page
-from stage2 import process_each_file
+from stage2 import is_likely_relevant, load_stage1_pages, process_each_file
 from stage3 import url_extract as fetch_article_page
-from stage4 import NonmatchException, PostProcessing, pre_processing_page_data
 
-try:
-    import mysql.connector  # type: ignore
-    from mysql.connector.connection import MySQLConnection  # type: ignore
-except ImportError:  # pragma: no cover - optional dependency
-    mysql = None  # type: ignore
-    MySQLConnection = None  # type: ignore
+# stage4 (pandas, numpy), the price store, tqdm and the db layer (mysql) are
+# imported inside the functions that need them: `--help` and the crawl-only
+# steps stay fast.
+# See Automation/import_profile.py for the startup budget.
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    import pandas as pd
+
+    from price_store import PriceStore
 
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -47,6 +57,19 @@ STAGE2_DIR = BASE_DIR / "stage_2_data"
 STAGE3_DIR = BASE_DIR / "stage_3_data"
 STAGE4_DIR = BASE_DIR / "stage_4_data"
 DAILY_DIR = BASE_DIR / "daily_outputs"
+LEDGER_PATH = BASE_DIR / "ledger.sqlite"
+KEY_INDEX_PATH = BASE_DIR / "key_index.sqlite"
+DAG_CACHE_DIR = BASE_DIR / ".dag_cache"
+
+DAILY_KEYS = range(1, 11)
+# columns of a daily record kept when its (symbol, day) row is rewritten
+DAILY_ROW_KEY_COLUMNS = ("symbol", "time", "year", "month", "day", "created_at")
+
+TIMELINE_JOB = "timeline"
+ARTICLE_JOB = "article"
+# stage3.url_extract stores article pages under this prefix + the catalogue link
+ARTICLE_BASE_URL = "https://cafef.vn"
+WATCH_JOB = "watch"
 
 
 def ensure_directories() -> None:
@@ -65,48 +88,213 @@ def ensure_directories() -> None:
 # ---------------------------------------------------------------------------
 
 
-def download_timeline_pages(keys: Iterable[int], delay_seconds: float = 3.0) -> None:
+def _is_readable_pickle(path: Path) -> bool:
+    try:
+        with path.open("rb") as fp:
+            pickle.load(fp)
+    except Exception:
+        return False
+    return True
+
+
+def _timeline_path(key: int, compact: bool) -> Path:
+    return STAGE1_DIR / (f"{key}.jsonl" if compact else f"{key}.pkl")
+
+
+def _has_timeline_page(path: Path) -> bool:
+    return path.exists() if path.suffix == ".jsonl" else _is_readable_pickle(path)
+
+
+def _write_timeline_page(path: Path, page: Dict[str, object]) -> None:
+    """
+    Store a timeline page: compact pages as one link record per JSON line,
+    legacy pages as a pickle of their HTML fragments.
+    """
+    if path.suffix == ".jsonl":
+        with atomic_open(path, "w") as fp:
+            for record in page["records"]:
+                fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+    else:
+        with atomic_open(path, "wb") as fp:
+            pickle.dump(page, fp)
+
+
+def _merge_timeline_pages(path: Path, page: Dict[str, object]) -> Dict[str, object]:
+    """
+    Union of a freshly fetched timeline page with the page stored for the
+    same key. Pages shift as news is published, so a refetch must not drop
+    the items of the earlier fetch.
+    """
+    if not _has_timeline_page(path):
+        return page
+    if path.suffix == ".jsonl":
+        with path.open("r", encoding="utf-8") as fp:
+            records = [json.loads(line) for line in fp if line.strip()]
+        seen = {record["link"] for record in records}
+        records.extend(record for record in page["records"] if record["link"] not in seen)
+        return {**page, "records": records}
+
+    with path.open("rb") as fp:
+        stored = pickle.load(fp)
+    list_tags = list(stored.get("list_tags", []))
+    seen = set(list_tags)
+    list_tags.extend(tag for tag in page["list_tags"] if tag not in seen)
+    return {**page, "list_tags": list_tags}
+
+
+def probe_timeline_key(key: int) -> Optional[List[Dict[str, str]]]:
+    """
+    Fetch a timeline page and return its dated link entries, used by the key
+    index to place a key in time. Nothing is written to `STAGE1_DIR`.
+    """
+    response = fetch_timeline_page(key=key, compact=True)
+    if response is None:
+        return None
+    return process_each_file(response)
+
+
+def resolve_date_range(start_date: date, end_date: date, max_key: int = 1000) -> range:
+    """
+    Timeline keys covering the publish dates [start_date, end_date], looked
+    up in the key index (see Automation/key_index.py).
+    """
+    with KeyIndex(KEY_INDEX_PATH) as index:
+        index.index_pages(STAGE1_DIR)
+        keys = index.covering_keys(start_date, end_date, probe_timeline_key, hi=max_key)
+        print(
+            f"[historical] {start_date} .. {end_date} -> keys {list(keys[:1]) + list(keys[-1:])} "
+            f"({index.probes} pages probed)"
+        )
+    return keys
+
+
+def _tracked_fetch(
+    fetch: Callable[..., Optional[Dict[str, object]]],
+    kind: str,
+    item: object,
+    ledger: JobLedger,
+    controller: AdaptiveRateController,
+    **fetch_kwargs: object,
+) -> Optional[Dict[str, object]]:
+    """
+    Fetch one item paced by the rate controller. Failures are fed back to the
+    controller and recorded in the ledger, and None is returned. Successes are
+    left for the caller to mark once the output is stored.
+    """
+    controller.acquire()
+    started = time.monotonic()
+    try:
+        result = fetch(raise_for_status=True, **fetch_kwargs)
+    except FetchError as exc:
+        controller.record(exc.status, time.monotonic() - started, exc.retry_after)
+        ledger.mark_failed(kind, item, exc.status)
+        print(f"[{kind}] {item} failed: {exc}")
+        return None
+    except urllib3.exceptions.HTTPError as exc:
+        controller.record(None, time.monotonic() - started)
+        ledger.mark_failed(kind, item, None)
+        print(f"[{kind}] {item} failed: {exc}")
+        return None
+
+    controller.record(200, time.monotonic() - started)
+    return result
+
+
+def download_timeline_pages(
+    keys: Iterable[int],
+    delay_seconds: float = 3.0,
+    ledger: Optional[JobLedger] = None,
+    controller: Optional[AdaptiveRateController] = None,
+    refetch: bool = False,
+    compact: bool = False,
+) -> None:
     """
     Download timeline pages (stage 1) for the provided keys.
 
+    Progress is tracked per key in the job ledger, so a restarted run skips
+    the keys already fetched and only retries keys that failed transiently.
+    Pages fetched in compact mode are also recorded in the key index.
+
     Args:
         keys: Iterable of integer keys to fetch from Cafef timeline endpoint.
-        delay_seconds: Optional delay between requests to avoid overwhelming the server.
+        delay_seconds: Initial delay between requests; the rate controller
+            adapts it to how the server responds.
+        ledger: Job ledger to record progress in. Defaults to `LEDGER_PATH`.
+        controller: Rate controller, shared with the article fetcher when
+            running the full pipeline.
+        refetch: Fetch keys again even if the ledger has them, merging the
+            new items into the stored page. Used by date-range backfills,
+            since the content of a key drifts over time.
+        compact: Store each page as link records (`{key}.jsonl`) extracted
+            while parsing it, instead of pickled HTML fragments that stage 2
+            would parse again.
     """
     ensure_directories()
-    for key in keys:
-        output_path = STAGE1_DIR / f"{key}.pkl"
-        if output_path.exists():
-            continue
-
-        response_dict = fetch_timeline_page(key=key)
-        if response_dict is None:
-            continue
+    controller = controller or AdaptiveRateController(
+        initial_rate=1.0 / delay_seconds, name="stage1"
+    )
+    with (JobLedger(LEDGER_PATH) if ledger is None else nullcontext(ledger)) as ledger, \
+            KeyIndex(KEY_INDEX_PATH) as key_index:
+        for key in keys:
+            output_path = _timeline_path(key, compact)
+            if not refetch:
+                if not ledger.should_fetch(TIMELINE_JOB, key):
+                    continue
+
+                # adopt complete outputs written before the ledger existed
+                if ledger.get(TIMELINE_JOB, key) is None and _has_timeline_page(output_path):
+                    ledger.mark_fetched(TIMELINE_JOB, key)
+                    continue
+
+            response_dict = _tracked_fetch(
+                fetch_timeline_page, TIMELINE_JOB, key, ledger, controller,
+                key=key, compact=compact,
+            )
+            if response_dict is None:
+                continue
 
-        with output_path.open("wb") as fp:
-            pickle.dump(response_dict, fp)
+            # compact pages carry their records already; legacy pages are
+            # indexed later by `KeyIndex.index_pages` instead of parsed twice
+            if "records" in response_dict:
+                key_index.record(key, response_dict["records"])
 
-        time.sleep(delay_seconds)
+            if refetch:
+                response_dict = _merge_timeline_pages(output_path, response_dict)
+            _write_timeline_page(output_path, response_dict)
+            ledger.mark_fetched(TIMELINE_JOB, key)
 
 
-def build_link_catalogue() -> Path:
+def build_link_catalogue(relevant_only: bool = False) -> Path:
     """
-    Process downloaded timeline pickles (stage 2) and produce a JSON file containing
-    all article links.
+    Process downloaded timeline pages (stage 2) and produce a JSON file containing
+    all article links with their timeline snippet (title, sapo, published_at).
+    Compact pages already hold their link records; legacy pickles are parsed.
+
+    Args:
+        relevant_only: Keep only links whose snippet passes the relevance
+            prefilter, so stage 3 does not download articles that stage 4
+            would discard anyway.
 
     Returns:
         Path to the generated JSON catalogue.
     """
     ensure_directories()
     catalogue: List[Dict[str, str]] = []
-    for pickle_file in sorted(STAGE1_DIR.glob("*.pkl")):
-        with pickle_file.open("rb") as fp:
-            data = pickle.load(fp)
+    skipped = 0
+    for data in load_stage1_pages(str(STAGE1_DIR)):
         try:
-            catalogue.extend(process_each_file(data))
+            entries = process_each_file(data)
         except Exception as exc:
-            print(f"[stage2] Failed to parse {pickle_file.name}: {exc}")
+            print(f"[stage2] Failed to parse key {data['key']}: {exc}")
             continue
+        if relevant_only:
+            kept = [entry for entry in entries if is_likely_relevant(entry)]
+            skipped += len(entries) - len(kept)
+            entries = kept
+        catalogue.extend(entries)
+
+    if relevant_only:
+        print(f"[stage2] prefilter kept {len(catalogue)} links, skipped {skipped}")
 
     output_path = STAGE2_DIR / "links.json"
     with output_path.open("w", encoding="utf-8") as fp:
@@ -115,15 +303,82 @@ def build_link_catalogue() -> Path:
     return output_path
 
 
-def download_article_pages(step: int = 1000, delay_seconds: float = 1.5) -> None:
+def _read_spool(spool_path: Path) -> List[Dict[str, str]]:
+    """
+    Load the pages fetched for a batch before an interruption. A torn last
+    line (crash mid-write) is dropped; that URL is simply fetched again.
+    """
+    if not spool_path.exists():
+        return []
+
+    pages: Dict[str, Dict[str, str]] = {}
+    with spool_path.open("r", encoding="utf-8") as fp:
+        for line in fp:
+            try:
+                page = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            pages[page["url"]] = page
+    return list(pages.values())
+
+
+def _drop_torn_tail(spool_path: Path) -> None:
+    """
+    Cut a torn last line so the next page appended to the spool starts on
+    its own line instead of being dropped with it.
+    """
+    if not spool_path.exists():
+        return
+    with spool_path.open("rb+") as fp:
+        data = fp.read()
+        if data and not data.endswith(b"\n"):
+            fp.truncate(data.rfind(b"\n") + 1)
+
+
+def _needs_article(ledger: JobLedger, link: str, spooled: Set[str]) -> bool:
+    """
+    True while the batch being built still lacks the page of `link`.
+
+    The ledger is keyed by URL, so a link that is also listed in an earlier
+    batch is already marked fetched; it is fetched again for this batch
+    unless its page is in the batch spool. Links that failed permanently or
+    ran out of retries are left out.
+    """
+    if ARTICLE_BASE_URL + link in spooled:
+        return False
+    if ledger.should_fetch(ARTICLE_JOB, link):
+        return True
+    entry = ledger.get(ARTICLE_JOB, link)
+    return entry is not None and entry["state"] == FETCHED
+
+
+def download_article_pages(
+    step: int = 1000,
+    delay_seconds: float = 1.5,
+    ledger: Optional[JobLedger] = None,
+    controller: Optional[AdaptiveRateController] = None,
+) -> None:
     """
     Download article detail pages (stage 3) in batches.
 
+    Each fetched page is appended to a per-batch spool file and recorded in
+    the job ledger. The batch file is written atomically once every link in
+    the batch is settled (in the spool, permanently failed or out of
+    retries), so an existing batch file is always complete. A link listed in
+    several batches is fetched once per batch.
+
     Args:
         step: Number of links per batch file.
-        delay_seconds: Optional delay between requests.
+        delay_seconds: Initial delay between requests; the rate controller
+            adapts it to how the server responds.
+        ledger: Job ledger to record progress in. Defaults to `LEDGER_PATH`.
+        controller: Rate controller, shared with the timeline fetcher when
+            running the full pipeline.
     """
     ensure_directories()
+    controller = controller or AdaptiveRateController(
+        initial_rate=1.0 / delay_seconds, name="stage3"
+    )
     links_path = STAGE2_DIR / "links.json"
     if not links_path.exists():
         raise FileNotFoundError(
@@ -134,29 +389,66 @@ def download_article_pages(step: int = 1000, delay_seconds: float = 1.5) -> None
         links = json.load(fp)
 
     total_links = len(links)
-    for start in range(0, total_links, step):
-        output_path = STAGE3_DIR / f"page_data_{start}.json"
-        if output_path.exists():
-            continue
-
-        end = min(start + step, total_links)
-        batch_links = links[start:end]
+    with (JobLedger(LEDGER_PATH) if ledger is None else nullcontext(ledger)) as ledger:
+        for start in range(0, total_links, step):
+            output_path = STAGE3_DIR / f"page_data_{start}.json"
+            if output_path.exists():
+                continue
 
-        batch_payload: List[Dict[str, str]] = []
-        for entry in batch_links:
-            result = fetch_article_page(url=entry["link"], key=entry["key"])
-            if result is not None:
-                batch_payload.append(result)
-            time.sleep(delay_seconds)
+            end = min(start + step, total_links)
+            batch_links = links[start:end]
+
+            spool_path = STAGE3_DIR / f".page_data_{start}.spool.jsonl"
+            spooled = {page["url"] for page in _read_spool(spool_path)}
+            _drop_torn_tail(spool_path)
+            with spool_path.open("a", encoding="utf-8") as spool:
+                for entry in batch_links:
+                    if not _needs_article(ledger, entry["link"], spooled):
+                        continue
+
+                    result = _tracked_fetch(
+                        fetch_article_page,
+                        ARTICLE_JOB,
+                        entry["link"],
+                        ledger,
+                        controller,
+                        url=entry["link"],
+                        key=entry["key"],
+                    )
+                    if result is None:
+                        continue
+
+                    spool.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    spool.flush()
+                    os.fsync(spool.fileno())
+                    spooled.add(result["url"])
+                    ledger.mark_fetched(ARTICLE_JOB, entry["link"])
+
+            unsettled = [
+                entry for entry in batch_links
+                if _needs_article(ledger, entry["link"], spooled)
+            ]
+            if unsettled:
+                print(
+                    f"[stage3] batch {start}: {len(unsettled)} links left for retry, "
+                    "batch file not written yet"
+                )
+                continue
 
-        with output_path.open("w", encoding="utf-8") as fp:
-            json.dump(batch_payload, fp, indent=4, ensure_ascii=False)
+            batch_payload = _read_spool(spool_path)
+            with atomic_open(output_path, "w") as fp:
+                json.dump(batch_payload, fp, indent=4, ensure_ascii=False)
+            spool_path.unlink()
 
 
 def preprocess_articles() -> None:
     """
     Stage 4 preprocessing: transform raw article HTML into structured corpus files.
     """
+    from tqdm import tqdm
+
+    from stage4 import NonmatchException, pre_processing_page_data
+
     ensure_directories()
     for json_file in sorted(STAGE3_DIR.glob("page_data_*.json")):
         output_path = STAGE4_DIR / json_file.name
@@ -179,11 +471,19 @@ def preprocess_articles() -> None:
             except (IndexError, NonmatchException) as exc:
                 continue
 
-        with output_path.open("w", encoding="utf-8") as fp:
+        with atomic_open(output_path, "w") as fp:
             json.dump(processed_items, fp, indent=4, ensure_ascii=False)
 
 
-def run_historical_pipeline(start_key: int, end_key: int, step: int = 1000) -> Path:
+def run_historical_pipeline(
+    start_key: int,
+    end_key: int,
+    step: int = 1000,
+    symbols: Sequence[str] = ("ACB",),
+    relevant_only: bool = False,
+    refetch: bool = False,
+    compact: bool = False,
+) -> Path:
     """
     End-to-end historical pipeline covering stage1 → stage4 alignment.
 
@@ -191,23 +491,45 @@ def run_historical_pipeline(start_key: int, end_key: int, step: int = 1000) -> P
         start_key: First key (inclusive) for timeline crawling.
         end_key: Last key (exclusive) for timeline crawling.
         step: Batch size for stage 3 downloads.
+        symbols: Tickers whose price history is aligned with the news.
+        relevant_only: Only download articles whose timeline snippet passes
+            the relevance prefilter.
+        refetch: Fetch the timeline keys again even if already fetched.
+        compact: Store timeline pages as link records instead of HTML pickles.
 
     Returns:
-        Path to the generated CSV file.
+        Path to the generated Parquet dataset (partitioned by symbol/year).
     """
+    from dedup import run_dedup
+    from stage4 import PostProcessing, write_dataset
+
     key_range = range(start_key, end_key)
-    download_timeline_pages(key_range)
-    build_link_catalogue()
-    download_article_pages(step=step)
+    controller = AdaptiveRateController(name="crawl")
+    with JobLedger(LEDGER_PATH) as ledger:
+        download_timeline_pages(
+            key_range, ledger=ledger, controller=controller, refetch=refetch, compact=compact
+        )
+        build_link_catalogue(relevant_only=relevant_only)
+        download_article_pages(step=step, ledger=ledger, controller=controller)
+        for kind in (TIMELINE_JOB, ARTICLE_JOB):
+            print(f"[historical] ledger {kind}: {ledger.summary(kind)}")
     preprocess_articles()
+    run_dedup(
+        pattern=str(STAGE4_DIR / "page_data_*.json"),
+        output_path=str(STAGE4_DIR / "duplicates.json"),
+    )
 
-    engine = PostProcessing()
-    aligned_df = engine.align()
+    engine = PostProcessing(
+        symbol=symbols[0],
+        data_dir=str(STAGE4_DIR),
+        duplicates_path=str(STAGE4_DIR / "duplicates.json"),
+    )
+    aligned_df = engine.align_many(list(symbols))
 
-    csv_path = STAGE4_DIR / "total.csv"
-    aligned_df.to_csv(csv_path, index=False)
+    dataset_path = STAGE4_DIR / "dataset"
+    write_dataset(aligned_df, str(dataset_path))
 
-    return csv_path
+    return dataset_path
 
 
 # ---------------------------------------------------------------------------
@@ -223,29 +545,70 @@ class DailyResult:
     output_path: Path
 
 
-def fetch_daily_news(keys: Sequence[int]) -> List[Dict[str, str]]:
+def _published_at(entry: Dict[str, str]) -> Optional[datetime]:
+    value = entry.get("published_at")
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def fetch_daily_news(
+    keys: Sequence[int],
+    relevant_only: bool = False,
+    since: Optional[datetime] = None,
+) -> List[Dict[str, str]]:
     """
     Retrieve and preprocess news articles for the provided timeline keys.
     Only articles that pass the keyword filter inside `pre_processing_page_data`
     are returned.
+
+    Timeline keys are visited newest-first (the lowest key holds the latest
+    news). Articles whose timeline timestamp is older than the cutoff (the
+    start of today, or `since` when it is later) are not downloaded, and the
+    crawl stops at the first page whose items are all older than the cutoff.
+    Items without a timestamp are downloaded and checked on their page date.
+
+    Args:
+        keys: Timeline keys to inspect.
+        relevant_only: Skip downloading articles whose timeline snippet does
+            not pass the relevance prefilter.
+        since: Only consider articles published after this time, e.g. the
+            previous intraday run.
     """
+    from stage4 import NonmatchException, pre_processing_page_data
+
     ensure_directories()
     today = date.today()
+    cutoff = datetime.combine(today, datetime.min.time())
+    if since is not None and since > cutoff:
+        cutoff = since
     filtered_articles: List[Dict[str, str]] = []
+    downloaded = skipped = 0
 
-    for key in keys:
-        response = fetch_timeline_page(key=key)
+    for key in sorted(keys):
+        response = fetch_timeline_page(key=key, compact=True)
         if response is None:
             continue
 
         try:
-            link_entries = process_each_file(response)
+            link_entries = process_each_file(response, relevant_only=relevant_only)
         except Exception as exc:
             print(f"[daily] failed to extract links for key={key}: {exc}")
             continue
 
-        for entry in link_entries:
+        timestamps = [_published_at(entry) for entry in link_entries]
+        for entry, published_at in zip(link_entries, timestamps):
+            if published_at is not None and (
+                published_at < cutoff or published_at.date() != today
+            ):
+                skipped += 1
+                continue
+
             article = fetch_article_page(url=entry["link"], key=entry["key"])
+            downloaded += 1
             if article is None:
                 continue
 
@@ -262,21 +625,38 @@ def fetch_daily_news(keys: Sequence[int]) -> List[Dict[str, str]]:
             if article_date == today:
                 filtered_articles.append(processed)
 
+        known = [published_at for published_at in timestamps if published_at is not None]
+        if known and max(known) < cutoff:
+            print(f"[daily] key={key} is older than {cutoff.isoformat()}, stopping")
+            break
+
+    print(f"[daily] downloaded {downloaded} articles, skipped {skipped} by timestamp")
     return filtered_articles
 
 
-def fetch_daily_price(symbol: str) -> Optional[pd.Series]:
+def _load_previous_news(output_path: Path) -> List[Dict[str, str]]:
+    """
+    News already collected by an earlier run of the day, if any.
+    """
+    if not output_path.exists():
+        return []
+    with output_path.open("r", encoding="utf-8") as fp:
+        return json.load(fp).get("news_events") or []
+
+
+def fetch_daily_price(symbol: str, price_store: Optional[PriceStore] = None) -> Optional[pd.Series]:
     """
-    Fetch today's price row for the given stock symbol using vnstock3.
+    Fetch today's price row for the given stock symbol through the local
+    price cache, which only requests the days missing since the last run.
     Returns None if market data is unavailable.
     """
+    import pandas as pd
+
+    from price_store import PriceStore
+
     today_str = str(date.today())
-    stocks = Vnstock().stock(symbol=symbol, source="TCBS")
-    history = stocks.quote.history(
-        start=today_str,
-        end=today_str,
-        interval="1D",
-    )
+    store = price_store or PriceStore()
+    history = store.load(symbol, start=today_str, end=today_str)
     history = history.sort_values(by="time")
 
     if history.empty:
@@ -294,6 +674,8 @@ def compose_daily_record(
     Build a single-row payload matching the structure expected by the training CSV.
     Returns None when price data is unavailable.
     """
+    import pandas as pd
+
     if price_row is None:
         return None
 
@@ -328,6 +710,13 @@ def compose_daily_record(
     return record
 
 
+def _insert_sql(record: Dict[str, object], table: str) -> str:
+    columns = list(record.keys())
+    placeholders = ", ".join(["%s"] * len(columns))
+    column_clause = ", ".join(f"`{col}`" for col in columns)
+    return f"INSERT INTO {table} ({column_clause}) VALUES ({placeholders})"
+
+
 def insert_daily_row(
     record: Dict[str, object],
     table: str,
@@ -336,28 +725,174 @@ def insert_daily_row(
     """
     Insert the composed daily record into a MySQL table.
     """
-    if mysql is None or MySQLConnection is None:  # pragma: no cover - optional dependency
-        raise ImportError(
-            "mysql-connector-python is required for database inserts. "
-            "Install it or remove the database options."
-        )
+    from Automation.db import get_database
 
-    connection: Optional[MySQLConnection] = None
-    try:
-        connection = mysql.connector.connect(**db_config)  # type: ignore[arg-type]
-        cursor = connection.cursor()
+    get_database(db_config).execute("insert_daily_row", _insert_sql(record, table), list(record.values()))
 
-        columns = list(record.keys())
-        placeholders = ", ".join(["%s"] * len(columns))
-        column_clause = ", ".join(f"`{col}`" for col in columns)
-        sql = f"INSERT INTO {table} ({column_clause}) VALUES ({placeholders})"
 
-        values = [record[col] for col in columns]
-        cursor.execute(sql, values)
-        connection.commit()
-    finally:
-        if connection is not None:
-            connection.close()
+def upsert_daily_row(
+    record: Dict[str, object],
+    table: str,
+    db_config: Dict[str, object],
+    update_columns: Sequence[str],
+) -> str:
+    """
+    Write the day's row of the record's symbol: update `update_columns` of
+    the existing row, or insert the record when the day has no row yet.
+    The existence check and the write run in one transaction, so reruns
+    never add a second row for the same (symbol, day).
+
+    Returns:
+        "updated" or "inserted".
+    """
+    from datetime import timedelta
+
+    from Automation.db import get_database
+
+    day = date(int(record["year"]), int(record["month"]), int(record["day"]))
+    # a range on `time` (not DATE(time)) can use the (symbol, time) index
+    where = "symbol = %s AND time >= %s AND time < %s"
+    day_key = (record["symbol"], day, day + timedelta(days=1))
+    assignments = ", ".join(f"`{col}` = %s" for col in update_columns)
+
+    def write(conn) -> str:
+        cursor = conn.cursor(prepared=True)
+        try:
+            # counted explicitly: UPDATE's rowcount only counts changed rows
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where} FOR UPDATE", day_key)
+            exists = cursor.fetchone()[0] > 0
+            if exists:
+                cursor.execute(
+                    f"UPDATE {table} SET {assignments} WHERE {where}",
+                    tuple(record[col] for col in update_columns) + day_key,
+                )
+            else:
+                cursor.execute(_insert_sql(record, table), tuple(record.values()))
+            conn.commit()
+            return "updated" if exists else "inserted"
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    # safe to retry after a lost connection: the check runs again
+    return get_database(db_config).run("upsert_daily_row", write, rows=lambda _: 1, idempotent=True)
+
+
+def _daily_news_task(
+    keys: Sequence[int],
+    relevant_only: bool,
+    since: Optional[datetime],
+    output_path: Path,
+) -> List[Dict[str, str]]:
+    news_events = fetch_daily_news(keys, relevant_only=relevant_only, since=since)
+    if since is not None:
+        fresh_urls = {article["url"] for article in news_events}
+        news_events = [
+            article for article in _load_previous_news(output_path)
+            if article["url"] not in fresh_urls
+        ] + news_events
+    return news_events
+
+
+def _statement_task(
+    table: str,
+    tickers: Sequence[str],
+    db_config: Optional[Dict[str, object]],
+    workers: int,
+) -> str:
+    from etl_finance_data.crawl_all import crawl_all
+
+    return str(crawl_all(list(tickers), tables=[table], workers=workers, db_config=db_config))
+
+
+def _forecast_task(upsert: object, model_path: Path, db_config: Dict[str, object]) -> object:
+    from Automation.forecast_daily import DEFAULT_SEQUENCE_LENGTH, run_forecast
+
+    args = argparse.Namespace(
+        db_host=db_config.get("host"),
+        db_port=db_config.get("port"),
+        db_user=db_config.get("user"),
+        db_password=db_config.get("password"),
+        db_name=db_config.get("database"),
+        model_path=model_path,
+        sequence_length=DEFAULT_SEQUENCE_LENGTH,
+        device="auto",
+    )
+    return run_forecast(args)
+
+
+def build_daily_graph(
+    keys: Sequence[int],
+    symbol: str = "ACB",
+    *,
+    db_config: Optional[Dict[str, object]] = None,
+    relevant_only: bool = False,
+    since: Optional[datetime] = None,
+    statements: bool = False,
+    forecast_model: Optional[Path] = None,
+) -> Tuple[TaskGraph, Path]:
+    """
+    Task graph of the daily run (see Automation/dag.py):
+
+        news ─┐
+              ├─ record ─ upsert ─ forecast
+        price ┘
+
+    plus, with `statements`, one crawler task per financial statement
+    table, running alongside and writing to the same `db_config`. No task
+    is cached: the writes are idempotent by themselves, `upsert` keeps one
+    row per (symbol, day) and `forecast` one prediction per reference day,
+    so reruns refresh them with the current price instead of adding rows.
+    """
+    from etl_finance_data.crawl_all import REPORT_TABLES
+
+    output_path = DAILY_DIR / f"{date.today().isoformat()}.json"
+    graph = TaskGraph(cache_dir=DAG_CACHE_DIR)
+    graph.add(
+        "news",
+        _daily_news_task,
+        params={"keys": list(keys), "relevant_only": relevant_only, "since": since, "output_path": output_path},
+    )
+    graph.add("price", fetch_daily_price, params={"symbol": symbol})
+    graph.add(
+        "record",
+        lambda news, price, symbol: compose_daily_record(symbol=symbol, price_row=price, news_events=news),
+        inputs=("news", "price"),
+        params={"symbol": symbol},
+    )
+    if db_config:
+        graph.add(
+            "upsert",
+            lambda record, db_config: (
+                upsert_daily_row(
+                    record,
+                    "fact_price_stock",
+                    db_config,
+                    update_columns=[col for col in record if col not in DAILY_ROW_KEY_COLUMNS],
+                )
+                if record is not None else None
+            ),
+            inputs=("record",),
+            params={"db_config": db_config},
+        )
+        if forecast_model is not None:
+            graph.add(
+                "forecast",
+                _forecast_task,
+                inputs=("upsert",),
+                params={"model_path": forecast_model, "db_config": db_config},
+            )
+    if statements:
+        for table in REPORT_TABLES:
+            graph.add(
+                f"statements:{table}",
+                _statement_task,
+                # one ticker per table: more workers would only sit idle
+                params={"table": table, "tickers": [symbol], "db_config": db_config, "workers": 1},
+            )
+    return graph, output_path
 
 
 def run_daily_pipeline(
@@ -365,21 +900,37 @@ def run_daily_pipeline(
     symbol: str = "ACB",
     *,
     db_config: Optional[Dict[str, object]] = None,
+    relevant_only: bool = False,
+    since: Optional[datetime] = None,
+    statements: bool = False,
+    forecast_model: Optional[Path] = None,
 ) -> DailyResult:
     """
     Execute the realtime pipeline: fetch today's news and price, then persist
     the results to `daily_outputs`.
+
+    With `since`, only articles published after it are fetched and they are
+    merged with the news already saved by the earlier runs of the day.
+    Independent steps run concurrently, see `build_daily_graph`.
     """
     ensure_directories()
-    today_str = date.today().isoformat()
-    output_path = DAILY_DIR / f"{today_str}.json"
-
-    news_events = fetch_daily_news(keys)
-    price_row = fetch_daily_price(symbol=symbol)
-    record = compose_daily_record(symbol=symbol, price_row=price_row, news_events=news_events)
+    graph, output_path = build_daily_graph(
+        keys,
+        symbol,
+        db_config=db_config,
+        relevant_only=relevant_only,
+        since=since,
+        statements=statements,
+        forecast_model=forecast_model,
+    )
+    try:
+        outputs = graph.run()
+    finally:
+        print(f"[daily] steps:\n{graph.summary()}")
 
-    if db_config and record is not None:
-        insert_daily_row(record, "fact_price_stock", db_config)
+    news_events = outputs["news"]
+    price_row = outputs["price"]
+    record = outputs["record"]
 
     payload = {
         "symbol": symbol,
@@ -401,11 +952,207 @@ def run_daily_pipeline(
     )
 
 
+# ---------------------------------------------------------------------------
+# Continuous watch mode
+# ---------------------------------------------------------------------------
+
+
+def poll_new_articles(
+    ledger: JobLedger,
+    max_keys: int = 3,
+    relevant_only: bool = False,
+) -> Tuple[List[Dict[str, str]], List[str]]:
+    """
+    Fetch the articles of today that were not seen by an earlier poll.
+
+    The newest timeline key is read first; older keys are only read while
+    every item of the previous page was new (the poll fell behind). Seen
+    article URLs are kept in the job ledger, so a restarted watcher does not
+    fetch them again; failed fetches are retried on the next poll.
+
+    Args:
+        ledger: Job ledger holding the seen URLs (kind `WATCH_JOB`).
+        max_keys: Timeline keys read at most per poll.
+        relevant_only: Skip articles whose timeline snippet does not pass
+            the relevance prefilter.
+
+    Returns:
+        The new articles of today, and the links fetched by this poll. The
+        caller marks the links in the ledger once the articles are stored.
+    """
+    from stage4 import NonmatchException, pre_processing_page_data
+
+    today = date.today()
+    start_of_day = datetime.combine(today, datetime.min.time())
+    new_articles: List[Dict[str, str]] = []
+    fetched_links: List[str] = []
+
+    for key in range(1, max_keys + 1):
+        try:
+            response = fetch_timeline_page(key=key, compact=True)
+        except urllib3.exceptions.HTTPError as exc:
+            print(f"[watch] timeline key {key} failed: {exc}")
+            break
+        if response is None:
+            break
+
+        entries = process_each_file(response, relevant_only=relevant_only)
+        fresh = [entry for entry in entries if ledger.should_fetch(WATCH_JOB, entry["link"])]
+        for entry in fresh:
+            published_at = _published_at(entry)
+            if published_at is not None and published_at < start_of_day:
+                ledger.mark_fetched(WATCH_JOB, entry["link"])
+                continue
+
+            try:
+                article = fetch_article_page(url=entry["link"], key=entry["key"], raise_for_status=True)
+            except FetchError as exc:
+                ledger.mark_failed(WATCH_JOB, entry["link"], exc.status)
+                continue
+            except urllib3.exceptions.HTTPError as exc:
+                print(f"[watch] {entry['link']} failed: {exc}")
+                ledger.mark_failed(WATCH_JOB, entry["link"], None)
+                continue
+            fetched_links.append(entry["link"])
+
+            try:
+                processed = pre_processing_page_data(
+                    page_data=article["page_data"], url=article["url"]
+                )
+            except (IndexError, NonmatchException):
+                continue
+
+            if date(processed["year"], processed["month"], processed["day"]) == today:
+                new_articles.append(processed)
+
+        timestamps = [_published_at(entry) for entry in entries]
+        reached_yesterday = any(
+            published_at is not None and published_at < start_of_day for published_at in timestamps
+        )
+        if len(fresh) < len(entries) or reached_yesterday:
+            break
+
+    return new_articles, fetched_links
+
+
+def update_daily_news(
+    record: Dict[str, object],
+    table: str,
+    db_config: Dict[str, object],
+) -> None:
+    """
+    Refresh `merge_corpus` and `news_count` of the day's row in place, and
+    insert the row when it does not exist yet.
+    """
+    upsert_daily_row(record, table, db_config, update_columns=("merge_corpus", "news_count"))
+
+
+def append_daily_news(
+    articles: List[Dict[str, str]],
+    symbol: str = "ACB",
+    db_config: Optional[Dict[str, object]] = None,
+) -> DailyResult:
+    """
+    Merge new articles into the day's `daily_outputs` record and database row.
+    """
+    ensure_directories()
+    output_path = DAILY_DIR / f"{date.today().isoformat()}.json"
+    new_urls = {article["url"] for article in articles}
+    news_events = [
+        article for article in _load_previous_news(output_path)
+        if article["url"] not in new_urls
+    ] + articles
+
+    price_row = fetch_daily_price(symbol=symbol)
+    record = compose_daily_record(symbol=symbol, price_row=price_row, news_events=news_events)
+
+    payload = {
+        "symbol": symbol,
+        "generated_at": datetime.utcnow().isoformat(),
+        "news_events": news_events,
+        "price": price_row.to_dict() if price_row is not None else None,
+        "record": record,
+    }
+    with atomic_open(output_path, "w") as fp:
+        json.dump(payload, fp, indent=4, ensure_ascii=False, default=str)
+
+    # the articles are stored in the JSON above; the next append re-sends the
+    # whole day to the database, so a failed write is caught up then
+    if db_config and record is not None:
+        try:
+            update_daily_news(record, "fact_price_stock", db_config)
+        except Exception as exc:
+            print(f"[watch] daily row not written: {type(exc).__name__}: {exc}")
+
+    return DailyResult(
+        symbol=symbol,
+        news_events=news_events,
+        price_row=price_row,
+        record=record,
+        output_path=output_path,
+    )
+
+
+def run_watch(
+    symbol: str = "ACB",
+    interval: float = 60.0,
+    max_keys: int = 3,
+    db_config: Optional[Dict[str, object]] = None,
+    relevant_only: bool = False,
+    iterations: Optional[int] = None,
+) -> None:
+    """
+    Poll the newest timeline key every `interval` seconds and ingest the new
+    articles of the day as they are published.
+
+    Args:
+        symbol: Ticker whose daily record is updated.
+        interval: Seconds between polls.
+        max_keys: Timeline keys read at most per poll.
+        db_config: MySQL settings; without them only `daily_outputs` is updated.
+        relevant_only: Skip articles whose snippet fails the relevance prefilter.
+        iterations: Stop after this many polls (runs until interrupted if None).
+    """
+    polls = 0
+    with JobLedger(LEDGER_PATH) as ledger:
+        try:
+            while iterations is None or polls < iterations:
+                started = time.monotonic()
+                try:
+                    articles, links = poll_new_articles(ledger, max_keys=max_keys, relevant_only=relevant_only)
+                except urllib3.exceptions.HTTPError as exc:
+                    print(f"[watch] poll failed: {exc}")
+                    articles, links = [], []
+
+                if articles:
+                    result = append_daily_news(articles, symbol=symbol, db_config=db_config)
+                    print(
+                        f"[watch] +{len(articles)} articles, "
+                        f"{len(result.news_events)} today, saved to {result.output_path}"
+                    )
+                # only now that the articles are saved
+                for link in links:
+                    ledger.mark_fetched(WATCH_JOB, link)
+                polls += 1
+                if iterations is None or polls < iterations:
+                    time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            print(f"[watch] stopped after {polls} polls")
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
 
+def _add_db_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--db-host", type=str, help="MySQL host.")
+    parser.add_argument("--db-port", type=int, default=3306, help="MySQL port.")
+    parser.add_argument("--db-user", type=str, help="MySQL user.")
+    parser.add_argument("--db-password", type=str, help="MySQL password.")
+    parser.add_argument("--db-name", type=str, help="MySQL database name.")
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Automation helpers for Cafef stock/news pipeline."
@@ -413,26 +1160,101 @@ def parse_args() -> argparse.Namespace:
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     hist_parser = subparsers.add_parser("historical", help="Run full historical scrape")
-    hist_parser.add_argument("--start-key", type=int, required=True)
-    hist_parser.add_argument("--end-key", type=int, required=True)
+    hist_parser.add_argument("--start-key", type=int)
+    hist_parser.add_argument("--end-key", type=int)
+    hist_parser.add_argument(
+        "--start-date",
+        type=date.fromisoformat,
+        help="Backfill news published from this date (instead of a key range).",
+    )
+    hist_parser.add_argument(
+        "--end-date",
+        type=date.fromisoformat,
+        help="Backfill news published until this date (inclusive).",
+    )
+    hist_parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Store timeline pages as link records (JSONL) instead of HTML pickles.",
+    )
+    hist_parser.add_argument(
+        "--max-key",
+        type=int,
+        default=1000,
+        help="Oldest timeline key searched when resolving a date range.",
+    )
     hist_parser.add_argument("--batch-size", type=int, default=1000)
+    hist_parser.add_argument(
+        "--symbols",
+        nargs="+",
+        type=str,
+        default=["ACB"],
+        help="Tickers to align with the news corpus.",
+    )
+    hist_parser.add_argument(
+        "--relevant-only",
+        action="store_true",
+        help="Only download articles whose timeline snippet looks relevant.",
+    )
 
     daily_parser = subparsers.add_parser("daily", help="Run daily realtime crawl")
     daily_parser.add_argument(
         "--keys",
         nargs="+",
         type=int,
-        required=True,
-        help="Timeline keys to inspect for today's news.",
+        default=list(DAILY_KEYS),
+        help="Timeline keys to inspect for today's news, visited newest (lowest) "
+        "first until the crawl passes the start of the day.",
+    )
+    daily_parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="Only fetch articles published after this ISO timestamp "
+        "(e.g. the previous intraday run); merged with the day's saved news.",
     )
     daily_parser.add_argument("--symbol", type=str, default="ACB")
-    daily_parser.add_argument("--db-host", type=str, help="MySQL host.")
-    daily_parser.add_argument("--db-port", type=int, default=3306, help="MySQL port.")
-    daily_parser.add_argument("--db-user", type=str, help="MySQL user.")
-    daily_parser.add_argument("--db-password", type=str, help="MySQL password.")
-    daily_parser.add_argument("--db-name", type=str, help="MySQL database name.")
+    daily_parser.add_argument(
+        "--relevant-only",
+        action="store_true",
+        help="Only download articles whose timeline snippet looks relevant.",
+    )
+    daily_parser.add_argument(
+        "--statements",
+        action="store_true",
+        help="Also crawl the financial statements of the symbol, alongside the news.",
+    )
+    daily_parser.add_argument(
+        "--forecast-model",
+        type=Path,
+        help="Run the next-day forecast with this checkpoint once the row is inserted.",
+    )
+    _add_db_arguments(daily_parser)
+
+    watch_parser = subparsers.add_parser(
+        "watch", help="Poll the newest timeline key and ingest new articles intraday"
+    )
+    watch_parser.add_argument("--symbol", type=str, default="ACB")
+    watch_parser.add_argument("--interval", type=float, default=60.0, help="Seconds between polls.")
+    watch_parser.add_argument(
+        "--max-keys", type=int, default=3, help="Timeline keys read at most per poll."
+    )
+    watch_parser.add_argument(
+        "--relevant-only",
+        action="store_true",
+        help="Only download articles whose timeline snippet looks relevant.",
+    )
+    watch_parser.add_argument(
+        "--iterations", type=int, help="Stop after this many polls (default: run until interrupted)."
+    )
+    _add_db_arguments(watch_parser)
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.command == "historical":
+        has_keys = args.start_key is not None and args.end_key is not None
+        has_dates = args.start_date is not None and args.end_date is not None
+        if has_keys == has_dates:
+            parser.error("historical needs either --start-key/--end-key or --start-date/--end-date")
+    return args
 
 
 def resolve_db_config(args: argparse.Namespace) -> Optional[Dict[str, object]]:
@@ -468,16 +1290,33 @@ def main() -> None:
     args = parse_args()
 
     if args.command == "historical":
-        csv_path = run_historical_pipeline(
-            start_key=args.start_key, end_key=args.end_key, step=args.batch_size
+        start_key, end_key, refetch = args.start_key, args.end_key, False
+        if args.start_date is not None:
+            keys = resolve_date_range(args.start_date, args.end_date, max_key=args.max_key)
+            if not keys:
+                print("[historical] no timeline key covers the requested dates")
+                return
+            start_key, end_key, refetch = keys.start, keys.stop, True
+        dataset_path = run_historical_pipeline(
+            start_key=start_key,
+            end_key=end_key,
+            step=args.batch_size,
+            symbols=args.symbols,
+            relevant_only=args.relevant_only,
+            refetch=refetch,
+            compact=args.compact,
         )
-        print(f"[historical] dataset exported to {csv_path}")
+        print(f"[historical] dataset exported to {dataset_path}")
     elif args.command == "daily":
         db_config = resolve_db_config(args)
         result = run_daily_pipeline(
             keys=args.keys,
             symbol=args.symbol,
             db_config=db_config,
+            relevant_only=args.relevant_only,
+            since=args.since,
+            statements=args.statements,
+            forecast_model=args.forecast_model,
         )
         print(f"[daily] symbol: {result.symbol}")
         print(f"[daily] news events: {len(result.news_events)} items")
@@ -489,6 +1328,19 @@ def main() -> None:
         if result.record is not None:
             print("[daily] record prepared for database insert.")
         print(f"[daily] payload saved to {result.output_path}")
+        if db_config:
+            from Automation.db import get_database
+
+            print(f"[daily] database:\n{get_database(db_config).report()}")
+    elif args.command == "watch":
+        run_watch(
+            symbol=args.symbol,
+            interval=args.interval,
+            max_keys=args.max_keys,
+            db_config=resolve_db_config(args),
+            relevant_only=args.relevant_only,
+            iterations=args.iterations,
+        )
 
 
 if __name__ == "__main__":
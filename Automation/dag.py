@@ -0,0 +1,204 @@
+"""
+Small task-graph runner for the automation steps.
+
+Each task declares the tasks it reads from (`inputs`) and its own
+parameters; its function receives the upstream outputs as keyword
+arguments named after those tasks, plus the parameters. Tasks whose inputs
+are ready run concurrently in a thread pool, so independent steps (news and
+price fetches, the statement crawlers) overlap.
+
+Tasks marked `cache=True` are memoized on disk by input hash: the hash of
+the task name, its parameters and the outputs of its inputs. A rerun with
+unchanged inputs loads the stored output instead of running the step,
+which saves the work of an expensive pure step. Caching is not what keeps
+a rerun from writing twice: steps that write must be idempotent on their
+own, and steps that read the outside world should stay uncached.
+
+After a run, `summary()` gives the per-task status and timing.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+RAN = "ran"
+CACHED = "cached"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+@dataclass
+class Task:
+    name: str
+    fn: Callable[..., Any]
+    inputs: Sequence[str] = ()
+    params: Dict[str, Any] = field(default_factory=dict)
+    cache: bool = False
+
+
+@dataclass
+class TaskRun:
+    name: str
+    status: str
+    seconds: float = 0.0
+    started: float = 0.0
+    error: Optional[str] = None
+
+
+def _digest(value: Any) -> str:
+    try:
+        payload = pickle.dumps(value, protocol=4)
+    except Exception:
+        payload = repr(value).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class TaskGraph:
+    """
+    Args:
+        cache_dir: Directory holding the outputs of cached tasks.
+        max_workers: Tasks running at the same time.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_workers: int = 4) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_workers = max_workers
+        self.tasks: Dict[str, Task] = {}
+        self.runs: Dict[str, TaskRun] = {}
+        self.wall_seconds = 0.0
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        inputs: Sequence[str] = (),
+        params: Optional[Dict[str, Any]] = None,
+        cache: bool = False,
+    ) -> "TaskGraph":
+        if name in self.tasks:
+            raise ValueError(f"task {name!r} already defined")
+        missing = [upstream for upstream in inputs if upstream not in self.tasks]
+        if missing:
+            # tasks are added in dependency order, which also rules out cycles
+            raise ValueError(f"task {name!r} depends on undefined tasks {missing}")
+        self.tasks[name] = Task(name, fn, tuple(inputs), dict(params or {}), cache)
+        return self
+
+    def input_hash(self, task: Task, outputs: Dict[str, Any]) -> str:
+        """
+        Hash of what a task's output depends on.
+        """
+        parts = [task.name, _digest(sorted(task.params.items()))]
+        parts += [f"{upstream}={_digest(outputs[upstream])}" for upstream in task.inputs]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32]
+
+    def _cache_path(self, task: Task, key: str) -> Path:
+        return self.cache_dir / f"{task.name.replace(':', '_')}-{key}.pkl"
+
+    def _execute(self, task: Task, outputs: Dict[str, Any]) -> Any:
+        kwargs = {upstream: outputs[upstream] for upstream in task.inputs}
+        kwargs.update(task.params)
+        started = time.perf_counter()
+
+        if task.cache and self.cache_dir is not None:
+            cache_path = self._cache_path(task, self.input_hash(task, outputs))
+            if cache_path.exists():
+                with cache_path.open("rb") as fp:
+                    value = pickle.load(fp)
+                self.runs[task.name] = TaskRun(task.name, CACHED, time.perf_counter() - started, started)
+                return value
+
+        value = task.fn(**kwargs)
+
+        if task.cache and self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(".tmp")
+            with tmp_path.open("wb") as fp:
+                pickle.dump(value, fp)
+            tmp_path.replace(cache_path)
+
+        self.runs[task.name] = TaskRun(task.name, RAN, time.perf_counter() - started, started)
+        return value
+
+    def run(self, targets: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Run `targets` (every task by default) and the tasks they depend on.
+
+        Returns:
+            Outputs of the tasks that ran or were loaded from the cache.
+
+        Raises:
+            The first task error, once the tasks already running finished.
+        """
+        needed = self._closure(targets or list(self.tasks))
+        outputs: Dict[str, Any] = {}
+        pending: Set[str] = set(needed)
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+        self.runs = {}
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if error is None:
+                    ready = [
+                        name for name in self.tasks
+                        if name in pending and all(upstream in outputs for upstream in self.tasks[name].inputs)
+                    ]
+                    for name in ready:
+                        pending.discard(name)
+                        running[executor.submit(self._execute, self.tasks[name], outputs)] = name
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        outputs[name] = future.result()
+                    except Exception as exc:
+                        self.runs[name] = TaskRun(name, FAILED, error=f"{type(exc).__name__}: {exc}")
+                        error = error or exc
+
+        for name in pending:
+            self.runs[name] = TaskRun(name, SKIPPED)
+        self.wall_seconds = time.perf_counter() - started
+        if error is not None:
+            raise error
+        return outputs
+
+    def _closure(self, targets: Sequence[str]) -> List[str]:
+        needed: Set[str] = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.tasks:
+                raise KeyError(f"unknown task {name!r}")
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.tasks[name].inputs)
+        return [name for name in self.tasks if name in needed]
+
+    def summary(self) -> str:
+        """
+        Per-task status and duration, with the wall time of the whole run.
+        """
+        lines = [f"{'task':<24} {'status':<8} {'seconds':>8}"]
+        for name in self.tasks:
+            run = self.runs.get(name)
+            if run is None:
+                continue
+            line = f"{name:<24} {run.status:<8} {run.seconds:>8.2f}"
+            if run.error:
+                line += f"  {run.error}"
+            lines.append(line)
+        total = sum(run.seconds for run in self.runs.values())
+        lines.append(f"{'total (sum of tasks)':<33} {total:>8.2f}")
+        lines.append(f"{'wall time':<33} {self.wall_seconds:>8.2f}")
+        return "\n".join(lines)
@@ -0,0 +1,484 @@
+"""
+Shared MySQL access layer for the Automation and etl_finance_data modules.
+
+The daily insert, the forecast reads and writes and the ETL scripts used to
+open one `mysql.connector` connection per call (or per ticker). `Database`
+keeps one connection pool per configuration (see `get_database`) and adds:
+
+- server-side prepared statements for the parameterised queries,
+- retries with exponential back-off on transient errors (lost connection,
+  deadlock, lock wait timeout, too many connections); a lost connection
+  may hide a committed write, so it is only retried for idempotent
+  statements (reads, upserts, updates),
+- latency metrics per query kind, see `report()`,
+- `BatchWriter`, which buffers rows and writes them with one `executemany`
+  per `batch_size` rows, or every `flush_interval` seconds.
+
+mysql-connector-python is imported on first use.
+
+Usage:
+    python -m Automation.db bench --queries 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# CR_CONN_HOST_ERROR, CR_SERVER_GONE_ERROR, CR_SERVER_LOST, CR_SERVER_LOST_EXTENDED,
+# ER_CON_COUNT_ERROR, ER_LOCK_WAIT_TIMEOUT, ER_LOCK_DEADLOCK
+TRANSIENT_ERRNOS = frozenset({2003, 2006, 2013, 2055, 1040, 1205, 1213})
+# CR_SERVER_GONE_ERROR, CR_SERVER_LOST, CR_SERVER_LOST_EXTENDED: the statement
+# may have been committed before the connection dropped
+AMBIGUOUS_ERRNOS = frozenset({2006, 2013, 2055})
+
+
+def _connector():
+    try:
+        import mysql.connector  # type: ignore
+        import mysql.connector.pooling  # type: ignore
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise ImportError(
+            "mysql-connector-python is required for database access. "
+            "Install it via `pip install mysql-connector-python`."
+        ) from exc
+    return mysql.connector
+
+
+def is_transient(exc: BaseException, idempotent: bool = True) -> bool:
+    """
+    Whether a query failing with `exc` may be retried. A statement that is
+    not `idempotent` is not retried after a lost connection, it may have
+    been applied already.
+    """
+    errno = getattr(exc, "errno", None)
+    if not idempotent and errno in AMBIGUOUS_ERRNOS:
+        return False
+    return errno in TRANSIENT_ERRNOS
+
+
+@dataclass
+class QueryStats:
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    rows: int = 0
+    seconds: float = 0.0
+    # latest latencies, enough for stable percentiles
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=1024))
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Database:
+    """
+    Pooled, retrying access to one MySQL database.
+
+    Args:
+        config: mysql.connector connection arguments (host, port, user, ...).
+        pool_size: Connections kept open, at most 32 (mysql.connector limit).
+        retries: Extra attempts of a query failing with a transient error.
+        retry_delay: First back-off delay in seconds, doubled every attempt.
+        pool_timeout: Seconds to wait for a free connection when all are in use.
+    """
+
+    _pool_ids = itertools.count()
+
+    def __init__(
+        self,
+        config: Dict[str, object],
+        pool_size: int = 4,
+        retries: int = 3,
+        retry_delay: float = 0.5,
+        pool_timeout: float = 30.0,
+    ) -> None:
+        self.config = dict(config)
+        self.pool_size = max(1, min(pool_size, 32))
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.pool_timeout = pool_timeout
+        self.metrics: Dict[str, QueryStats] = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def configure(self, **options: Any) -> None:
+        """
+        Apply `Database` options to an instance shared through `get_database`.
+
+        Before the pool is opened the options are taken as given, except that
+        the pool never shrinks. Once it is open they cannot change any more:
+        differing settings, or a larger pool, are reported and ignored.
+        """
+        unknown = set(options) - {"pool_size", "retries", "retry_delay", "pool_timeout"}
+        if unknown:
+            raise TypeError(f"unknown Database options: {', '.join(sorted(unknown))}")
+        if "pool_size" in options:
+            options["pool_size"] = max(1, min(options["pool_size"], 32))
+
+        with self._lock:
+            if self._pool is None:
+                if "pool_size" in options:
+                    options["pool_size"] = max(self.pool_size, options["pool_size"])
+                for name, value in options.items():
+                    setattr(self, name, value)
+                return
+            ignored = {
+                name: value for name, value in options.items()
+                if getattr(self, name) != value and not (name == "pool_size" and value < self.pool_size)
+            }
+        if ignored:
+            current = {name: getattr(self, name) for name in ignored}
+            print(f"[db] pool of {self.config.get('database')} already open with {current}, ignoring {ignored}")
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                connector = _connector()
+                self._pool = connector.pooling.MySQLConnectionPool(
+                    pool_name=f"db{next(self._pool_ids)}",
+                    pool_size=self.pool_size,
+                    **self.config,
+                )
+            return self._pool
+
+    def get_connection(self):
+        """
+        A pooled connection; its `close()` hands it back to the pool.
+        """
+        connector = _connector()
+        pool = self._get_pool()
+        deadline = time.monotonic() + self.pool_timeout
+        while True:
+            try:
+                return pool.get_connection()
+            except connector.errors.PoolError:
+                # exhausted: every connection is lent out, wait for one
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        conn = self.get_connection()
+        try:
+            yield conn
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                # a broken connection is still returned, the pool reconnects it
+                pass
+
+    def _record(self, kind: str, seconds: float, rows: int, retries: int, failed: bool) -> None:
+        with self._lock:
+            stats = self.metrics.setdefault(kind, QueryStats())
+            stats.calls += 1
+            stats.retries += retries
+            if failed:
+                stats.errors += 1
+                return
+            stats.rows += rows
+            stats.seconds += seconds
+            stats.latencies.append(seconds)
+
+    def run(
+        self,
+        kind: str,
+        operation: Callable[[Any], T],
+        rows: Callable[[T], int] = lambda _: 0,
+        idempotent: bool = False,
+    ) -> T:
+        """
+        Call `operation` with a pooled connection, retrying transient errors
+        on a fresh connection.
+
+        Args:
+            kind: Name of the query in the metrics.
+            operation: Receives the connection; commits its own writes.
+            rows: Row count of the result, for the metrics.
+            idempotent: Running `operation` twice has the effect of running
+                it once (reads, upserts), so it is retried after a lost
+                connection too.
+        """
+        started = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                with self.connection() as conn:
+                    result = operation(conn)
+                break
+            except Exception as exc:
+                if not is_transient(exc, idempotent) or attempt == self.retries:
+                    self._record(kind, time.perf_counter() - started, 0, attempt, failed=True)
+                    raise
+                print(f"[db] {kind}: {exc}, retrying ({attempt + 1}/{self.retries})")
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+        self._record(kind, time.perf_counter() - started, rows(result), attempt, failed=False)
+        return result
+
+    def execute(self, kind: str, sql: str, params: Sequence[object] = (), idempotent: bool = False) -> int:
+        """
+        Run one write statement as a prepared statement and commit.
+        `idempotent` as in `run`.
+
+        Returns:
+            Rows affected.
+        """
+        def operation(conn) -> int:
+            cursor = conn.cursor(prepared=True)
+            try:
+                cursor.execute(sql, tuple(params))
+                conn.commit()
+                return cursor.rowcount
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        return self.run(kind, operation, rows=lambda count: max(count, 0), idempotent=idempotent)
+
+    def query(self, kind: str, sql: str, params: Sequence[object] = ()) -> Tuple[List[str], List[tuple]]:
+        """
+        Run one read statement as a prepared statement.
+
+        Returns:
+            Column names and rows.
+        """
+        def operation(conn) -> Tuple[List[str], List[tuple]]:
+            cursor = conn.cursor(prepared=True)
+            try:
+                cursor.execute(sql, tuple(params))
+                rows = cursor.fetchall()
+                columns = [description[0] for description in cursor.description]
+                return columns, rows
+            finally:
+                cursor.close()
+
+        return self.run(kind, operation, rows=lambda result: len(result[1]), idempotent=True)
+
+    def executemany(
+        self,
+        kind: str,
+        sql: str,
+        rows: Sequence[Sequence[object]],
+        idempotent: bool = False,
+    ) -> int:
+        """
+        Write `rows` with a single-row `INSERT ... VALUES (%s, ...)` statement
+        in one transaction. `idempotent` as in `run`.
+        """
+        def operation(conn) -> int:
+            # a plain cursor: mysql.connector rewrites the INSERT into
+            # multi-row statements, much faster than one prepared execute per row
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(sql, [tuple(row) for row in rows])
+                conn.commit()
+                return len(rows)
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        return self.run(kind, operation, rows=lambda count: count, idempotent=idempotent)
+
+    def report(self) -> str:
+        """
+        Calls, errors, retries, rows and latency of every query kind.
+        """
+        lines = [
+            f"{'query':<24} {'calls':>6} {'errors':>6} {'retries':>7} {'rows':>8} "
+            f"{'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}"
+        ]
+        with self._lock:
+            for kind, stats in sorted(self.metrics.items()):
+                succeeded = stats.calls - stats.errors
+                mean = stats.seconds / succeeded if succeeded else 0.0
+                lines.append(
+                    f"{kind:<24} {stats.calls:>6} {stats.errors:>6} {stats.retries:>7} {stats.rows:>8} "
+                    f"{mean * 1000:>8.1f} {stats.percentile(0.5) * 1000:>8.1f} "
+                    f"{stats.percentile(0.95) * 1000:>8.1f}"
+                )
+        return "\n".join(lines)
+
+
+class BatchWriter:
+    """
+    Buffers rows of one statement and writes them with
+    `Database.executemany`, one transaction per flush.
+
+    Args:
+        db: Database to write to.
+        kind: Name of the writes in the metrics.
+        sql: Single-row `INSERT ... VALUES (%s, ...)` statement, optionally
+            with an `ON DUPLICATE KEY UPDATE` clause.
+        batch_size: Buffered rows that trigger a flush.
+        flush_interval: Seconds between background flushes of a partial
+            batch, 0 disables them.
+        idempotent: `sql` is an upsert, see `Database.run`.
+
+    A batch that still fails after the retries is written again row by row,
+    so only the rows that fail on their own are dropped; they are kept in
+    `failed` with their error.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        kind: str,
+        sql: str,
+        batch_size: int = 500,
+        flush_interval: float = 5.0,
+        idempotent: bool = False,
+    ) -> None:
+        self.db = db
+        self.kind = kind
+        self.sql = sql
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.idempotent = idempotent
+        self.written = 0
+        self.failed: List[Tuple[tuple, BaseException]] = []
+        self._rows: List[tuple] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if flush_interval > 0:
+            self._thread = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._thread.start()
+
+    def __enter__(self) -> "BatchWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def add(self, row: Sequence[object]) -> None:
+        self.extend([row])
+
+    def extend(self, rows: Iterable[Sequence[object]]) -> None:
+        with self._lock:
+            self._rows.extend(tuple(row) for row in rows)
+            full = len(self._rows) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write the buffered rows.
+
+        Returns:
+            Rows written; rows that could not be written go to `failed`.
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                self.db.executemany(self.kind, self.sql, rows, idempotent=self.idempotent)
+                written = len(rows)
+            except Exception as exc:
+                print(f"[db] {self.kind}: batch of {len(rows)} rows failed ({exc}), writing row by row")
+                written = 0
+                for row in rows:
+                    try:
+                        self.db.executemany(self.kind, self.sql, [row], idempotent=self.idempotent)
+                        written += 1
+                    except Exception as row_exc:
+                        self.failed.append((row, row_exc))
+            self.written += written
+            return written
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as exc:
+                print(f"[db] background flush of {self.kind} failed: {exc}")
+
+    def close(self) -> None:
+        """
+        Stop the background flushes and write the remaining rows.
+        """
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+_databases: Dict[Tuple[Tuple[str, str], ...], Database] = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(config: Dict[str, object], **options: Any) -> Database:
+    """
+    Process-wide Database of `config`, so every caller shares the same pool
+    and metrics. `options` of later calls are applied with
+    `Database.configure`: they still take effect until the pool is opened,
+    and are reported when they conflict with an open pool.
+    """
+    key = tuple(sorted((name, str(value)) for name, value in config.items()))
+    with _databases_lock:
+        db = _databases.get(key)
+        if db is None:
+            db = _databases[key] = Database(config, **options)
+        elif options:
+            db.configure(**options)
+        return db
+
+
+def benchmark(config: Dict[str, object], queries: int = 200) -> Database:
+    """
+    `SELECT 1` latency with a new connection per query (what the modules did
+    before) against the shared pool.
+    """
+    connector = _connector()
+    db = Database(config)
+    for _ in range(queries):
+        started = time.perf_counter()
+        conn = connector.connect(**config)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+        db._record("connect_per_query", time.perf_counter() - started, 1, 0, failed=False)
+
+    for _ in range(queries):
+        db.query("pooled_prepared", "SELECT 1")
+    return db
+
+
+def main() -> None:
+    from etl_finance_data.config import DB_CONFIG
+
+    parser = argparse.ArgumentParser(description="Shared MySQL access layer")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench_parser = subparsers.add_parser("bench", help="connect-per-query vs pooled latency")
+    bench_parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        print(benchmark(DB_CONFIG, args.queries).report())
+
+
+if __name__ == "__main__":
+    main()
@@ -22,23 +22,16 @@ import argparse
 import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 
-import numpy as np
-import pandas as pd
-import torch
-from sentence_transformers import SentenceTransformer
+# numpy, pandas, torch, sentence-transformers and mysql are imported inside the
+# functions that use them so `--help` and argument errors return immediately.
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    import pandas as pd
+    import torch
+    from sentence_transformers import SentenceTransformer
 
-from model.LSTM.modeling import LSTMModel
-
-try:
-    import mysql.connector  # type: ignore
-    from mysql.connector.connection import MySQLConnection  # type: ignore
-except ImportError as exc:  # pragma: no cover - optional dependency
-    raise ImportError(
-        "mysql-connector-python is required to run forecast_daily.py. "
-        "Install it via `pip install mysql-connector-python`."
-    ) from exc
+    from model.LSTM.modeling import LSTMModel
 
 
 DEFAULT_SEQUENCE_LENGTH = 20
@@ -109,19 +102,21 @@ def fetch_last_days(
     Pull the latest rows ordered by time ascending. Ensures that we have the
     required number of rows for inference.
     """
-    connection: Optional[MySQLConnection] = None
-    try:
-        connection = mysql.connector.connect(**db_config)  # type: ignore[arg-type]
-        query = f"""
+    import pandas as pd
+
+    from Automation.db import get_database
+
+    columns, rows = get_database(db_config).query(
+        "fetch_last_days",
+        """
             SELECT *
             FROM fact_price_stock
             ORDER BY time DESC
-            LIMIT {sequence_length}
-        """
-        df = pd.read_sql(query, connection)
-    finally:
-        if connection is not None:
-            connection.close()
+            LIMIT %s
+        """,
+        (sequence_length,),
+    )
+    df = pd.DataFrame(rows, columns=columns)
 
     if df.empty or len(df) < sequence_length:
         raise ValueError(
@@ -135,6 +130,10 @@ def fetch_last_days(
 
 
 def load_model(model_path: Path, device_preference: str) -> Tuple[LSTMModel, torch.device]:
+    import torch
+
+    from model.LSTM.modeling import LSTMModel
+
     if not model_path.exists():
         raise FileNotFoundError(f"Model checkpoint not found at {model_path}")
 
@@ -164,6 +163,11 @@ def prepare_tensors(
     """
     Replica of the training preprocessing for a single sequence.
     """
+    import numpy as np
+    import torch
+
+    from model.encoding import BulkEncoder
+
     prices = df.copy()
 
     price_stats = {
@@ -202,12 +206,8 @@ def prepare_tensors(
     non_empty_indices = [idx for idx, text in enumerate(corpus) if text.strip()]
     if non_empty_indices:
         non_empty_texts = [corpus[idx] for idx in non_empty_indices]
-        embeddings = sentence_model.encode(
-            non_empty_texts,
-            show_progress_bar=False,
-            precision="float32",
-            convert_to_tensor=True,
-        ).cpu()
+        # long day corpora are chunked and mean pooled instead of truncated
+        embeddings = torch.from_numpy(BulkEncoder(model=sentence_model).encode(non_empty_texts))
         for tensor_idx, corpus_idx in enumerate(non_empty_indices):
             event_tensor[0, corpus_idx, :] = embeddings[tensor_idx]
 
@@ -220,26 +220,41 @@ def insert_prediction(
     db_config: Dict[str, object],
 ) -> None:
     """
-    Insert the forecast result into fact_price_predict table.
+    Write the forecast result into fact_price_predict table, replacing the
+    prediction already stored for `reference_time` so reruns do not add rows.
     """
-    connection: Optional[MySQLConnection] = None
-    try:
-        connection = mysql.connector.connect(**db_config)  # type: ignore[arg-type]
-        cursor = connection.cursor()
-
-        sql = """
-            INSERT INTO fact_price_predict (time, price_predict)
-            VALUES (%s, %s)
-        """
-        values = (reference_time.to_pydatetime(), predicted_price)
-        cursor.execute(sql, values)
-        connection.commit()
-    finally:
-        if connection is not None:
-            connection.close()
+    from Automation.db import get_database
+
+    reference = reference_time.to_pydatetime()
+
+    def write(conn) -> None:
+        cursor = conn.cursor(prepared=True)
+        try:
+            cursor.execute("SELECT COUNT(*) FROM fact_price_predict WHERE time = %s FOR UPDATE", (reference,))
+            if cursor.fetchone()[0] > 0:
+                cursor.execute(
+                    "UPDATE fact_price_predict SET price_predict = %s WHERE time = %s",
+                    (predicted_price, reference),
+                )
+            else:
+                cursor.execute(
+                    "INSERT INTO fact_price_predict (time, price_predict) VALUES (%s, %s)",
+                    (reference, predicted_price),
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    get_database(db_config).run("insert_prediction", write, rows=lambda _: 1, idempotent=True)
 
 
 def run_forecast(args: argparse.Namespace) -> ForecastResult:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
     db_config = resolve_db_config(args)
     sequence_length = args.sequence_length
 
@@ -0,0 +1,170 @@
+"""
+Import-time profile of the Automation entry points.
+
+Each target module is imported in a fresh interpreter started with
+`python -X importtime`, the per-module timings printed on stderr are parsed
+and the slowest imports are reported. The run fails when
+
+- the cumulative import time of a target exceeds `--threshold-ms`, or
+- a target pulls in one of the heavy packages (HEAVY_MODULES) at import
+  time; those must only load inside the subcommands that use them.
+
+Usage (from the repo root):
+    python -m Automation.import_profile
+    python -m Automation.import_profile --threshold-ms 300 --top 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+TARGETS = ("Automation.automation", "Automation.forecast_daily")
+
+HEAVY_MODULES = (
+    "pandas",
+    "numpy",
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "vnstock3",
+    "pyarrow",
+    "mysql",
+)
+
+DEFAULT_THRESHOLD_MS = 500.0
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+@dataclass
+class ImportProfile:
+    target: str
+    timings: List[ImportTiming]
+
+    @property
+    def total_ms(self) -> float:
+        top_level = [timing for timing in self.timings if timing.depth == 0]
+        return sum(timing.cumulative_us for timing in top_level) / 1000.0
+
+    def loaded(self, package: str) -> bool:
+        return any(
+            timing.module == package or timing.module.startswith(package + ".")
+            for timing in self.timings
+        )
+
+    def slowest(self, top: int) -> List[ImportTiming]:
+        return sorted(self.timings, key=lambda timing: timing.cumulative_us, reverse=True)[:top]
+
+
+def parse_importtime(stderr: str) -> List[ImportTiming]:
+    """
+    Parse the `-X importtime` lines of an interpreter's stderr.
+    """
+    timings = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        timings.append(
+            ImportTiming(
+                module=module,
+                self_us=int(self_us),
+                cumulative_us=int(cumulative_us),
+                depth=max(0, (len(indent) - 1) // 2),
+            )
+        )
+    return timings
+
+
+def profile_import(target: str, python: str = sys.executable) -> ImportProfile:
+    """
+    Import `target` in a fresh interpreter and collect its import timings.
+    Modules already imported by the interpreter startup are not counted.
+    """
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    baseline = subprocess.run(
+        [python, "-X", "importtime", "-c", "pass"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    startup = {timing.module for timing in parse_importtime(baseline.stderr)}
+
+    completed = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {target}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"importing {target} failed:\n{completed.stderr[-2000:]}")
+
+    timings = [
+        timing for timing in parse_importtime(completed.stderr) if timing.module not in startup
+    ]
+    return ImportProfile(target=target, timings=timings)
+
+
+def check(
+    profiles: Sequence[ImportProfile],
+    threshold_ms: float = DEFAULT_THRESHOLD_MS,
+    heavy_modules: Sequence[str] = HEAVY_MODULES,
+) -> Dict[str, List[str]]:
+    """
+    Regression checks, returns the problems found per target.
+    """
+    problems: Dict[str, List[str]] = {}
+    for profile in profiles:
+        found = []
+        if profile.total_ms > threshold_ms:
+            found.append(f"import takes {profile.total_ms:.0f} ms (threshold {threshold_ms:.0f} ms)")
+        for package in heavy_modules:
+            if profile.loaded(package):
+                found.append(f"imports heavy package '{package}' at module load")
+        if found:
+            problems[profile.target] = found
+    return problems
+
+
+def report(profile: ImportProfile, top: int = 10) -> None:
+    print(f"[import_profile] {profile.target}: {profile.total_ms:.1f} ms")
+    for timing in profile.slowest(top):
+        print(f"    {timing.cumulative_us / 1000:8.1f} ms  {timing.module}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import-time profile of the Automation CLIs")
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS))
+    parser.add_argument("--threshold-ms", type=float, default=DEFAULT_THRESHOLD_MS)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports shown per target")
+    args = parser.parse_args()
+
+    profiles = [profile_import(target) for target in args.targets]
+    for profile in profiles:
+        report(profile, args.top)
+
+    problems = check(profiles, args.threshold_ms)
+    for target, found in problems.items():
+        for problem in found:
+            print(f"[import_profile] FAIL {target}: {problem}")
+    if problems:
+        sys.exit(1)
+    print("[import_profile] OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Timeline key to publish date index for targeted date-range backfills.
+
+Cafef timeline pages are addressed by integer keys, newest first: key 1
+holds the latest news and higher keys go back in time. The index keeps, per
+key, the oldest and newest publish time of the items seen on that page
+(taken from the timeline snippets, see `stage2.snippet_fields`) in a small
+SQLite database.
+
+Because the dates decrease monotonically with the key, the keys covering a
+date range are found with two binary searches over the key space, fetching
+only the O(log n) pages not already indexed. New items are published at
+the head of the timeline, so the newest keys (up to `recent_keys`) are
+probed again once their entry is older than `max_age_hours`; the archive
+behind them only shifts slowly, which the `margin` of `covering_keys`
+absorbs.
+
+Usage:
+    python -m Automation.key_index build
+    python -m Automation.key_index lookup --start-date 2024-01-01 --end-date 2024-01-31
+"""
+
+from __future__ import annotations
+
+import argparse
+import pickle
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+# entries of one timeline page as returned by `stage2.process_each_file`
+Probe = Callable[[int], Optional[List[Dict[str, str]]]]
+
+
+@dataclass
+class KeyDates:
+    key: int
+    min_published: Optional[str]
+    max_published: Optional[str]
+    items: int
+    indexed_at: str
+
+    @property
+    def empty(self) -> bool:
+        """
+        No dated item: the key is past the end of the timeline.
+        """
+        return self.min_published is None
+
+
+class KeyIndex:
+    """
+    Key -> (min, max) publish time store backed by SQLite (WAL journal).
+
+    Args:
+        path: Location of the SQLite database file.
+        max_age_hours: Entries of the recent keys indexed earlier than this
+            are considered stale.
+        recent_keys: Keys up to this one are still filling with new items;
+            older keys never go stale.
+    """
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS key_dates (
+            key INTEGER PRIMARY KEY,
+            min_published TEXT,
+            max_published TEXT,
+            items INTEGER NOT NULL,
+            indexed_at TEXT NOT NULL
+        )
+    """
+
+    def __init__(self, path: Path, max_age_hours: float = 12.0, recent_keys: int = 20) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_age = timedelta(hours=max_age_hours)
+        self.recent_keys = recent_keys
+        self.probes = 0
+        self._conn = sqlite3.connect(str(self.path), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(self._schema)
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "KeyIndex":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def record(
+        self,
+        key: int,
+        entries: Iterable[Dict[str, str]],
+        indexed_at: Optional[datetime] = None,
+    ) -> KeyDates:
+        """
+        Store the publish time range of one fetched timeline page.
+        """
+        entries = list(entries)
+        published = sorted(entry["published_at"] for entry in entries if entry.get("published_at"))
+        indexed_at = (indexed_at or datetime.utcnow()).isoformat()
+        row = KeyDates(
+            key=key,
+            min_published=published[0] if published else None,
+            max_published=published[-1] if published else None,
+            items=len(entries),
+            indexed_at=indexed_at,
+        )
+        with self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO key_dates (key, min_published, max_published, items, indexed_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (row.key, row.min_published, row.max_published, row.items, row.indexed_at),
+            )
+        return row
+
+    def get(self, key: int, include_stale: bool = False) -> Optional[KeyDates]:
+        row = self._conn.execute(
+            "SELECT key, min_published, max_published, items, indexed_at FROM key_dates WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        entry = KeyDates(*row)
+        if not include_stale and self.is_stale(entry):
+            return None
+        return entry
+
+    def is_stale(self, entry: KeyDates) -> bool:
+        """
+        True for a recent key indexed more than `max_age_hours` ago.
+        """
+        if entry.key > self.recent_keys:
+            return False
+        return datetime.utcnow() - datetime.fromisoformat(entry.indexed_at) > self.max_age
+
+    def index_pages(self, directory: Path) -> int:
+        """
+        Index the stored stage 1 pages (compact `.jsonl` or legacy `.pkl`) not
+        indexed yet. A page is dated by its file modification time, which is
+        when it was fetched.
+        """
+        from stage2 import process_each_file, read_records
+
+        indexed = 0
+        for page_file in sorted(Path(directory).glob("*.*")):
+            if page_file.suffix not in (".jsonl", ".pkl"):
+                continue
+            try:
+                key = int(page_file.stem)
+            except ValueError:
+                continue
+            if self.get(key, include_stale=True) is not None:
+                continue
+            try:
+                if page_file.suffix == ".jsonl":
+                    page = read_records(str(page_file))
+                else:
+                    with page_file.open("rb") as fp:
+                        page = pickle.load(fp)
+                entries = process_each_file(page)
+            except Exception as exc:
+                print(f"[key_index] failed to index {page_file.name}: {exc}")
+                continue
+            fetched_at = datetime.utcfromtimestamp(page_file.stat().st_mtime)
+            self.record(key, entries, indexed_at=fetched_at)
+            indexed += 1
+        return indexed
+
+    def dates(self, key: int, probe: Probe) -> KeyDates:
+        """
+        Publish time range of `key`, fetched with `probe` when not indexed or stale.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        entries = probe(key)
+        self.probes += 1
+        if entries is None:
+            raise RuntimeError(f"timeline key {key} could not be fetched")
+        return self.record(key, entries)
+
+    def covering_keys(
+        self,
+        start: date,
+        end: date,
+        probe: Probe,
+        lo: int = 1,
+        hi: int = 1000,
+        margin: int = 1,
+    ) -> range:
+        """
+        Keys whose pages hold news published between `start` and `end`
+        (inclusive), found by binary search over [lo, hi].
+
+        Args:
+            start: First publish date of the range.
+            end: Last publish date of the range.
+            probe: Fetches the entries of a timeline key, None on failure.
+            lo: Newest key of the search space.
+            hi: Oldest key of the search space.
+            margin: Extra keys added on both sides to absorb pages shifting
+                while the backfill runs.
+
+        Returns:
+            The covering keys, empty when no page holds the range.
+        """
+        start_iso = start.isoformat()
+        end_iso = (end + timedelta(days=1)).isoformat()
+
+        def newer_than_end(key: int) -> bool:
+            entry = self.dates(key, probe)
+            return not entry.empty and entry.min_published >= end_iso
+
+        def reaches_start(key: int) -> bool:
+            entry = self.dates(key, probe)
+            return not entry.empty and entry.max_published >= start_iso
+
+        # first key whose oldest item is not after the end of the range
+        left, right = lo, hi + 1
+        while left < right:
+            middle = (left + right) // 2
+            if newer_than_end(middle):
+                left = middle + 1
+            else:
+                right = middle
+        first_key = left
+
+        # first key whose newest item is before the start of the range
+        left, right = first_key, hi + 1
+        while left < right:
+            middle = (left + right) // 2
+            if reaches_start(middle):
+                left = middle + 1
+            else:
+                right = middle
+        last_key = left - 1
+
+        if first_key > last_key:
+            return range(0)
+        return range(max(lo, first_key - margin), min(hi, last_key + margin) + 1)
+
+    def summary(self) -> Dict[str, object]:
+        keys, first, last = self._conn.execute(
+            "SELECT COUNT(*), MIN(key), MAX(key) FROM key_dates"
+        ).fetchone()
+        newest, oldest = self._conn.execute(
+            "SELECT MAX(max_published), MIN(min_published) FROM key_dates"
+        ).fetchone()
+        return {"keys": keys, "first_key": first, "last_key": last, "newest": newest, "oldest": oldest}
+
+
+def main() -> None:
+    from Automation.automation import KEY_INDEX_PATH, STAGE1_DIR, probe_timeline_key
+
+    parser = argparse.ArgumentParser(description="Timeline key to publish date index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="index the stored stage 1 pages")
+    lookup_parser = subparsers.add_parser("lookup", help="keys covering a date range")
+    lookup_parser.add_argument("--start-date", type=date.fromisoformat, required=True)
+    lookup_parser.add_argument("--end-date", type=date.fromisoformat, required=True)
+    lookup_parser.add_argument("--max-key", type=int, default=1000)
+    args = parser.parse_args()
+
+    with KeyIndex(KEY_INDEX_PATH) as index:
+        if args.command == "build":
+            print(f"[key_index] indexed {index.index_pages(STAGE1_DIR)} pages")
+        else:
+            keys = index.covering_keys(args.start_date, args.end_date, probe_timeline_key, hi=args.max_key)
+            if keys:
+                print(f"[key_index] keys {keys.start}..{keys.stop - 1} ({index.probes} pages probed)")
+            else:
+                print(f"[key_index] no key covers the range ({index.probes} pages probed)")
+        print(f"[key_index] {index.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Durable job ledger for resumable backfills.
+
+The ledger keeps one row per unit of work (a timeline key or an article URL)
+in a small SQLite database running in WAL mode, so a crashed or interrupted
+backfill can be restarted and will skip exactly the work that completed.
+
+States:
+    pending -> fetched
+    pending -> failed (status, retries) -> fetched | failed ...
+
+Failures with a transient status (timeouts, 429, 5xx) are retried on the
+next run until `max_retries` is reached; permanent failures (404, 410, ...)
+are never retried.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, IO, Iterable, Optional, Set
+
+PENDING = "pending"
+FETCHED = "fetched"
+FAILED = "failed"
+
+# `None` stands for a network level error (timeout, connection reset, ...).
+TRANSIENT_STATUSES = {None, 408, 425, 429, 500, 502, 503, 504}
+
+
+@contextmanager
+def atomic_open(path: Path, mode: str = "w", encoding: Optional[str] = "utf-8") -> Iterator[IO]:
+    """
+    Open a temporary file next to `path` and atomically rename it over `path`
+    once the block finishes without error. Readers never observe a partially
+    written output file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else encoding) as fp:
+            yield fp
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+class JobLedger:
+    """
+    Per-item state store backed by SQLite (WAL journal).
+
+    Args:
+        path: Location of the SQLite database file.
+        max_retries: Maximum attempts for an item failing with a transient status.
+    """
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            kind TEXT NOT NULL,
+            item TEXT NOT NULL,
+            state TEXT NOT NULL,
+            status INTEGER,
+            retries INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (kind, item)
+        )
+    """
+
+    def __init__(self, path: Path, max_retries: int = 5) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_retries = max_retries
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(self._schema)
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "JobLedger":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _upsert(self, kind: str, item: str, state: str, status: Optional[int], retries_delta: int) -> None:
+        now = datetime.utcnow().isoformat()
+        with self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (kind, item, state, status, retries, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, item) DO UPDATE SET
+                    state = excluded.state,
+                    status = excluded.status,
+                    retries = jobs.retries + ?,
+                    updated_at = excluded.updated_at
+                """,
+                (kind, str(item), state, status, retries_delta, now, retries_delta),
+            )
+
+    def register(self, kind: str, items: Iterable[object]) -> None:
+        """
+        Record items as pending without touching existing rows.
+        """
+        now = datetime.utcnow().isoformat()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (kind, item, state, updated_at) VALUES (?, ?, ?, ?)",
+                [(kind, str(item), PENDING, now) for item in items],
+            )
+
+    def mark_fetched(self, kind: str, item: object, status: Optional[int] = 200) -> None:
+        self._upsert(kind, str(item), FETCHED, status, 0)
+
+    def mark_failed(self, kind: str, item: object, status: Optional[int]) -> None:
+        self._upsert(kind, str(item), FAILED, status, 1)
+
+    def get(self, kind: str, item: object) -> Optional[Dict[str, object]]:
+        row = self._conn.execute(
+            "SELECT state, status, retries, updated_at FROM jobs WHERE kind = ? AND item = ?",
+            (kind, str(item)),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"state": row[0], "status": row[1], "retries": row[2], "updated_at": row[3]}
+
+    def should_fetch(self, kind: str, item: object) -> bool:
+        """
+        True when the item has not been fetched yet and, if it failed before,
+        the failure is transient and retries are not exhausted.
+        """
+        entry = self.get(kind, item)
+        if entry is None or entry["state"] == PENDING:
+            return True
+        if entry["state"] == FETCHED:
+            return False
+        return entry["status"] in TRANSIENT_STATUSES and entry["retries"] < self.max_retries
+
+    def is_settled(self, kind: str, item: object) -> bool:
+        """
+        True when no further attempt will be made for the item.
+        """
+        entry = self.get(kind, item)
+        return entry is not None and entry["state"] != PENDING and not self.should_fetch(kind, item)
+
+    def items(self, kind: str, state: str) -> Set[str]:
+        rows = self._conn.execute(
+            "SELECT item FROM jobs WHERE kind = ? AND state = ?", (kind, state)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def summary(self, kind: str) -> Dict[str, int]:
+        rows = self._conn.execute(
+            "SELECT state, COUNT(*) FROM jobs WHERE kind = ? GROUP BY state", (kind,)
+        ).fetchall()
+        return {state: count for state, count in rows}
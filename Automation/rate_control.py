@@ -0,0 +1,143 @@
+"""
+Adaptive request pacing for the Cafef crawlers.
+
+`AdaptiveRateController` follows an AIMD (additive increase, multiplicative
+decrease) policy: while responses come back healthy and faster than
+`target_latency` the request rate grows by `increase_step` per 2xx response;
+on throttling signals (429, 5xx, network errors) it is multiplied by
+`decrease_factor` and any `Retry-After` header is honored before the next
+request. Other statuses (404, 410, other 4xx) say nothing about the server
+load and leave the rate unchanged. The controller is thread safe so the
+timeline and article fetchers can share one instance.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# `None` stands for a network level error (timeout, connection reset, ...).
+THROTTLE_STATUSES = {None, 408, 429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Convert a Retry-After header (delta seconds or HTTP date) into seconds.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateController:
+    """
+    Args:
+        initial_rate: Starting request rate in requests per second.
+        min_rate: Lower bound for the rate after repeated back-offs.
+        max_rate: Upper bound for the rate while the server is healthy.
+        increase_step: Rate added after each fast, healthy response.
+        decrease_factor: Multiplier applied on a throttling signal.
+        target_latency: Responses slower than this (seconds) stop the increase
+            and gently reduce the rate instead.
+        log_interval: Seconds between effective-rate log lines.
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = 0.5,
+        min_rate: float = 0.1,
+        max_rate: float = 5.0,
+        increase_step: float = 0.05,
+        decrease_factor: float = 0.5,
+        target_latency: float = 1.5,
+        log_interval: float = 60.0,
+        name: str = "rate",
+    ) -> None:
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.target_latency = target_latency
+        self.log_interval = log_interval
+        self.name = name
+
+        self._rate = min(max(initial_rate, min_rate), max_rate)
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+        self._window_start = time.monotonic()
+        self._window_ok = 0
+        self._window_throttled = 0
+        self._window_other = 0
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def acquire(self) -> None:
+        """
+        Block until the caller may send its next request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1.0 / self._rate
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+
+    def record(self, status: Optional[int], latency: float, retry_after: Optional[str] = None) -> None:
+        """
+        Feed the outcome of one request back into the controller.
+
+        Args:
+            status: HTTP status, or None for a network level error.
+            latency: Seconds the request took.
+            retry_after: Raw Retry-After header value if the server sent one.
+        """
+        with self._lock:
+            if status in THROTTLE_STATUSES:
+                self._rate = max(self.min_rate, self._rate * self.decrease_factor)
+                self._window_throttled += 1
+                pause = parse_retry_after(retry_after)
+                if pause is not None:
+                    self._next_slot = max(self._next_slot, time.monotonic() + pause)
+            elif not 200 <= status < 300:
+                # permanent client errors: neutral for the pacing
+                self._window_other += 1
+            elif latency <= self.target_latency:
+                self._rate = min(self.max_rate, self._rate + self.increase_step)
+                self._window_ok += 1
+            else:
+                self._rate = max(self.min_rate, self._rate * 0.9)
+                self._window_ok += 1
+
+            self._maybe_log()
+
+    def _maybe_log(self) -> None:
+        elapsed = time.monotonic() - self._window_start
+        if elapsed < self.log_interval:
+            return
+        total = self._window_ok + self._window_throttled + self._window_other
+        print(
+            f"[{self.name}] effective {total / elapsed:.2f} req/s over {elapsed:.0f}s "
+            f"(ok: {self._window_ok}, throttled: {self._window_throttled}, "
+            f"other: {self._window_other}), "
+            f"target {self._rate:.2f} req/s"
+        )
+        self._window_start = time.monotonic()
+        self._window_ok = 0
+        self._window_throttled = 0
+        self._window_other = 0
@@ -0,0 +1,494 @@
+"""
+Durable work queue for distributed crawl workers.
+
+A coordinator enqueues timeline keys (and optionally the article URLs of an
+existing stage 2 catalogue) into a SQLite queue file; any number of worker
+processes, on one box or on several machines sharing the file, lease items,
+fetch and store them, and acknowledge them.
+
+Leases:
+    ready -> leased (owner, lease_until) -> done
+                                         -> ready (nack, or lease expired)
+                                         -> dead (max_attempts reached or
+                                                  permanent HTTP status)
+
+A worker that dies mid-item simply lets its lease expire; the item becomes
+visible again after `visibility_timeout` seconds and another worker picks it
+up. Acks and nacks are only accepted from the current lease owner.
+
+The request rate of all workers together is capped by a token bucket kept
+in the same database, and a throttling response (429, 5xx) pauses the whole
+fleet for the Retry-After delay.
+
+Timeline workers store compact pages (`stage_1_data/{key}.jsonl`) and
+enqueue the article links they find; article workers store each page under
+`stage_3_data/queue/`. `collect` packs those into `page_data_queue_*.json`
+batches that `preprocess_articles` handles like any stage 3 batch.
+
+SQLite locking needs a local disk or a network filesystem with working
+POSIX locks; on other shared filesystems, run the workers on one machine.
+
+Usage:
+    python -m Automation.work_queue coordinator --start-key 500 --end-key 1000
+    python -m Automation.work_queue worker --rate 1.0      # in as many shells as needed
+    python -m Automation.work_queue collect
+    python -m Automation.work_queue status
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from Automation.ledger import TRANSIENT_STATUSES, atomic_open
+from Automation.rate_control import parse_retry_after
+
+READY = "ready"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+
+TIMELINE_KIND = "timeline"
+ARTICLE_KIND = "article"
+
+GLOBAL_BUCKET = "cafef"
+
+
+@dataclass
+class Lease:
+    id: int
+    kind: str
+    item: str
+    payload: Dict[str, object]
+    attempts: int
+
+
+class WorkQueue:
+    """
+    Lease based work queue backed by SQLite (WAL journal).
+
+    Args:
+        path: Location of the SQLite queue file.
+        visibility_timeout: Seconds a leased item stays invisible to other
+            workers before it is handed out again.
+        max_attempts: Leases of an item before it is marked dead.
+    """
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            item TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            state TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            owner TEXT,
+            lease_until REAL,
+            not_before REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            updated_at REAL NOT NULL,
+            UNIQUE (kind, item)
+        );
+        CREATE INDEX IF NOT EXISTS idx_items_state ON items (state, kind, lease_until);
+        CREATE TABLE IF NOT EXISTS buckets (
+            name TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            paused_until REAL NOT NULL DEFAULT 0
+        );
+    """
+
+    def __init__(self, path: Path, visibility_timeout: float = 120.0, max_attempts: int = 5) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self._schema)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Write transaction taking the database lock up front, so concurrent
+        workers never lease the same item.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def enqueue(self, kind: str, items: Iterable[Tuple[object, Dict[str, object]]]) -> int:
+        """
+        Add (item, payload) pairs; items already queued are left untouched.
+
+        Returns:
+            Number of newly queued items.
+        """
+        now = time.time()
+        rows = [(kind, str(item), json.dumps(payload, ensure_ascii=False), READY, now) for item, payload in items]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO items (kind, item, payload, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            return conn.total_changes - before
+
+    def lease(self, owner: str, kinds: Sequence[str] = (TIMELINE_KIND, ARTICLE_KIND), limit: int = 1) -> List[Lease]:
+        """
+        Lease up to `limit` ready (or expired) items of the given kinds,
+        timeline keys first. Expired leases already attempted `max_attempts`
+        times are marked dead instead of being handed out again.
+        """
+        now = time.time()
+        placeholders = ", ".join("?" * len(kinds))
+        with self._transaction() as conn:
+            conn.execute(
+                f"""
+                UPDATE items SET state = ?, lease_until = NULL, updated_at = ?,
+                    last_error = COALESCE(last_error, 'lease expired')
+                WHERE kind IN ({placeholders}) AND state = ? AND lease_until < ? AND attempts >= ?
+                """,
+                (DEAD, now, *kinds, LEASED, now, self.max_attempts),
+            )
+            rows = conn.execute(
+                f"""
+                SELECT id, kind, item, payload, attempts FROM items
+                WHERE kind IN ({placeholders}) AND not_before <= ?
+                  AND (state = ? OR (state = ? AND lease_until < ?))
+                ORDER BY kind = ? DESC, id
+                LIMIT ?
+                """,
+                (*kinds, now, READY, LEASED, now, TIMELINE_KIND, limit),
+            ).fetchall()
+            conn.executemany(
+                """
+                UPDATE items SET state = ?, owner = ?, lease_until = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+                """,
+                [(LEASED, owner, now + self.visibility_timeout, now, row[0]) for row in rows],
+            )
+        return [
+            Lease(id=row[0], kind=row[1], item=row[2], payload=json.loads(row[3]), attempts=row[4] + 1)
+            for row in rows
+        ]
+
+    def extend(self, lease: Lease, owner: str, seconds: Optional[float] = None) -> bool:
+        """
+        Push back the lease deadline of an item still being worked on.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE items SET lease_until = ? WHERE id = ? AND state = ? AND owner = ?",
+                (time.time() + (seconds or self.visibility_timeout), lease.id, LEASED, owner),
+            )
+            return cursor.rowcount == 1
+
+    def ack(self, lease: Lease, owner: str) -> bool:
+        """
+        Mark a leased item done. Returns False when the lease was lost
+        (expired and taken by another worker).
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE items SET state = ?, lease_until = NULL, updated_at = ? WHERE id = ? AND state = ? AND owner = ?",
+                (DONE, time.time(), lease.id, LEASED, owner),
+            )
+            return cursor.rowcount == 1
+
+    def nack(self, lease: Lease, owner: str, error: str, retry: bool = True, delay: float = 0.0) -> bool:
+        """
+        Give a leased item back after a failure: it becomes ready again after
+        `delay` seconds, or dead when not retryable or out of attempts.
+        """
+        state = READY if retry and lease.attempts < self.max_attempts else DEAD
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE items SET state = ?, lease_until = NULL, not_before = ?, last_error = ?, updated_at = ?
+                WHERE id = ? AND state = ? AND owner = ?
+                """,
+                (state, now + delay, error[:500], now, lease.id, LEASED, owner),
+            )
+            return cursor.rowcount == 1
+
+    def acquire(self, rate: float, burst: float = 1.0, name: str = GLOBAL_BUCKET) -> float:
+        """
+        Take one request token from the shared bucket refilled at `rate`
+        tokens per second.
+
+        Returns:
+            0 when a token was taken, else the seconds to wait before retrying.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT tokens, updated_at, paused_until FROM buckets WHERE name = ?", (name,)
+            ).fetchone()
+            tokens, updated_at, paused_until = row if row is not None else (burst, now, 0.0)
+            if paused_until > now:
+                return paused_until - now
+
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            wait = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                wait = (1.0 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated_at, paused_until) VALUES (?, ?, ?, ?)",
+                (name, tokens, now, paused_until),
+            )
+            return wait
+
+    def pause(self, seconds: float, name: str = GLOBAL_BUCKET) -> None:
+        """
+        Stop every worker from requesting for `seconds` (server throttling).
+        """
+        until = time.time() + seconds
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO buckets (name, tokens, updated_at, paused_until) VALUES (?, 0, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET paused_until = MAX(paused_until, excluded.paused_until)
+                """,
+                (name, time.time(), until),
+            )
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        rows = self._conn.execute("SELECT kind, state, COUNT(*) FROM items GROUP BY kind, state").fetchall()
+        summary: Dict[str, Dict[str, int]] = {}
+        for kind, state, count in rows:
+            summary.setdefault(kind, {})[state] = count
+        return summary
+
+    def pending(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM items WHERE state IN (?, ?)", (READY, LEASED)
+        ).fetchone()[0]
+
+
+# ---------------------------------------------------------------------------
+# Coordinator and worker
+# ---------------------------------------------------------------------------
+
+
+def article_path(url: str) -> Path:
+    from Automation.automation import STAGE3_DIR
+
+    return STAGE3_DIR / "queue" / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+
+
+def coordinate(queue: WorkQueue, keys: Iterable[int], links_path: Optional[Path] = None) -> Dict[str, int]:
+    """
+    Enqueue timeline keys, and the article links of a stage 2 catalogue.
+    """
+    queued = {TIMELINE_KIND: queue.enqueue(TIMELINE_KIND, ((key, {"key": key}) for key in keys))}
+    if links_path is not None:
+        with Path(links_path).open("r", encoding="utf-8") as fp:
+            links = json.load(fp)
+        queued[ARTICLE_KIND] = queue.enqueue(
+            ARTICLE_KIND, ((entry["link"], {"link": entry["link"], "key": entry["key"]}) for entry in links)
+        )
+    return queued
+
+
+def _process(lease: Lease, queue: WorkQueue, relevant_only: bool) -> None:
+    from Automation.automation import (
+        _timeline_path,
+        _write_timeline_page,
+        fetch_article_page,
+        fetch_timeline_page,
+    )
+    from stage2 import process_each_file
+
+    if lease.kind == TIMELINE_KIND:
+        key = int(lease.payload["key"])
+        page = fetch_timeline_page(key=key, raise_for_status=True, compact=True)
+        _write_timeline_page(_timeline_path(key, compact=True), page)
+        entries = process_each_file(page, relevant_only=relevant_only)
+        queue.enqueue(
+            ARTICLE_KIND, ((entry["link"], {"link": entry["link"], "key": key}) for entry in entries)
+        )
+    else:
+        url = str(lease.payload["link"])
+        page = fetch_article_page(url=url, key=lease.payload["key"], raise_for_status=True)
+        with atomic_open(article_path(url), "w") as fp:
+            json.dump(page, fp, ensure_ascii=False)
+
+
+def run_worker(
+    queue: WorkQueue,
+    worker_id: str,
+    rate: float = 0.5,
+    burst: float = 1.0,
+    relevant_only: bool = False,
+    idle_exit: float = 60.0,
+) -> Dict[str, int]:
+    """
+    Lease, fetch, store and acknowledge items until the queue has stayed
+    empty for `idle_exit` seconds.
+
+    Args:
+        queue: Shared queue.
+        worker_id: Lease owner name, unique per worker process.
+        rate: Requests per second allowed to all workers together.
+        burst: Requests the shared bucket may accumulate.
+        relevant_only: Only enqueue the article links passing the snippet
+            relevance prefilter.
+        idle_exit: Seconds without work before the worker stops.
+    """
+    import urllib3
+
+    from stage1 import FetchError
+
+    counts = {"done": 0, "retried": 0, "dead": 0, "lost": 0}
+    idle_since = time.monotonic()
+    while True:
+        leases = queue.lease(worker_id)
+        if not leases:
+            if time.monotonic() - idle_since > idle_exit:
+                break
+            time.sleep(min(5.0, queue.visibility_timeout / 4))
+            continue
+        idle_since = time.monotonic()
+
+        lease = leases[0]
+        wait = queue.acquire(rate, burst)
+        while wait > 0:
+            time.sleep(wait)
+            wait = queue.acquire(rate, burst)
+        if not queue.extend(lease, worker_id):
+            counts["lost"] += 1
+            continue
+
+        try:
+            _process(lease, queue, relevant_only)
+        except FetchError as exc:
+            transient = exc.status in TRANSIENT_STATUSES
+            if exc.status == 429 or (exc.status is not None and exc.status >= 500):
+                queue.pause(parse_retry_after(exc.retry_after) or 30.0)
+            queue.nack(lease, worker_id, str(exc), retry=transient, delay=2.0 ** lease.attempts)
+            counts["retried" if transient else "dead"] += 1
+            print(f"[worker {worker_id}] {lease.kind} {lease.item} failed: {exc}")
+            continue
+        except urllib3.exceptions.HTTPError as exc:
+            queue.nack(lease, worker_id, str(exc), delay=2.0 ** lease.attempts)
+            counts["retried"] += 1
+            print(f"[worker {worker_id}] {lease.kind} {lease.item} failed: {exc}")
+            continue
+        except Exception as exc:
+            # malformed item or local error: retrying would fail the same way
+            queue.nack(lease, worker_id, f"{type(exc).__name__}: {exc}", retry=False)
+            counts["dead"] += 1
+            print(f"[worker {worker_id}] {lease.kind} {lease.item} failed: {type(exc).__name__}: {exc}")
+            continue
+
+        if queue.ack(lease, worker_id):
+            counts["done"] += 1
+        else:
+            counts["lost"] += 1
+
+    print(f"[worker {worker_id}] idle, stopping: {counts}")
+    return counts
+
+
+def collect(step: int = 1000) -> List[Path]:
+    """
+    Pack the article pages stored by workers into stage 3 batch files
+    (`page_data_queue_{n}.json`) and remove the packed pages.
+    """
+    from Automation.automation import STAGE3_DIR
+
+    queue_dir = STAGE3_DIR / "queue"
+    pages = sorted(queue_dir.glob("*.json")) if queue_dir.exists() else []
+    # next free index: counting the files would reuse the index of a
+    # deleted batch and overwrite the last one
+    indexes = [-1]
+    for batch_file in STAGE3_DIR.glob("page_data_queue_*.json"):
+        try:
+            indexes.append(int(batch_file.stem.rsplit("_", 1)[1]))
+        except ValueError:
+            continue
+    next_index = max(indexes) + 1
+
+    outputs = []
+    for start in range(0, len(pages), step):
+        batch = pages[start:start + step]
+        payload = []
+        for page_file in batch:
+            with page_file.open("r", encoding="utf-8") as fp:
+                payload.append(json.load(fp))
+        output_path = STAGE3_DIR / f"page_data_queue_{next_index + len(outputs)}.json"
+        with atomic_open(output_path, "w") as fp:
+            json.dump(payload, fp, indent=4, ensure_ascii=False)
+        for page_file in batch:
+            page_file.unlink()
+        outputs.append(output_path)
+    return outputs
+
+
+def main() -> None:
+    from Automation.automation import BASE_DIR
+
+    parser = argparse.ArgumentParser(description="Distributed crawl over a shared work queue")
+    parser.add_argument("--queue", type=Path, default=BASE_DIR / "work_queue.sqlite")
+    parser.add_argument("--visibility-timeout", type=float, default=120.0)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    coordinator_parser = subparsers.add_parser("coordinator", help="enqueue timeline keys / article links")
+    coordinator_parser.add_argument("--start-key", type=int, required=True)
+    coordinator_parser.add_argument("--end-key", type=int, required=True)
+    coordinator_parser.add_argument("--links", type=Path, help="also enqueue the links of a stage 2 catalogue")
+
+    worker_parser = subparsers.add_parser("worker", help="lease and process items")
+    worker_parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    worker_parser.add_argument("--rate", type=float, default=0.5, help="requests/sec for all workers together")
+    worker_parser.add_argument("--burst", type=float, default=1.0)
+    worker_parser.add_argument("--relevant-only", action="store_true")
+    worker_parser.add_argument("--idle-exit", type=float, default=60.0)
+
+    collect_parser = subparsers.add_parser("collect", help="pack fetched articles into stage 3 batches")
+    collect_parser.add_argument("--step", type=int, default=1000)
+
+    subparsers.add_parser("status", help="queue counts per kind and state")
+    args = parser.parse_args()
+
+    with WorkQueue(args.queue, visibility_timeout=args.visibility_timeout) as queue:
+        if args.command == "coordinator":
+            queued = coordinate(queue, range(args.start_key, args.end_key), args.links)
+            print(f"[coordinator] queued {queued}")
+        elif args.command == "worker":
+            run_worker(queue, args.worker_id, args.rate, args.burst, args.relevant_only, args.idle_exit)
+        elif args.command == "collect":
+            for output_path in collect(args.step):
+                print(f"[collect] wrote {output_path}")
+        print(f"[queue] {queue.stats()}")
+
+
+if __name__ == "__main__":
+    main()
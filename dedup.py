@@ -0,0 +1,253 @@
+r"""
+Near-duplicate detection over the stage 4 articles.
+
+Cafef republishes and lightly edits stories, and `PostProcessing` merges
+every article of a day into `merge_corpus`, so duplicated text is paid for
+again by the encoder and the LLM. This module:
+
+1. turns every article corpus into word 5-shingles and a MinHash signature,
+2. indexes the signatures in a banded LSH index (`bands` x `rows`), so
+   only articles sharing a band are compared, which stays sub-quadratic on
+   100k+ articles,
+3. clusters the candidate pairs whose estimated Jaccard similarity reaches
+   `threshold` (union-find, across days),
+4. keeps the earliest (then longest) article of every cluster and writes
+   the others to `stage_4_data/duplicates.json`, which `PostProcessing`
+   skips when it merges the corpora.
+
+Usage:
+    python dedup.py                       # write duplicates.json and print the report
+    python dedup.py --threshold 0.9 --bands 20 --rows 6
+"""
+import argparse
+import glob
+import json
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+
+import numpy as np
+
+DEFAULT_DUPLICATES_PATH = 'stage_4_data/duplicates.json'
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text: str, size: int = 5)->Set[int]:
+    r"""
+    32 bit hashes of the word `size`-grams of a lower cased text
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        words = words + [''] * (size - len(words))
+    return {
+        zlib.crc32(" ".join(words[ith:ith + size]).encode('utf-8'))
+        for ith in range(len(words) - size + 1)
+    }
+
+
+class MinHasher(object):
+    r"""
+    Args:
+        num_perm (int): number of hash permutations (signature length)
+        seed (int): seed of the permutation parameters
+    """
+    def __init__(self, num_perm: int = 128, seed: int = 1)->None:
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        # a < 2**29 and x < 2**32 keep a * x + b below 2**62, no uint64 overflow
+        self._a = generator.randint(1, 1 << 29, size = num_perm, dtype = np.uint64)
+        self._b = generator.randint(0, _MAX_HASH, size = num_perm, dtype = np.uint64)
+
+    def signature(self, hashes: Set[int])->np.ndarray:
+        values = np.fromiter(hashes, dtype = np.uint64, count = len(hashes))
+        permuted = (values[:, None] * self._a[None, :] + self._b[None, :]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis = 0)
+
+    @staticmethod
+    def similarity(left: np.ndarray, right: np.ndarray)->float:
+        r"""
+        Estimated Jaccard similarity of two signatures
+        """
+        return float(np.mean(left == right))
+
+
+class LSHIndex(object):
+    r"""
+    Banded LSH over MinHash signatures: two signatures are candidates when
+    they agree on all `rows` values of at least one of the `bands` bands.
+    Pairs with Jaccard similarity s are found with probability
+    1 - (1 - s^rows)^bands, about 0.7 at (1 / bands)^(1 / rows)
+    """
+    def __init__(self, bands: int = 16, rows: int = 8)->None:
+        self.bands = bands
+        self.rows = rows
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(bands)]
+
+    def add(self, item: int, signature: np.ndarray)->List[int]:
+        r"""
+        Insert a signature and return the items already sharing a band with it
+        """
+        candidates = set()
+        for band, buckets in enumerate(self._buckets):
+            key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            bucket = buckets[key]
+            candidates.update(bucket)
+            bucket.append(item)
+        return sorted(candidates)
+
+
+class _UnionFind(object):
+    def __init__(self, size: int)->None:
+        self.parent = list(range(size))
+
+    def find(self, item: int)->int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, left: int, right: int)->None:
+        left, right = self.find(left), self.find(right)
+        if left != right:
+            self.parent[max(left, right)] = min(left, right)
+
+
+def _date_key(article: Dict)->tuple:
+    return (article['year'], article['month'], article['day'])
+
+
+def find_duplicates(
+        articles: List[Dict],
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: int = 16,
+        rows: int = 8
+    )->List[Dict[str, str]]:
+    r"""
+    Cluster near-duplicate articles and pick one representative per cluster
+    Args:
+        articles (List[Dict]): stage 4 items (url, day, month, year, corpus)
+        threshold (float): minimum estimated Jaccard similarity of a pair
+    Returns:
+        one {'url', 'duplicate_of', 'similarity'} entry per dropped article
+    """
+    if bands * rows > num_perm:
+        raise ValueError(f"bands * rows ({bands * rows}) exceeds num_perm ({num_perm})")
+
+    hasher = MinHasher(num_perm = num_perm)
+    index = LSHIndex(bands = bands, rows = rows)
+    clusters = _UnionFind(len(articles))
+    signatures: List[np.ndarray] = []
+    best_similarity: Dict[int, float] = {}
+
+    for ith, article in enumerate(articles):
+        signature = hasher.signature(shingles(article['corpus']))
+        signatures.append(signature)
+        for other in index.add(ith, signature):
+            similarity = MinHasher.similarity(signature, signatures[other])
+            if similarity >= threshold:
+                clusters.union(ith, other)
+                best_similarity[ith] = max(best_similarity.get(ith, 0.0), similarity)
+                best_similarity[other] = max(best_similarity.get(other, 0.0), similarity)
+
+    members = defaultdict(list)
+    for ith in range(len(articles)):
+        members[clusters.find(ith)].append(ith)
+
+    duplicates = []
+    for group in members.values():
+        if len(group) < 2:
+            continue
+        keep = min(group, key = lambda ith: (_date_key(articles[ith]), -len(articles[ith]['corpus'])))
+        for ith in group:
+            if ith != keep:
+                duplicates.append({
+                    'url': articles[ith]['url'],
+                    'duplicate_of': articles[keep]['url'],
+                    'similarity': round(best_similarity.get(ith, threshold), 3)
+                })
+    return duplicates
+
+
+def dedup_report(articles: List[Dict], duplicates: Iterable[Dict[str, str]])->Dict[str, float]:
+    r"""
+    Articles, bytes and (whitespace) tokens removed by dropping the duplicates
+    """
+    dropped = {item['url'] for item in duplicates}
+    total_bytes = sum(len(article['corpus'].encode('utf-8')) for article in articles)
+    total_tokens = sum(len(article['corpus'].split()) for article in articles)
+    removed = [article for article in articles if article['url'] in dropped]
+    removed_bytes = sum(len(article['corpus'].encode('utf-8')) for article in removed)
+    removed_tokens = sum(len(article['corpus'].split()) for article in removed)
+
+    return {
+        'articles': len(articles),
+        'duplicates': len(removed),
+        'bytes': total_bytes,
+        'bytes_removed': removed_bytes,
+        'tokens': total_tokens,
+        'tokens_removed': removed_tokens,
+        'removed_ratio': removed_bytes / total_bytes if total_bytes else 0.0,
+    }
+
+
+def load_articles(pattern: str = 'stage_4_data/page_data_*.json')->List[Dict]:
+    r"""
+    Stage 4 articles, unique by url
+    """
+    articles = {}
+    for json_file in sorted(glob.glob(pattern)):
+        with open(json_file, 'r') as fp:
+            for item in json.load(fp):
+                articles.setdefault(item['url'], item)
+    return list(articles.values())
+
+
+def load_duplicate_urls(path: str = DEFAULT_DUPLICATES_PATH)->Set[str]:
+    r"""
+    Urls of the articles marked as duplicates, empty when dedup was not run
+    """
+    try:
+        with open(path, 'r') as fp:
+            return {item['url'] for item in json.load(fp)}
+    except FileNotFoundError:
+        return set()
+
+
+def run_dedup(
+        pattern: str = 'stage_4_data/page_data_*.json',
+        output_path: str = DEFAULT_DUPLICATES_PATH,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: int = 16,
+        rows: int = 8
+    )->Dict[str, float]:
+    articles = load_articles(pattern)
+    duplicates = find_duplicates(articles, threshold, num_perm, bands, rows)
+    with open(output_path, 'w') as fp:
+        json.dump(duplicates, fp, indent = 4, ensure_ascii = False)
+
+    report = dedup_report(articles, duplicates)
+    print(f'[dedup] {report}')
+    return report
+
+
+def main()->None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', type = str, default = 'stage_4_data/page_data_*.json')
+    parser.add_argument('--output', type = str, default = DEFAULT_DUPLICATES_PATH)
+    parser.add_argument('--threshold', type = float, default = 0.8)
+    parser.add_argument('--num-perm', type = int, default = 128)
+    parser.add_argument('--bands', type = int, default = 16)
+    parser.add_argument('--rows', type = int, default = 8)
+    args = parser.parse_args()
+
+    run_dedup(args.input, args.output, args.threshold, args.num_perm, args.bands, args.rows)
+
+
+if __name__ == '__main__':
+    main()
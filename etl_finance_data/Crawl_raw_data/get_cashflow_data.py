@@ -1,22 +1,13 @@
-import pandas as pd
-import mysql.connector
 from mysql.connector import Error
-from vnstock import listing_companies
-from datetime import datetime
-from vnstock import stock_historical_data
 from vnstock import financial_flow
-from vnstock import financial_ratio
-from vnstock import financial_report
-from sqlalchemy import create_engine
+from Automation.db import get_database
+from etl_finance_data.bulk_loader import bulk_insert
+from etl_finance_data.config import DB_CONFIG
 def cashFlow(tickers):
+        db = get_database(DB_CONFIG)
         for ticker in tickers:
             # Kết nối với cơ sở dữ liệu MySQL
-            conn = mysql.connector.connect(
-                host='127.0.0.1',
-                database='stock',
-                user='root',
-                password='Clbtoanhoc48'
-            )
+            conn = db.get_connection()  # pooled, close() returns it to the pool
             try:
                 # Lấy báo cáo tài chính (báo cáo dòng tiền) của công ty hàng quys
                 new_record = financial_flow(symbol=ticker, report_type='cashflow', report_range='quarterly')
@@ -30,17 +21,9 @@ def cashFlow(tickers):
                 try:
                     if conn.is_connected():
                         table = 'cash_flow'
-                        cursor = conn.cursor()
-
-                        # Duyệt qua từng dòng dữ liệu và chèn vào MySQL
-                        for i, row in new_record.iterrows():
-                            sql = (
-                                "INSERT INTO " + table + " VALUES ("
-                                "%s, %s, %s, %s, %s, %s, %s, %s)"
-                            )
-                            cursor.execute(sql, tuple(row))
-                            print("Record inserted")
-                        conn.commit()
+                        # Chèn toàn bộ dữ liệu của ticker theo lô, 1 transaction
+                        stats = bulk_insert(conn, table, new_record)
+                        print(f'Inserted {stats}')
                     else:
                         print("Not connected to MySQL")
                         break
@@ -53,9 +36,10 @@ def cashFlow(tickers):
             except Exception as ex:
                 print(f'Error while extracting data for {ticker}', ex)
 
-# Danh sách các mã cổ phiếu
-tickers = [
-        'ACB'
-    ]
-# Gọi hàm xử lý dữ liệu
-cashFlow(tickers)
\ No newline at end of file
+if __name__ == '__main__':
+    # Danh sách các mã cổ phiếu
+    tickers = [
+            'ACB'
+        ]
+    # Gọi hàm xử lý dữ liệu
+    cashFlow(tickers)
\ No newline at end of file
@@ -1,38 +1,26 @@
-import pandas as pd
 import mysql.connector
-from mysql.connector import Error
 from vnstock import listing_companies
-from datetime import datetime
-from vnstock import stock_historical_data
-from vnstock import financial_flow
-from vnstock import financial_ratio
-from vnstock import financial_report
-from sqlalchemy import create_engine
-# Lấy danh sách các công ty niêm yết và chỉ lấy 13 cột đầu tiên
-companies = listing_companies()
-filtered_companies = companies.iloc[:, :13]
-print(filtered_companies)
-# Thiết lập kết nối với MySQL
-connection = mysql.connector.connect(
-    host='127.0.0.1',
-    database='stock',
-    user='root',
-    password='Clbtoanhoc48'
-)
+from etl_finance_data.bulk_loader import bulk_insert
 
-cursor = connection.cursor()
-table = 'company'
-for i, row in filtered_companies.iterrows():
-    sql = (
-        "INSERT INTO " + 'company' + " VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+if __name__ == '__main__':
+    # Lấy danh sách các công ty niêm yết và chỉ lấy 13 cột đầu tiên
+    companies = listing_companies()
+    filtered_companies = companies.iloc[:, :13]
+    print(filtered_companies)
+    # Thiết lập kết nối với MySQL
+    connection = mysql.connector.connect(
+        host='127.0.0.1',
+        database='stock',
+        user='root',
+        password='Clbtoanhoc48'
     )
-    cursor.execute(sql, tuple(row))
 
-# Xác nhận thay đổi
-connection.commit()
+    table = 'company'
+    # Chèn toàn bộ danh sách công ty theo lô, 1 transaction
+    stats = bulk_insert(connection, table, filtered_companies)
+    print(f'Inserted {stats}')
 
-# Đóng kết nối
-cursor.close()
-connection.close()
+    # Đóng kết nối
+    connection.close()
 
-print("Dữ liệu đã được đẩy lên MySQL thành công.")
\ No newline at end of file
+    print("Dữ liệu đã được đẩy lên MySQL thành công.")
\ No newline at end of file
@@ -1,22 +1,13 @@
-import pandas as pd
-import mysql.connector
 from mysql.connector import Error
-from vnstock import listing_companies
-from datetime import datetime
-from vnstock import stock_historical_data
-from vnstock import financial_flow
 from vnstock import financial_ratio
-from vnstock import financial_report
-from sqlalchemy import create_engine
+from Automation.db import get_database
+from etl_finance_data.bulk_loader import bulk_insert
+from etl_finance_data.config import DB_CONFIG
 def ratio(tickers):
+    db = get_database(DB_CONFIG)
     for ticker in tickers:
         # Connect to MySQL database
-        conn = mysql.connector.connect(
-            host='127.0.0.1',
-            database='stock',
-            user='root',
-            password='Clbtoanhoc48'
-        )
+        conn = db.get_connection()  # pooled, close() returns it to the pool
         try:
             # Fetch financial ratios quarterly
             new_record = financial_ratio(ticker, 'quarterly', True)
@@ -31,19 +22,9 @@ def ratio(tickers):
             try:
                 if conn.is_connected():
                     table = 'ratio'
-                    cursor = conn.cursor()
-
-                    # Iterate through each row and insert into MySQL
-                    for i, row in new_record.iterrows():
-                        sql = (
-                            "INSERT INTO " + table + " VALUES (" +
-                            "%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, " +
-                            "%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, " +
-                            "%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, " +
-                            "%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
-                        )
-                        cursor.execute(sql, tuple(row))
-                    conn.commit()
+                    # Insert all rows of the ticker in batches, one transaction
+                    stats = bulk_insert(conn, table, new_record)
+                    print(f'Inserted {stats}')
                 else:
                     print("Not connected to MySQL")
                     break
@@ -56,15 +37,16 @@ def ratio(tickers):
         except Exception as ex:
             print(f'Error while extracting data for {ticker}', ex)
 
-# List of stock tickers
-tickers = [
-    'ACB'
-]
-# tickers = [
-#     'HPT', 'ICT', 
-#     'PMJ', 'PMT', 'SBD', 
-#     'poVIE', 'VTE'
-# ]
+if __name__ == '__main__':
+    # List of stock tickers
+    tickers = [
+        'ACB'
+    ]
+    # tickers = [
+    #     'HPT', 'ICT', 
+    #     'PMJ', 'PMT', 'SBD', 
+    #     'poVIE', 'VTE'
+    # ]
 
-# Call the function to process data
-ratio(tickers)
\ No newline at end of file
+    # Call the function to process data
+    ratio(tickers)
\ No newline at end of file
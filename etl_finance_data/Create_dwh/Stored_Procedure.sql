@@ -113,16 +113,7 @@ END //
 
 DELIMITER ;
 
--- Tạo trigger để tự động gọi stored procedure sau khi insert vào cashflow
+-- Không còn dùng trigger FOR EACH ROW để gọi stored procedure: mỗi dòng insert sẽ chạy lại toàn bộ join + unpivot.
+-- Các script trong Insert_raw_data gọi etl_finance_data/refresh.py một lần cuối mỗi batch, chỉ cập nhật các key (ticker, year, quarter) vừa insert.
+-- Procedure bên trên vẫn giữ lại để rebuild thủ công khi cần.
 DROP TRIGGER IF EXISTS trg_cashflow_after_insert;
-
-DELIMITER //
-
-CREATE TRIGGER trg_cashflow_after_insert
-AFTER INSERT ON cash_flow
-FOR EACH ROW
-BEGIN
-    CALL UpdateFactFinancialStatement();
-END //
-
-DELIMITER ;
\ No newline at end of file
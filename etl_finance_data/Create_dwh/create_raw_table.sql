@@ -53,7 +53,8 @@ CREATE TABLE balance_sheet (
     minorShareHolderProfit DECIMAL(20, 2),
     payable DECIMAL(20, 2),
     year INT,
-    quarter INT
+    quarter INT,
+    PRIMARY KEY (ticker, year, quarter)
 );
 
 -- Create Table cash_flow
@@ -64,7 +65,9 @@ CREATE TABLE cash_flow (
     fromFinancial DECIMAL(20, 2),
     fromSale DECIMAL(20, 2),
     freeCashFlow DECIMAL(20, 2),
-    year INT
+    year INT,
+    quarter INT,
+    PRIMARY KEY (ticker, year, quarter)
 );
 
 -- Create Table Income
@@ -91,7 +94,9 @@ CREATE TABLE income (
     provisionExpense DECIMAL(20, 2),
     operationIncome DECIMAL(20, 2),
     ebitda DECIMAL(20, 2),
-    year INT
+    year INT,
+    quarter INT,
+    PRIMARY KEY (ticker, year, quarter)
 );
 
 -- Create table price_stock
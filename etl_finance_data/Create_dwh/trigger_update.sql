@@ -1,16 +1,7 @@
--- Trigger sau khi thêm dữ liệu vào bảng cashflow (vì bảng cashflow sẽ được insert cuối nên trigger này sẽ thực hiện sau khi bảng cashflow được thêm)
-CREATE TRIGGER trg_cashflow_after_insert
-AFTER INSERT ON cashflow
-FOR EACH ROW
-BEGIN
-    CALL UpdateFactFinancialStatement();
-END;
+-- Các trigger AFTER INSERT ... FOR EACH ROW trước đây gọi UpdateFactFinancialStatement() / UpdateFactFinancialRatio()
+-- cho từng dòng được insert, nên insert 40 quý của một ticker sẽ chạy lại toàn bộ join và unpivot 40 lần.
+-- Việc cập nhật bảng Stage/Fact giờ được thực hiện bởi etl_finance_data/refresh.py, được các script Insert_raw_data
+-- gọi một lần cuối mỗi batch và chỉ cập nhật các key (ticker, year, quarter) vừa thay đổi.
+DROP TRIGGER IF EXISTS trg_cashflow_after_insert;
 
--- Trigger UpdateFactFinancialRatio sau khi bảng ratio được thêm
-
-CREATE TRIGGER trg_ratio_after_insert
-AFTER INSERT ON ratio
-FOR EACH ROW
-BEGIN
-    CALL UpdateFactFinancialRatio();
-END;
+DROP TRIGGER IF EXISTS trg_ratio_after_insert;
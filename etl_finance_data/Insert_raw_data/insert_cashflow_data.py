@@ -1,75 +1,29 @@
 import pandas as pd
-import mysql.connector
-from mysql.connector import Error
 from vnstock import financial_flow
-from datetime import datetime
+from etl_finance_data.incremental_sync import sync_tickers
+from etl_finance_data.refresh import refresh_financial_statement
 # 2. Cash Flow - Optimized
-def cashFlow(tickers):
-    for ticker in tickers:
-        conn = mysql.connector.connect(
-            host='127.0.0.1',
-            database='stock',
-            user='root',
-            password='Clbtoanhoc48'
-        )
-        try:
-            table = 'cash_flow'
-            cursor = conn.cursor()
-            
-            # Truy vấn năm và quý mới nhất
-            cursor.execute(f"SELECT MAX(year), MAX(quarter) FROM {table} WHERE ticker = '{ticker}'")
-            result = cursor.fetchone()
-            latest_year = result[0] if result[0] else 2010
-            latest_quarter = result[1] if result[1] else 1
-            
-            print(f'Latest data for {ticker}: Year {latest_year}, Quarter {latest_quarter}')
-            
-            # Lấy báo cáo dòng tiền
-            new_record = financial_flow(symbol=ticker, report_type='cashflow', report_range='quarterly')
-            new_record.reset_index(inplace=True)
-            new_record = new_record.fillna(0)
-            
-            # Tách year và quarter
-            new_record[['year', 'quarter']] = new_record['index'].str.split('-Q', expand=True)
-            new_record = new_record.drop('index', axis=1)
-            new_record['year'] = new_record['year'].astype(int)
-            new_record['quarter'] = new_record['quarter'].astype(int)
-            
-            print(f'Connected to database for {ticker}')
-            
-            if conn.is_connected():
-                cursor = conn.cursor()
-                inserted_count = 0
-                
-                for i, row in new_record.iterrows():
-                    # Kiểm tra trùng lặp
-                    check_sql = f"SELECT COUNT(*) FROM {table} WHERE ticker = %s AND year = %s AND quarter = %s"
-                    cursor.execute(check_sql, (row['ticker'], row['year'], row['quarter']))
-                    
-                    if cursor.fetchone()[0] == 0:
-                        if row['year'] > latest_year or (row['year'] == latest_year and row['quarter'] > latest_quarter):
-                            sql = (
-                                "INSERT INTO " + table + " VALUES ("
-                                "%s, %s, %s, %s, %s, %s, %s, %s)"
-                            )
-                            cursor.execute(sql, tuple(row))
-                            inserted_count += 1
-                
-                conn.commit()
-                print(f'Inserted {inserted_count} new records for {ticker}')
-            else:
-                print("Not connected to MySQL")
-                
-        except Error as e:
-            print(f'Error while inserting {ticker} to database', e)
-        except Exception as ex:
-            print(f'Error while extracting data for {ticker}', ex)
-        finally:
-            conn.close()
+def fetchCashFlow(ticker):
+    # Lấy báo cáo dòng tiền
+    new_record = financial_flow(symbol=ticker, report_type='cashflow', report_range='quarterly')
+    new_record.reset_index(inplace=True)
+    new_record = new_record.fillna(0)
+    
+    # Tách year và quarter
+    new_record[['year', 'quarter']] = new_record['index'].str.split('-Q', expand=True)
+    new_record = new_record.drop('index', axis=1)
+    new_record['year'] = new_record['year'].astype(int)
+    new_record['quarter'] = new_record['quarter'].astype(int)
+    return new_record
 
+def cashFlow(tickers):
+    # Chỉ ghi các quý mới hơn (year, quarter) mới nhất của từng ticker, upsert theo lô
+    # rồi cập nhật bảng Stage/Fact một lần cho các key vừa ghi
+    sync_tickers('cash_flow', tickers, fetchCashFlow, refresh=refresh_financial_statement)
 
-# Sử dụng
-tickers = ['ACB']
+if __name__ == '__main__':
+    # Sử dụng
+    tickers = ['ACB']
 
-# Gọi từng hàm
-cashFlow(tickers)
\ No newline at end of file
+    # Gọi từng hàm
+    cashFlow(tickers)
\ No newline at end of file
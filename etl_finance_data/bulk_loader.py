@@ -0,0 +1,108 @@
+"""
+Batched inserts for the etl_finance_data scripts.
+
+Rows are written with multi-row `INSERT ... VALUES (...), (...)` statements of
+`batch_size` rows each, inside a single transaction per call (one call per
+ticker in the crawl/insert scripts). Works with a mysql.connector connection
+or a sqlite3 connection as a local stand-in.
+"""
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import pandas as pd
+
+
+@dataclass
+class LoadStats:
+    table: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+    def __str__(self) -> str:
+        return f"{self.table}: {self.rows} rows in {self.seconds:.2f}s ({self.rows_per_sec:.0f} rows/s)"
+
+
+def _placeholder(conn) -> str:
+    return "?" if isinstance(conn, sqlite3.Connection) else "%s"
+
+
+def _to_rows(frame: pd.DataFrame) -> List[tuple]:
+    # astype(object) turns numpy scalars into python ones, NaN becomes NULL
+    values = frame.astype(object).where(frame.notna(), None)
+    return [tuple(row) for row in values.itertuples(index=False, name=None)]
+
+
+def build_insert_sql(
+    table: str,
+    n_columns: int,
+    n_rows: int,
+    columns: Optional[Sequence[str]] = None,
+    placeholder: str = "%s",
+    on_duplicate_update: Optional[Sequence[str]] = None,
+) -> str:
+    row_clause = "(" + ", ".join([placeholder] * n_columns) + ")"
+    column_clause = ""
+    if columns is not None:
+        column_clause = " (" + ", ".join(f"`{col}`" for col in columns) + ")"
+
+    sql = f"INSERT INTO {table}{column_clause} VALUES " + ", ".join([row_clause] * n_rows)
+    if on_duplicate_update:
+        updates = ", ".join(f"`{col}` = VALUES(`{col}`)" for col in on_duplicate_update)
+        sql += f" ON DUPLICATE KEY UPDATE {updates}"
+    return sql
+
+
+def bulk_insert(
+    conn,
+    table: str,
+    frame: pd.DataFrame,
+    batch_size: int = 500,
+    columns: Optional[Sequence[str]] = None,
+    on_duplicate_update: Optional[Sequence[str]] = None,
+) -> LoadStats:
+    """
+    Insert every row of `frame` into `table` and commit once.
+
+    Args:
+        conn: Open mysql.connector (or sqlite3) connection.
+        table: Target table name.
+        frame: Rows to insert, in table column order when `columns` is None.
+        batch_size: Number of rows per INSERT statement.
+        columns: Explicit column list for the INSERT, defaults to positional.
+        on_duplicate_update: Columns refreshed by `ON DUPLICATE KEY UPDATE`
+            (MySQL only) when a row hits an existing unique key.
+
+    Returns:
+        LoadStats with the row count and throughput.
+    """
+    started = time.perf_counter()
+    rows = _to_rows(frame)
+    placeholder = _placeholder(conn)
+
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            sql = build_insert_sql(
+                table,
+                n_columns=len(frame.columns),
+                n_rows=len(batch),
+                columns=columns,
+                placeholder=placeholder,
+                on_duplicate_update=on_duplicate_update,
+            )
+            cursor.execute(sql, [value for row in batch for value in row])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return LoadStats(table=table, rows=len(rows), seconds=time.perf_counter() - started)
@@ -0,0 +1,15 @@
+"""
+Database settings shared by the etl_finance_data modules.
+
+Values come from the MYSQL_* environment variables and fall back to the
+local development database used by the crawl/insert scripts.
+"""
+import os
+
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', '127.0.0.1'),
+    'port': int(os.getenv('MYSQL_PORT', '3306')),
+    'database': os.getenv('MYSQL_DATABASE', 'stock'),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', 'Clbtoanhoc48'),
+}
@@ -0,0 +1,264 @@
+"""
+Full-market refresh of the raw financial tables.
+
+Fetches the quarterly balance sheet, income statement, cash flow and ratio
+reports of every listed ticker (or the given ones) concurrently:
+
+- a thread pool runs one (report, ticker) task per worker,
+- all workers share one rate controller so the vnstock API sees at most
+  `--rate` requests per second (backing off while requests fail),
+- DB writes go through the shared connection pool of Automation/db.py
+  instead of one new connection per ticker,
+- a failed fetch (network/HTTP error) or upsert is retried `--retries`
+  times with exponential back-off; a report that does not fit its table
+  fails at once,
+- rows are filtered and upserted like `incremental_sync`, and the
+  Stage/Fact tables are refreshed once at the end for the keys written.
+
+Usage:
+    python -m etl_finance_data.crawl_all --workers 8 --rate 4
+    python -m etl_finance_data.crawl_all --tickers ACB VCB --reports ratio
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from Automation.db import Database, get_database
+from Automation.rate_control import THROTTLE_STATUSES, AdaptiveRateController
+from etl_finance_data.config import DB_CONFIG
+from etl_finance_data.incremental_sync import (
+    Watermark, align_columns, filter_new_rows, load_watermarks, table_columns, upsert_rows,
+)
+from etl_finance_data.refresh import Key, changed_keys, refresh_financial_ratio, refresh_financial_statement
+
+STATEMENT_TABLES = ['balance_sheet', 'income', 'cash_flow']
+REPORT_TABLES = STATEMENT_TABLES + ['ratio']
+
+
+def _fetchers() -> Dict[str, Callable[[str], pd.DataFrame]]:
+    # imported lazily, the insert scripts pull in vnstock
+    from etl_finance_data.Insert_raw_data.insert_balance_data import fetchBalanceSheet
+    from etl_finance_data.Insert_raw_data.insert_cashflow_data import fetchCashFlow
+    from etl_finance_data.Insert_raw_data.insert_income_data import fetchIncomeStatement
+    from etl_finance_data.Insert_raw_data.insert_ratio_data import fetchRatio
+
+    return {
+        'balance_sheet': fetchBalanceSheet,
+        'income': fetchIncomeStatement,
+        'cash_flow': fetchCashFlow,
+        'ratio': fetchRatio,
+    }
+
+
+def listed_tickers() -> List[str]:
+    from vnstock import listing_companies
+
+    return listing_companies()['ticker'].tolist()
+
+
+@dataclass
+class TableState:
+    columns: List[str]
+    watermarks: Dict[str, Watermark]
+
+
+@dataclass
+class TaskResult:
+    table: str
+    ticker: str
+    rows: int = 0
+    attempts: int = 0
+    keys: Set[Key] = field(default_factory=set)
+    error: Optional[str] = None
+
+
+@dataclass
+class CrawlSummary:
+    seconds: float = 0.0
+    tasks: int = 0
+    rows: Dict[str, int] = field(default_factory=dict)
+    failures: List[Tuple[str, str, str]] = field(default_factory=list)
+
+    def add(self, result: TaskResult) -> None:
+        self.tasks += 1
+        self.rows[result.table] = self.rows.get(result.table, 0) + result.rows
+        if result.error is not None:
+            self.failures.append((result.table, result.ticker, result.error))
+
+    def __str__(self) -> str:
+        total_rows = sum(self.rows.values())
+        lines = [
+            f'{self.tasks} tasks in {self.seconds:.1f}s '
+            f'({self.tasks / max(self.seconds, 1e-9):.2f} tasks/s, {total_rows} rows written)',
+        ]
+        lines += [f'  {table}: {rows} rows' for table, rows in self.rows.items()]
+        lines.append(f'  failed: {len(self.failures)}')
+        lines += [f'    {table} {ticker}: {error}' for table, ticker, error in self.failures[:20]]
+        if len(self.failures) > 20:
+            lines.append(f'    ... {len(self.failures) - 20} more')
+        return '\n'.join(lines)
+
+
+def _error_status(ex: Exception) -> Optional[int]:
+    # requests.HTTPError carries the response, network errors do not
+    return getattr(getattr(ex, 'response', None), 'status_code', None)
+
+
+def crawl_task(
+    table: str,
+    ticker: str,
+    fetch_frame: Callable[[str], pd.DataFrame],
+    state: TableState,
+    db: Database,
+    limiter: AdaptiveRateController,
+    retries: int = 3,
+    retry_delay: float = 2.0,
+) -> TaskResult:
+    """
+    Fetch one report of one ticker and upsert its new rows, with retries.
+
+    Only network/HTTP errors (OSError, which includes the requests
+    exceptions) are reported to the shared limiter as throttles. A frame
+    that does not match the table (ValueError) fails at once, and a failed
+    upsert is retried with the frame already fetched.
+    """
+    result = TaskResult(table=table, ticker=ticker)
+    frame = None
+    for attempt in range(retries + 1):
+        result.attempts = attempt + 1
+        limiter.acquire()
+        started = time.perf_counter()
+        try:
+            fetched = fetch_frame(ticker)
+        except OSError as ex:
+            status = _error_status(ex)
+            limiter.record(status, time.perf_counter() - started)
+            result.error = f'{type(ex).__name__}: {ex}'
+            if status is not None and status not in THROTTLE_STATUSES:
+                return result  # permanent HTTP error, e.g. 404
+        except ValueError as ex:
+            result.error = f'{type(ex).__name__}: {ex}'
+            return result
+        except Exception as ex:
+            result.error = f'{type(ex).__name__}: {ex}'
+        else:
+            limiter.record(200, time.perf_counter() - started)
+            try:
+                frame = align_columns(fetched, state.columns, table)
+            except ValueError as ex:
+                result.error = f'{type(ex).__name__}: {ex}'
+                return result
+            break
+        if attempt < retries:
+            time.sleep(retry_delay * 2 ** attempt)
+    if frame is None:
+        return result
+
+    new_rows = filter_new_rows(frame, state.watermarks)
+    if new_rows.empty:
+        result.error = None
+        return result
+    for attempt in range(retries + 1):
+        try:
+            db.run(
+                f'upsert_{table}',
+                lambda conn: upsert_rows(conn, table, new_rows),
+                rows=lambda stats: stats.rows,
+                idempotent=True,
+            )
+        except Exception as ex:
+            result.error = f'{type(ex).__name__}: {ex}'
+            if attempt < retries:
+                time.sleep(retry_delay * 2 ** attempt)
+            continue
+
+        result.rows = len(new_rows)
+        result.keys = changed_keys(new_rows)
+        result.error = None
+        return result
+    return result
+
+
+def crawl_all(
+    tickers: List[str],
+    tables: List[str] = REPORT_TABLES,
+    workers: int = 8,
+    rate: float = 4.0,
+    retries: int = 3,
+    db_config: Optional[Dict[str, object]] = None,
+) -> CrawlSummary:
+    """
+    Crawl `tables` for every ticker and refresh the Stage/Fact tables once.
+
+    Args:
+        tickers: Tickers to crawl.
+        tables: Raw tables (reports) to fill, a subset of REPORT_TABLES.
+        workers: Thread pool size, also the DB connection pool size.
+        rate: Maximum vnstock requests per second across all workers.
+        retries: Extra attempts for a failed (report, ticker) task.
+        db_config: MySQL settings, defaults to `config.DB_CONFIG`.
+
+    Returns:
+        CrawlSummary with throughput and failures.
+    """
+    fetchers = _fetchers()
+    db = get_database(db_config or DB_CONFIG, pool_size=workers)
+    limiter = AdaptiveRateController(
+        initial_rate=rate, min_rate=rate / 4, max_rate=rate, log_interval=30.0, name='vnstock'
+    )
+
+    with db.connection() as conn:
+        states = {
+            table: TableState(columns=table_columns(conn, table), watermarks=load_watermarks(conn, table))
+            for table in tables
+        }
+
+    summary = CrawlSummary()
+    written: Dict[str, Set[Key]] = {table: set() for table in tables}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(crawl_task, table, ticker, fetchers[table], states[table], db, limiter, retries)
+            for ticker in tickers
+            for table in tables
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            summary.add(result)
+            written[result.table] |= result.keys
+            if done % 100 == 0:
+                print(f'[crawl_all] {done}/{len(futures)} tasks, {len(summary.failures)} failed')
+    summary.seconds = time.perf_counter() - started
+
+    with db.connection() as conn:
+        statement_keys = set().union(*(written.get(table, set()) for table in STATEMENT_TABLES))
+        if statement_keys:
+            refresh_financial_statement(conn, statement_keys)
+        if written.get('ratio'):
+            refresh_financial_ratio(conn, written['ratio'])
+
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Crawl quarterly financial reports of all listed tickers')
+    parser.add_argument('--tickers', nargs='+', help='defaults to every ticker of listing_companies()')
+    parser.add_argument('--reports', nargs='+', choices=REPORT_TABLES, default=REPORT_TABLES)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=4.0, help='max vnstock requests per second')
+    parser.add_argument('--retries', type=int, default=3)
+    args = parser.parse_args()
+
+    tickers = args.tickers or listed_tickers()
+    print(f'[crawl_all] {len(tickers)} tickers x {len(args.reports)} reports, {args.workers} workers')
+    summary = crawl_all(tickers, args.reports, workers=args.workers, rate=args.rate, retries=args.retries)
+    print(summary)
+    print(get_database(DB_CONFIG).report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+Columnar store for the financial Fact tables.
+
+`Fact_FinancialStatement` / `Fact_FinancialRatio` are tall, unindexed MySQL
+tables built by unpivoting the Stage/ratio tables; any "metric X for tickers
+Y" question scans them in full. This module exports the same facts to a
+Parquet dataset partitioned by ticker and year:
+
+    fact_data/financial_statement/ticker=ACB/year=2024/<part>.parquet
+
+- the wide Stage/ratio rows are read once and unpivoted in pandas,
+- `financial_index` is written as a dictionary-encoded column and rows are
+  sorted by it, so a metric filter only decodes the matching row groups,
+- queries prune on the ticker/year directories before reading any file.
+
+The dataset is plain hive-partitioned Parquet, DuckDB can query it directly
+with `read_parquet('fact_data/financial_statement/**/*.parquet', hive_partitioning = 1)`.
+
+Usage:
+    python -m etl_finance_data.fact_store export
+    python -m etl_finance_data.fact_store query --metric revenue --tickers ACB VCB --quarters 2023-Q4 2024-Q1
+    python -m etl_finance_data.fact_store benchmark --metric revenue --tickers ACB VCB
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from etl_finance_data.config import DB_CONFIG
+from etl_finance_data.refresh import FINANCIAL_RATIO_INDEXES, FINANCIAL_STATEMENT_INDEXES
+
+DEFAULT_ROOT = Path(__file__).resolve().parent.parent / 'fact_data'
+
+# fact name -> (MySQL wide source table, MySQL fact table, metric list)
+FACTS: Dict[str, Tuple[str, str, List[str]]] = {
+    'financial_statement': ('Stage_FinancialStatement', 'Fact_FinancialStatement', FINANCIAL_STATEMENT_INDEXES),
+    'financial_ratio': ('ratio', 'Fact_FinancialRatio', FINANCIAL_RATIO_INDEXES),
+}
+
+Quarter = Tuple[int, int]
+
+
+def parse_quarter(value: str) -> Quarter:
+    """
+    '2024-Q1' -> (2024, 1)
+    """
+    year, quarter = value.upper().split('-Q')
+    return int(year), int(quarter)
+
+
+def unpivot_frame(wide: pd.DataFrame, indexes: List[str]) -> pd.DataFrame:
+    """
+    Wide (ticker, year, quarter, <metric columns>) rows to the tall fact
+    layout, with `financial_index` as a categorical over `indexes`.
+    """
+    tall = wide.melt(
+        id_vars=['ticker', 'year', 'quarter'],
+        value_vars=indexes,
+        var_name='financial_index',
+        value_name='value',
+    )
+    tall['ticker'] = tall['ticker'].astype(str)
+    tall['year'] = tall['year'].astype('int32')
+    tall['quarter'] = tall['quarter'].astype('int8')
+    tall['financial_index'] = pd.Categorical(tall['financial_index'], categories=indexes)
+    tall['value'] = pd.to_numeric(tall['value'], errors='coerce').astype('float64')
+    return tall.sort_values(['ticker', 'year', 'financial_index', 'quarter'], ignore_index=True)
+
+
+def read_wide(conn, fact: str, tickers: Optional[List[str]] = None) -> pd.DataFrame:
+    source, _, indexes = FACTS[fact]
+    columns = ', '.join(f'`{name}`' for name in indexes)
+    sql = f'SELECT ticker, year, CAST(quarter AS SIGNED) AS quarter, {columns} FROM {source}'
+    params: List[str] = []
+    if tickers:
+        sql += ' WHERE ticker IN (' + ', '.join(['%s'] * len(tickers)) + ')'
+        params = list(tickers)
+
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    names = [description[0] for description in cursor.description]
+    cursor.close()
+    return pd.DataFrame(rows, columns=names)
+
+
+def write_facts(tall: pd.DataFrame, root: Union[str, Path], fact: str) -> Path:
+    """
+    Write tall fact rows, replacing the ticker/year partitions they cover.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    output_dir = Path(root) / fact
+    pq.write_to_dataset(
+        pa.Table.from_pandas(tall, preserve_index=False),
+        root_path=str(output_dir),
+        partition_cols=['ticker', 'year'],
+        existing_data_behavior='delete_matching',
+        use_dictionary=['financial_index'],
+        row_group_size=len(FACTS[fact][2]) * 4,
+    )
+    return output_dir
+
+
+def export_facts(
+    conn,
+    root: Union[str, Path] = DEFAULT_ROOT,
+    facts: Iterable[str] = tuple(FACTS),
+    tickers: Optional[List[str]] = None,
+) -> Dict[str, int]:
+    """
+    Export the financial facts from MySQL to the Parquet store.
+
+    Args:
+        conn: Open mysql.connector connection.
+        root: Root directory of the store.
+        facts: Fact names to export, keys of FACTS.
+        tickers: Only export these tickers (their partitions are replaced).
+
+    Returns:
+        Number of fact rows written per fact.
+    """
+    written = {}
+    for fact in facts:
+        started = time.perf_counter()
+        tall = unpivot_frame(read_wide(conn, fact, tickers), FACTS[fact][2])
+        if not tall.empty:
+            write_facts(tall, root, fact)
+        written[fact] = len(tall)
+        print(f'[fact_store] {fact}: {len(tall)} rows in {time.perf_counter() - started:.2f}s')
+    return written
+
+
+def query_metric(
+    metric: str,
+    tickers: Iterable[str],
+    quarters: Optional[Iterable[Quarter]] = None,
+    fact: str = 'financial_statement',
+    root: Union[str, Path] = DEFAULT_ROOT,
+) -> pd.DataFrame:
+    """
+    Values of `metric` for `tickers` over `quarters`.
+
+    Args:
+        metric: A financial_index of the fact, e.g. 'revenue'.
+        tickers: Tickers to read, only their directories are opened.
+        quarters: (year, quarter) pairs, all quarters if omitted.
+        fact: Key of FACTS.
+        root: Root directory of the store.
+
+    Returns:
+        Rows (ticker, year, quarter, value) sorted by ticker and period.
+    """
+    import pyarrow.dataset as ds
+
+    tickers = list(tickers)
+    dataset = ds.dataset(str(Path(root) / fact), format='parquet', partitioning='hive')
+
+    row_filter = ds.field('ticker').isin(tickers) & (ds.field('financial_index') == metric)
+    periods = sorted(set(quarters)) if quarters is not None else None
+    if periods is not None:
+        row_filter = row_filter & ds.field('year').isin(sorted({year for year, _ in periods}))
+
+    table = dataset.to_table(columns=['ticker', 'year', 'quarter', 'value'], filter=row_filter)
+    result = table.to_pandas()
+    result['ticker'] = result['ticker'].astype(str)
+
+    if periods is not None:
+        wanted = pd.MultiIndex.from_tuples(periods, names=['year', 'quarter'])
+        result = result.loc[pd.MultiIndex.from_frame(result[['year', 'quarter']]).isin(wanted)]
+    return result.sort_values(['ticker', 'year', 'quarter'], ignore_index=True)
+
+
+def query_metric_mysql(
+    conn,
+    metric: str,
+    tickers: Iterable[str],
+    quarters: Optional[Iterable[Quarter]] = None,
+    fact: str = 'financial_statement',
+) -> pd.DataFrame:
+    """
+    Same question answered from the MySQL Fact table, used as the baseline.
+    """
+    tickers = list(tickers)
+    sql = (
+        f'SELECT ticker, year, CAST(quarter AS SIGNED), value FROM {FACTS[fact][1]} '
+        'WHERE financial_index = %s AND ticker IN (' + ', '.join(['%s'] * len(tickers)) + ')'
+    )
+    params: List[object] = [metric] + tickers
+    if quarters is not None:
+        periods = sorted(set(quarters))
+        sql += ' AND (year, quarter) IN (' + ', '.join(['(%s, %s)'] * len(periods)) + ')'
+        params += [value for period in periods for value in period]
+
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    result = pd.DataFrame(cursor.fetchall(), columns=['ticker', 'year', 'quarter', 'value'])
+    cursor.close()
+    return result.sort_values(['ticker', 'year', 'quarter'], ignore_index=True)
+
+
+def benchmark(
+    conn,
+    metric: str,
+    tickers: List[str],
+    quarters: Optional[List[Quarter]] = None,
+    fact: str = 'financial_statement',
+    root: Union[str, Path] = DEFAULT_ROOT,
+    repeat: int = 5,
+) -> Dict[str, float]:
+    """
+    Best-of-`repeat` latency (seconds) of the MySQL Fact query and the
+    Parquet query for the same question.
+    """
+    timings = {}
+    for label, run in [
+        ('mysql', lambda: query_metric_mysql(conn, metric, tickers, quarters, fact)),
+        ('parquet', lambda: query_metric(metric, tickers, quarters, fact, root)),
+    ]:
+        best = float('inf')
+        rows = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = len(run())
+            best = min(best, time.perf_counter() - started)
+        timings[label] = best
+        print(f'[fact_store] {label}: {rows} rows, best of {repeat}: {best * 1000:.1f} ms')
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Parquet store for the financial Fact tables')
+    parser.add_argument('command', choices=['export', 'query', 'benchmark'])
+    parser.add_argument('--root', default=str(DEFAULT_ROOT))
+    parser.add_argument('--fact', choices=list(FACTS), help='export: all facts by default')
+    parser.add_argument('--tickers', nargs='+')
+    parser.add_argument('--metric')
+    parser.add_argument('--quarters', nargs='+', help='periods like 2024-Q1')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    quarters = [parse_quarter(value) for value in args.quarters] if args.quarters else None
+    fact = args.fact or 'financial_statement'
+    if args.command == 'query':
+        print(query_metric(args.metric, args.tickers, quarters, fact, args.root).to_string(index=False))
+        return
+
+    from Automation.db import get_database
+
+    with get_database(DB_CONFIG).connection() as conn:
+        if args.command == 'export':
+            export_facts(conn, args.root, [args.fact] if args.fact else list(FACTS), args.tickers)
+        else:
+            benchmark(conn, args.metric, args.tickers, quarters, fact, args.root, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Incremental sync of quarterly reports into the raw tables.
+
+Shared by the Insert_raw_data scripts (balance sheet, income, cash flow,
+ratio):
+
+- one query loads the latest (year, quarter) of every ticker in the table;
+  the quarter is taken within the latest year, not independently of it,
+- fetched rows are filtered against that per-ticker watermark in pandas,
+  so no round trip per row is needed to detect duplicates,
+- new rows of consecutive tickers are buffered and written with batched
+  `INSERT ... ON DUPLICATE KEY UPDATE` through the shared connection pool
+  (Automation/db.py), relying on the (ticker, year, quarter) primary keys
+  of the raw tables (see migrations/001_raw_table_keys.sql for existing
+  databases),
+- the Stage/Fact tables are refreshed once for the keys written.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from Automation.db import BatchWriter, Database, get_database
+from etl_finance_data.bulk_loader import _to_rows, build_insert_sql, bulk_insert
+from etl_finance_data.config import DB_CONFIG
+from etl_finance_data.refresh import Key, changed_keys
+
+Watermark = Tuple[int, int]
+KEY_COLUMNS = ['ticker', 'year', 'quarter']
+
+
+def load_watermarks(conn, table: str) -> Dict[str, Watermark]:
+    """
+    Latest (year, quarter) stored for every ticker of `table`.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT t.ticker, t.year, MAX(CAST(t.quarter AS SIGNED))
+        FROM {table} t
+        JOIN (SELECT ticker, MAX(year) AS year FROM {table} GROUP BY ticker) latest
+            ON t.ticker = latest.ticker AND t.year = latest.year
+        GROUP BY t.ticker, t.year
+        """
+    )
+    watermarks = {str(ticker): (int(year), int(quarter)) for ticker, year, quarter in cursor.fetchall()}
+    cursor.close()
+    return watermarks
+
+
+def table_columns(conn, table: str) -> List[str]:
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+    cursor.fetchall()
+    columns = [description[0] for description in cursor.description]
+    cursor.close()
+    return columns
+
+
+def align_columns(frame: pd.DataFrame, columns: List[str], table: str) -> pd.DataFrame:
+    """
+    Rename the fetched columns positionally to the columns of `table`.
+    """
+    if len(frame.columns) != len(columns):
+        raise ValueError(f'{len(frame.columns)} columns fetched, {table} has {len(columns)}')
+    frame.columns = columns
+    return frame
+
+
+def filter_new_rows(frame: pd.DataFrame, watermarks: Dict[str, Watermark]) -> pd.DataFrame:
+    """
+    Keep the rows strictly newer than the watermark of their ticker. Tickers
+    without a watermark keep all their rows.
+    """
+    if frame.empty:
+        return frame
+
+    marks = pd.DataFrame(
+        [(ticker, year, quarter) for ticker, (year, quarter) in watermarks.items()],
+        columns=['ticker', 'latest_year', 'latest_quarter'],
+    )
+    # a left merge keeps the row order of `frame`
+    latest = frame[['ticker']].merge(marks, on='ticker', how='left')
+    latest_year = latest['latest_year'].fillna(-1).to_numpy()
+    latest_quarter = latest['latest_quarter'].fillna(-1).to_numpy()
+
+    year = frame['year'].astype(int).to_numpy()
+    quarter = frame['quarter'].astype(int).to_numpy()
+    is_new = (year > latest_year) | ((year == latest_year) & (quarter > latest_quarter))
+    return frame.loc[is_new]
+
+
+def upsert_rows(conn, table: str, frame: pd.DataFrame, batch_size: int = 500):
+    """
+    Batched `INSERT ... ON DUPLICATE KEY UPDATE` of `frame` into `table`.
+    """
+    columns = list(frame.columns)
+    return bulk_insert(
+        conn,
+        table,
+        frame,
+        batch_size=batch_size,
+        columns=columns,
+        on_duplicate_update=[col for col in columns if col not in KEY_COLUMNS],
+    )
+
+
+def upsert_sql(table: str, columns: List[str]) -> str:
+    """
+    Single-row `INSERT ... ON DUPLICATE KEY UPDATE` of `columns`, batched by
+    `Automation.db.BatchWriter`.
+    """
+    return build_insert_sql(
+        table,
+        n_columns=len(columns),
+        n_rows=1,
+        columns=columns,
+        on_duplicate_update=[col for col in columns if col not in KEY_COLUMNS],
+    )
+
+
+def sync_tickers(
+    table: str,
+    tickers: Iterable[str],
+    fetch_frame: Callable[[str], pd.DataFrame],
+    refresh: Optional[Callable[[object, Set[Key]], None]] = None,
+    db: Optional[Database] = None,
+    batch_size: int = 500,
+    flush_interval: float = 5.0,
+) -> Set[Key]:
+    """
+    Fetch every ticker, write only rows newer than its watermark and refresh
+    the dependent Stage/Fact tables once at the end.
+
+    New rows of consecutive tickers are buffered and upserted together, one
+    transaction per `batch_size` rows or per `flush_interval` seconds.
+
+    Args:
+        table: Raw table name.
+        tickers: Tickers to sync.
+        fetch_frame: Returns the report rows of one ticker in table column
+            order; columns are renamed positionally to the table columns.
+        refresh: Called once with a connection and the written keys (see
+            etl_finance_data.refresh).
+        db: Shared database, `get_database(DB_CONFIG)` if omitted.
+
+    Returns:
+        The (ticker, year, quarter) keys written.
+    """
+    db = db or get_database(DB_CONFIG)
+    with db.connection() as conn:
+        watermarks = load_watermarks(conn, table)
+        columns = table_columns(conn, table)
+
+    written: Set[Key] = set()
+    writer = BatchWriter(db, f'upsert_{table}', upsert_sql(table, columns), batch_size, flush_interval, idempotent=True)
+    with writer:
+        for ticker in tickers:
+            try:
+                frame = align_columns(fetch_frame(ticker), columns, table)
+                new_rows = filter_new_rows(frame, watermarks)
+                print(f'Latest data for {ticker}: {watermarks.get(ticker)}, {len(new_rows)}/{len(frame)} rows are new')
+                if new_rows.empty:
+                    continue
+            except Exception as ex:
+                print(f'Error while syncing {ticker} into {table}', ex)
+                continue
+            written |= changed_keys(new_rows)
+            writer.extend(_to_rows(new_rows))
+
+    # rows rejected by the database (after the batch was retried row by row)
+    positions = [columns.index(col) for col in KEY_COLUMNS]
+    for row, error in writer.failed:
+        key = (str(row[positions[0]]), int(row[positions[1]]), int(row[positions[2]]))
+        written.discard(key)
+        print(f'Error while writing {key} into {table}', error)
+    print(f'Upserted {writer.written} rows into {table}, {len(writer.failed)} rows failed')
+
+    if refresh is not None:
+        with db.connection() as conn:
+            refresh(conn, written)
+
+    return written
@@ -0,0 +1,277 @@
+"""
+Versioned schema migrations for the stock database.
+
+Migrations are the `migrations/NNN_<name>.sql` files, applied in version
+order and recorded in a `schema_migrations` table together with a checksum
+of the file. MySQL DDL is not transactional, so each statement runs on its
+own; statements whose effect is already present (duplicate key/column, see
+ALREADY_APPLIED_ERRORS) are reported and skipped, which lets the tool run on
+databases where some keys were added by hand.
+
+Besides the SQL files:
+- `extend_dim_date` appends the missing days (and years) to dim_date/dim_year
+  up to a given date, it runs after every `up`,
+- `explain` prints the EXPLAIN plan of the pipeline's hot queries
+  (HOT_QUERIES); `up --explain` prints them before and after migrating.
+
+Usage:
+    python -m etl_finance_data.migrate status
+    python -m etl_finance_data.migrate up --explain
+    python -m etl_finance_data.migrate extend-dim-date --until 2026-12-31
+"""
+import argparse
+import hashlib
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from etl_finance_data.config import DB_CONFIG
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / 'migrations'
+
+# duplicate column, duplicate key name, multiple primary key
+ALREADY_APPLIED_ERRORS = {1060, 1061, 1068}
+
+# errno -> what to fix in the data before running the migration again
+DATA_ERROR_HINTS = {
+    1062: 'duplicate rows for the new key, remove them first',
+    1138: 'NULL values in a key column, fill or remove those rows first',
+    1171: 'NULL values in a key column, fill or remove those rows first',
+}
+
+HOT_QUERIES: Dict[str, str] = {
+    'forecast_daily.fetch_last_days': "SELECT * FROM fact_price_stock ORDER BY time DESC LIMIT 20",
+    'price history of one ticker': "SELECT * FROM price_stock WHERE ticker = 'ACB' ORDER BY time DESC LIMIT 20",
+    'incremental_sync.load_watermarks': """
+        SELECT t.ticker, t.year, MAX(CAST(t.quarter AS SIGNED))
+        FROM balance_sheet t
+        JOIN (SELECT ticker, MAX(year) AS year FROM balance_sheet GROUP BY ticker) latest
+            ON t.ticker = latest.ticker AND t.year = latest.year
+        GROUP BY t.ticker, t.year
+    """,
+    'refresh Stage join': """
+        SELECT b.ticker, i.revenue, cf.freeCashFlow
+        FROM balance_sheet b
+        JOIN income i ON b.ticker = i.ticker AND b.year = i.year AND b.quarter = i.quarter
+        JOIN cash_flow cf ON b.ticker = cf.ticker AND b.year = cf.year AND b.quarter = cf.quarter
+        WHERE b.ticker = 'ACB' AND b.year = 2024 AND b.quarter = 1
+    """,
+    'refresh Fact delete': """
+        SELECT * FROM Fact_FinancialStatement WHERE ticker = 'ACB' AND year = 2024 AND quarter = 1
+    """,
+    'metric for tickers': """
+        SELECT ticker, year, quarter, value FROM Fact_FinancialRatio
+        WHERE financial_index = 'roe' AND ticker IN ('ACB', 'VCB')
+    """,
+}
+
+
+class MigrationError(Exception):
+    """
+    A migration statement failed; the migration is not recorded as applied.
+    """
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    path: Path
+
+    @property
+    def sql(self) -> str:
+        return self.path.read_text(encoding='utf-8')
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.path.read_bytes()).hexdigest()
+
+    def statements(self) -> List[str]:
+        lines = [line for line in self.sql.splitlines() if not line.strip().startswith('--')]
+        return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def discover(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for path in sorted(directory.glob('*.sql')):
+        match = re.match(r'(\d+)_(.+)\.sql$', path.name)
+        if match is None:
+            continue
+        migrations.append(Migration(version=int(match.group(1)), name=match.group(2), path=path))
+    return sorted(migrations, key=lambda migration: migration.version)
+
+
+def ensure_migrations_table(conn) -> None:
+    cursor = conn.cursor()
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INT PRIMARY KEY, name VARCHAR(255) NOT NULL, checksum CHAR(64) NOT NULL, "
+        "applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    )
+    conn.commit()
+    cursor.close()
+
+
+def applied_versions(conn) -> Dict[int, str]:
+    """
+    version -> checksum of the migrations already applied.
+    """
+    ensure_migrations_table(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    applied = {int(version): checksum for version, checksum in cursor.fetchall()}
+    cursor.close()
+    return applied
+
+
+def apply_migration(conn, migration: Migration) -> None:
+    cursor = conn.cursor()
+    try:
+        for statement in migration.statements():
+            try:
+                cursor.execute(statement)
+            except Exception as ex:
+                errno = getattr(ex, 'errno', None)
+                if errno not in ALREADY_APPLIED_ERRORS:
+                    hint = DATA_ERROR_HINTS.get(errno, 'see the error above')
+                    raise MigrationError(
+                        f'{migration.path.name} failed on:\n    {statement}\n'
+                        f'  error: {ex}\n  hint: {hint}'
+                    ) from ex
+                print(f'[migrate]   already present, skipped: {ex}')
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+            (migration.version, migration.name, migration.checksum),
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def migrate(conn, target: Optional[int] = None, directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """
+    Apply the pending migrations up to `target` (all if None).
+
+    Returns:
+        The migrations applied by this call.
+    """
+    applied = applied_versions(conn)
+    done = []
+    for migration in discover(directory):
+        if target is not None and migration.version > target:
+            break
+        if migration.version in applied:
+            if applied[migration.version] != migration.checksum:
+                print(f'[migrate] warning: {migration.path.name} changed after it was applied')
+            continue
+        print(f'[migrate] applying {migration.path.name}')
+        apply_migration(conn, migration)
+        done.append(migration)
+    return done
+
+
+def status(conn, directory: Path = MIGRATIONS_DIR) -> None:
+    applied = applied_versions(conn)
+    for migration in discover(directory):
+        state = 'applied' if migration.version in applied else 'pending'
+        print(f'{migration.version:03d} {migration.name:<30} {state}')
+
+
+def extend_dim_date(conn, until: Optional[date] = None) -> int:
+    """
+    Append the days missing from dim_date (and their years to dim_year) up to
+    `until`, by default the end of next year.
+
+    Returns:
+        Number of days inserted.
+    """
+    until = until or date(date.today().year + 1, 12, 31)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(time) FROM dim_date")
+        last_day = cursor.fetchone()[0]
+        start = last_day + timedelta(days=1) if last_day is not None else date(2002, 1, 1)
+        if start > until:
+            return 0
+
+        days = [start + timedelta(days=offset) for offset in range((until - start).days + 1)]
+        cursor.executemany(
+            "INSERT INTO dim_date (time, year, month, quarter) VALUES (%s, %s, %s, %s)",
+            [(day, day.year, day.month, (day.month - 1) // 3 + 1) for day in days],
+        )
+        cursor.executemany(
+            "INSERT IGNORE INTO dim_year (year) VALUES (%s)",
+            [(year,) for year in sorted({day.year for day in days})],
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+
+    print(f'[migrate] dim_date extended by {len(days)} days ({start} .. {until})')
+    return len(days)
+
+
+def explain(conn, queries: Dict[str, str] = HOT_QUERIES) -> Dict[str, List[Dict[str, object]]]:
+    """
+    Print and return the EXPLAIN rows of every hot query.
+    """
+    plans = {}
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for label, sql in queries.items():
+            try:
+                cursor.execute('EXPLAIN ' + sql)
+                plans[label] = cursor.fetchall()
+            except Exception as ex:
+                print(f'[explain] {label}: {ex}')
+                continue
+            print(f'[explain] {label}')
+            for row in plans[label]:
+                print(
+                    f"    {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                    f"rows={row.get('rows')} extra={row.get('Extra')}"
+                )
+    finally:
+        cursor.close()
+    return plans
+
+
+def main() -> None:
+    import mysql.connector
+
+    parser = argparse.ArgumentParser(description='Schema migrations for the stock database')
+    parser.add_argument('command', choices=['status', 'up', 'explain', 'extend-dim-date'])
+    parser.add_argument('--target', type=int, help='up: stop at this version')
+    parser.add_argument('--explain', action='store_true', help='up: print hot query plans before and after')
+    parser.add_argument('--until', type=date.fromisoformat, help='last day kept in dim_date')
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        if args.command == 'status':
+            status(conn)
+        elif args.command == 'explain':
+            explain(conn)
+        elif args.command == 'extend-dim-date':
+            extend_dim_date(conn, args.until)
+        else:
+            if args.explain:
+                print('[migrate] plans before:')
+                explain(conn)
+            try:
+                applied = migrate(conn, args.target)
+            except MigrationError as ex:
+                raise SystemExit(f'[migrate] {ex}')
+            print(f'[migrate] {len(applied)} migrations applied')
+            extend_dim_date(conn, args.until)
+            if args.explain:
+                print('[migrate] plans after:')
+                explain(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
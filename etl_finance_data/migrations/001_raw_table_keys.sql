@@ -0,0 +1,29 @@
+-- Khóa chính (ticker, year, quarter) cho các bảng raw đã tạo trước đó, để
+-- etl_finance_data/incremental_sync.py có thể ghi bằng INSERT ... ON DUPLICATE KEY UPDATE.
+-- Các bảng income và cash_flow cũ chưa có cột quarter: các dòng cũ không có quý
+-- (quarter IS NULL) không thể khôi phục quý, nên được chuyển sang bảng
+-- <bảng>_without_quarter rồi xóa khỏi bảng raw; incremental_sync sẽ tải lại
+-- đầy đủ các ticker này ở lần chạy sau.
+-- Nếu bảng đang có dòng trùng (ticker, year, quarter) thì migrate.py dừng và báo lỗi,
+-- cần xóa dòng trùng trước khi chạy lại.
+ALTER TABLE income ADD COLUMN quarter INT;
+
+ALTER TABLE cash_flow ADD COLUMN quarter INT;
+
+CREATE TABLE IF NOT EXISTS balance_sheet_without_quarter AS SELECT * FROM balance_sheet WHERE quarter IS NULL;
+
+DELETE FROM balance_sheet WHERE quarter IS NULL;
+
+CREATE TABLE IF NOT EXISTS income_without_quarter AS SELECT * FROM income WHERE quarter IS NULL;
+
+DELETE FROM income WHERE quarter IS NULL;
+
+CREATE TABLE IF NOT EXISTS cash_flow_without_quarter AS SELECT * FROM cash_flow WHERE quarter IS NULL;
+
+DELETE FROM cash_flow WHERE quarter IS NULL;
+
+ALTER TABLE balance_sheet ADD PRIMARY KEY (ticker, year, quarter);
+
+ALTER TABLE income ADD PRIMARY KEY (ticker, year, quarter);
+
+ALTER TABLE cash_flow ADD PRIMARY KEY (ticker, year, quarter);
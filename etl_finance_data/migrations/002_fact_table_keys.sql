@@ -0,0 +1,12 @@
+-- Các bảng Stage/Fact được tạo bằng CREATE TABLE ... AS SELECT nên không có index.
+-- refresh.py xóa/ghi lại theo (ticker, year, quarter), fact_store.py và Power BI
+-- lọc theo financial_index rồi ticker.
+ALTER TABLE Stage_FinancialStatement ADD PRIMARY KEY (ticker, year, quarter);
+
+ALTER TABLE Fact_FinancialStatement ADD PRIMARY KEY (ticker, year, quarter, financial_index);
+
+ALTER TABLE Fact_FinancialStatement ADD INDEX idx_fact_fs_index_ticker (financial_index, ticker, year, quarter);
+
+ALTER TABLE Fact_FinancialRatio ADD PRIMARY KEY (ticker, year, quarter, financial_index);
+
+ALTER TABLE Fact_FinancialRatio ADD INDEX idx_fact_ratio_index_ticker (financial_index, ticker, year, quarter);
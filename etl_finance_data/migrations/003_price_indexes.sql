@@ -0,0 +1,7 @@
+-- Giá cổ phiếu được đọc theo mã và thời gian:
+-- forecast_daily.fetch_last_days đọc fact_price_stock theo ORDER BY time DESC LIMIT n.
+ALTER TABLE price_stock ADD INDEX idx_price_stock_ticker_time (ticker, time);
+
+ALTER TABLE fact_price_stock ADD INDEX idx_fact_price_stock_time (time);
+
+ALTER TABLE fact_price_stock ADD INDEX idx_fact_price_stock_symbol_time (symbol, time);
@@ -0,0 +1,191 @@
+"""
+Key-scoped refresh of the Stage/Fact financial tables.
+
+Replaces the `AFTER INSERT ... FOR EACH ROW` triggers that re-ran
+`UpdateFactFinancialStatement()` once per inserted row. The insert scripts
+collect the (ticker, year, quarter) keys they wrote and call `refresh_*`
+once at the end of the batch. Only those keys are rebuilt:
+
+1. the keys are loaded into a temporary table,
+2. matching Stage/Fact rows are deleted,
+3. Stage rows are re-joined from balance_sheet/income/cash_flow,
+4. Fact rows are unpivoted in a single pass over the refreshed Stage rows
+   (CROSS JOIN with the metric list) instead of a 35-way UNION ALL.
+
+Usage (rebuild every key of the given tickers):
+    python -m etl_finance_data.refresh --tickers ACB VCB
+"""
+import argparse
+import time
+from typing import Iterable, List, Set, Tuple
+
+import pandas as pd
+
+from etl_finance_data.config import DB_CONFIG
+
+Key = Tuple[str, int, int]
+
+FINANCIAL_STATEMENT_INDEXES = [
+    'shortAsset', 'shortInvest', 'shortReceivable', 'inventory', 'longAsset', 'fixedAsset',
+    'asset', 'debt', 'shortDebt', 'longDebt', 'equity', 'capital', 'minorShareHolderProfit',
+    'payable', 'revenue', 'yearRevenueGrowth', 'quarterRevenueGrowth', 'costOfGoodSold',
+    'grossProfit', 'operationExpense', 'operationProfit', 'yearOperationProfitGrowth',
+    'quarterOperationProfitGrowth', 'interestExpense', 'preTaxProfit', 'postTaxProfit',
+    'shareHolderIncome', 'yearShareHolderIncomeGrowth', 'quarterShareHolderIncomeGrowth',
+    'ebitda', 'investCost', 'fromInvest', 'fromFinancial', 'fromSale', 'freeCashFlow',
+]
+
+FINANCIAL_RATIO_INDEXES = [
+    'priceToEarning', 'priceToBook', 'valueBeforeEbitda', 'roe', 'roa', 'daysReceivable',
+    'daysInventory', 'daysPayable', 'ebitOnInterest', 'earningPerShare', 'bookValuePerShare',
+    'equityOnTotalAsset', 'equityOnLiability', 'currentPayment', 'quickPayment', 'epsChange',
+    'ebitdaOnStock', 'grossProfitMargin', 'operatingProfitMargin', 'postTaxMargin',
+    'debtOnEquity', 'debtOnAsset', 'debtOnEbitda', 'shortOnLongDebt', 'assetOnEquity',
+    'capitalBalance', 'cashOnEquity', 'cashOnCapitalize', 'cashCirculation',
+    'revenueOnWorkCapital', 'capexOnFixedAsset', 'revenueOnAsset', 'postTaxOnPreTax',
+    'ebitOnRevenue', 'preTaxOnEbit', 'payableOnEquity', 'ebitdaOnStockChange',
+    'bookValuePerShareChange',
+]
+
+STAGE_SELECT = """
+    SELECT
+        b.*,
+        i.revenue, i.yearRevenueGrowth, i.quarterRevenueGrowth, i.costOfGoodSold, i.grossProfit,
+        i.operationExpense, i.operationProfit, i.yearOperationProfitGrowth, i.quarterOperationProfitGrowth,
+        i.interestExpense, i.preTaxProfit, i.postTaxProfit, i.shareHolderIncome, i.yearShareHolderIncomeGrowth,
+        i.quarterShareHolderIncomeGrowth, i.investProfit, i.serviceProfit, i.otherProfit, i.provisionExpense,
+        i.operationIncome, i.ebitda,
+        cf.investCost, cf.fromInvest, cf.fromFinancial, cf.fromSale, cf.freeCashFlow
+    FROM refresh_keys k
+    JOIN balance_sheet b ON b.ticker = k.ticker AND b.year = k.year AND b.quarter = k.quarter
+    JOIN income i ON b.ticker = i.ticker AND b.year = i.year AND b.quarter = i.quarter
+    JOIN cash_flow cf ON b.ticker = cf.ticker AND b.year = cf.year AND b.quarter = cf.quarter
+"""
+
+
+def changed_keys(frame: pd.DataFrame) -> Set[Key]:
+    """
+    (ticker, year, quarter) keys present in an inserted DataFrame.
+    """
+    return {
+        (str(ticker), int(year), int(quarter))
+        for ticker, year, quarter in frame[['ticker', 'year', 'quarter']].itertuples(index=False, name=None)
+    }
+
+
+def unpivot_sql(source: str, indexes: List[str]) -> str:
+    """
+    Single-pass unpivot: every source row is paired with the metric list and
+    the value picked with a CASE, so `source` is scanned once.
+    """
+    metrics = " UNION ALL ".join(f"SELECT '{name}' AS financial_index" for name in indexes)
+    cases = " ".join(f"WHEN '{name}' THEN s.`{name}`" for name in indexes)
+    return f"""
+        SELECT s.ticker, s.year, s.quarter, m.financial_index,
+               CASE m.financial_index {cases} END AS value
+        FROM {source} s
+        JOIN refresh_keys k ON s.ticker = k.ticker AND s.year = k.year AND s.quarter = k.quarter
+        CROSS JOIN ({metrics}) m
+    """
+
+
+def _load_keys(cursor, keys: Iterable[Key]) -> None:
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS refresh_keys")
+    cursor.execute(
+        "CREATE TEMPORARY TABLE refresh_keys ("
+        "ticker VARCHAR(10), year INT, quarter INT, PRIMARY KEY (ticker, year, quarter))"
+    )
+    cursor.executemany("INSERT INTO refresh_keys VALUES (%s, %s, %s)", list(keys))
+
+
+def _timed(cursor, label: str, sql: str) -> None:
+    started = time.perf_counter()
+    cursor.execute(sql)
+    print(f'[refresh] {label}: {cursor.rowcount} rows in {time.perf_counter() - started:.3f}s')
+
+
+def refresh_financial_statement(conn, keys: Iterable[Key]) -> None:
+    """
+    Rebuild Stage_FinancialStatement and Fact_FinancialStatement for `keys`
+    in one transaction.
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return
+
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        _load_keys(cursor, keys)
+        _timed(cursor, 'delete Stage_FinancialStatement',
+               "DELETE s FROM Stage_FinancialStatement s JOIN refresh_keys k "
+               "ON s.ticker = k.ticker AND s.year = k.year AND s.quarter = k.quarter")
+        _timed(cursor, 'insert Stage_FinancialStatement',
+               "INSERT INTO Stage_FinancialStatement " + STAGE_SELECT)
+        _timed(cursor, 'delete Fact_FinancialStatement',
+               "DELETE f FROM Fact_FinancialStatement f JOIN refresh_keys k "
+               "ON f.ticker = k.ticker AND f.year = k.year AND f.quarter = k.quarter")
+        _timed(cursor, 'insert Fact_FinancialStatement',
+               "INSERT INTO Fact_FinancialStatement (ticker, year, quarter, financial_index, value) "
+               + unpivot_sql('Stage_FinancialStatement', FINANCIAL_STATEMENT_INDEXES))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    print(f'[refresh] financial statement: {len(keys)} keys in {time.perf_counter() - started:.3f}s')
+
+
+def refresh_financial_ratio(conn, keys: Iterable[Key]) -> None:
+    """
+    Rebuild Fact_FinancialRatio for `keys` in one transaction.
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return
+
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        _load_keys(cursor, keys)
+        _timed(cursor, 'delete Fact_FinancialRatio',
+               "DELETE f FROM Fact_FinancialRatio f JOIN refresh_keys k "
+               "ON f.ticker = k.ticker AND f.year = k.year AND f.quarter = k.quarter")
+        _timed(cursor, 'insert Fact_FinancialRatio',
+               "INSERT INTO Fact_FinancialRatio (ticker, year, quarter, financial_index, value) "
+               + unpivot_sql('ratio', FINANCIAL_RATIO_INDEXES))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    print(f'[refresh] financial ratio: {len(keys)} keys in {time.perf_counter() - started:.3f}s')
+
+
+def _keys_for_tickers(conn, table: str, tickers: List[str]) -> Set[Key]:
+    cursor = conn.cursor()
+    placeholders = ", ".join(["%s"] * len(tickers))
+    cursor.execute(f"SELECT DISTINCT ticker, year, quarter FROM {table} WHERE ticker IN ({placeholders})", tickers)
+    keys = {(str(ticker), int(year), int(quarter)) for ticker, year, quarter in cursor.fetchall()}
+    cursor.close()
+    return keys
+
+
+def main() -> None:
+    from Automation.db import get_database
+
+    parser = argparse.ArgumentParser(description='Refresh Stage/Fact financial tables for some tickers')
+    parser.add_argument('--tickers', nargs='+', required=True)
+    args = parser.parse_args()
+
+    with get_database(DB_CONFIG).connection() as conn:
+        refresh_financial_statement(conn, _keys_for_tickers(conn, 'balance_sheet', args.tickers))
+        refresh_financial_ratio(conn, _keys_for_tickers(conn, 'ratio', args.tickers))
+
+
+if __name__ == '__main__':
+    main()
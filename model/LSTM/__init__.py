@@ -1,3 +1,4 @@
 from .training import train
+from .data_io import load_aligned_dataset
 
-__all__ = ["train"]
\ No newline at end of file
+__all__ = ["train", "load_aligned_dataset"]
\ No newline at end of file
@@ -14,6 +14,11 @@ class TrainingConfig(BaseModel):
             os.path.join("model","LSTM","config.py"), 
             os.path.join("stage_4_data","total.csv")
     ))
+    dataset_path:str = Field(default = __file__.replace(
+            os.path.join("model","LSTM","config.py"), 
+            os.path.join("stage_4_data","dataset")
+    ))
+    symbol: str = "ACB"
     sequence_length: int =  20
     batch_size:int = 32
     learning_rate: float =  0.001
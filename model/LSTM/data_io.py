@@ -0,0 +1,37 @@
+from typing import List, Optional
+import pandas as pd
+
+DEFAULT_COLUMNS = ["time", "open", "high", "low", "close", "volume", "merge_corpus"]
+
+
+def load_aligned_dataset(
+        dataset_path: str,
+        symbol: str = "ACB",
+        columns: List[str] = DEFAULT_COLUMNS,
+        years: Optional[List[int]] = None
+    )->pd.DataFrame:
+    r"""
+    Read the symbol/year partitioned Parquet dataset written by `stage4.build_dataset`.
+    Only the requested columns are decoded and only the partitions of `symbol`
+    (and `years` if given) are scanned
+    Args:
+        dataset_path (str): root directory of the dataset
+        symbol (str): ticker to load
+        columns (List[str]): columns to read
+        years (Optional[List[int]]): restrict to these year partitions
+    Returns:
+        a dataframe sorted by time
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(dataset_path, format = "parquet", partitioning = "hive")
+
+    row_filter = ds.field("symbol") == symbol
+    if years is not None:
+        row_filter = row_filter & ds.field("year").isin(years)
+
+    table = dataset.to_table(columns = columns, filter = row_filter)
+    datadf = table.to_pandas()
+    datadf.sort_values(by = "time", inplace = True)
+    datadf.reset_index(drop = True, inplace = True)
+    return datadf
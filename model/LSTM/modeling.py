@@ -7,6 +7,7 @@ import pandas as pd
 import numpy as np
 from pydantic.dataclasses import dataclass
 from .utils import time_measure
+from ..encoding import BulkEncoder
 
 class LSTMCellEventContext(nn.Module):
     r"""
@@ -149,7 +150,8 @@ class MergeDataset(Dataset, Cache):
                  sequence_length:int, 
                  datadf: pd.DataFrame,
                  scale_by_other:bool = False,
-                 other_price_stats: Price_Min_Max = None
+                 other_price_stats: Price_Min_Max = None,
+                 encoder_workers: int = 1
         )->None:
         Cache.__init__(self)
 
@@ -193,6 +195,12 @@ class MergeDataset(Dataset, Cache):
 
         self.sentence_model.compile(fullgraph = True, mode = "reduce-overhead")
 
+        # every distinct day corpus is encoded once, up front, in length
+        # buckets; long corpora are chunked and mean pooled, not truncated
+        with BulkEncoder(model = self.sentence_model, workers = encoder_workers) as encoder:
+            self._corpus_embeddings = encoder.encode_unique(self.df.merge_corpus.dropna().tolist())
+            print('corpus encoding: ', encoder.last_stats)
+
     @property
     def price_stats(self)->Price_Min_Max:
         return self._price_stats
@@ -202,16 +210,11 @@ class MergeDataset(Dataset, Cache):
     
     def _get_embeddings(self, corpus: List[str])->torch.Tensor:
         r"""
-        Batch inference
+        Look up the embeddings computed in `__init__`
         Args:
             corpus (List[str]): a select of corpus by `local` non null index
         """
-        return self.sentence_model.encode(
-            corpus,
-            show_progress_bar = False, 
-            precision = 'float32', 
-            convert_to_tensor = True
-        ).cpu()
+        return torch.from_numpy(np.stack([self._corpus_embeddings[text] for text in corpus]))
 
     @time_measure
     def __getitem__(self, index:int)->Tuple[torch.Tensor]:
@@ -3,14 +3,19 @@ import torch.nn as nn
 import torch
 from tqdm import tqdm
 import pandas as pd
+import os
 from .modeling import LSTMModel, MergeDataset
 from .config import TrainingConfig
 from .utils import Report
+from .data_io import load_aligned_dataset
 
 def train(config = TrainingConfig()):
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-    total_df = pd.read_csv(config.csv_path)
+    if os.path.isdir(config.dataset_path):
+        total_df = load_aligned_dataset(config.dataset_path, symbol = config.symbol)
+    else:
+        total_df = pd.read_csv(config.csv_path)
 
     # train test split
     test_length = int(len(total_df)*config.test_ratio)
@@ -0,0 +1,291 @@
+r"""
+Constrained decoding for the event extraction output.
+
+The output schema (`data_model.Output`) is fixed: an object with one
+`event_list` array of `Event` objects, each with the string fields of
+`Event`. `OutputGrammar` turns that schema into a character level automaton
+over the canonical `json.dumps` layout:
+
+    {"event_list": [{"time": "...", "S": "...", "R": "...", "O": "..."}, ...]}
+
+`JsonSchemaLogitsProcessor` walks the automaton with the generated tokens and
+masks every token that cannot continue a valid document. Allowed-token masks
+are computed once per automaton state and cached. Once the top-level object
+is closed only EOS is allowed, so generation stops right away instead of
+running to `max_new_tokens`.
+"""
+from dataclasses import dataclass, fields
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import torch
+from pydantic import TypeAdapter, ValidationError
+from transformers import LogitsProcessor
+
+from .data_model import Event, Output
+
+# automaton states:
+#   ("lit", literal, i)     inside a fixed literal at character i
+#   ("str", field, escape)  inside a string value, escape is 0 (none), 1 (after
+#                           a backslash) or the number of \u hex digits left + 1
+#   ("list",)               after "[": an event or "]"
+#   ("next",)               after an event: "," or "]"
+#   ("done",)               top-level object closed
+State = Tuple
+
+
+def _event_literals()->List[Tuple[str, str]]:
+    r"""
+    (literal before the value, field name) for every field of Event
+    """
+    names = [field.name for field in fields(Event)]
+    literals = []
+    for position, name in enumerate(names):
+        opening = '{"' if position == 0 else '", "'
+        literals.append((f'{opening}{name}": "', name))
+    return literals
+
+
+class OutputGrammar(object):
+    r"""
+    Character automaton for the canonical JSON layout of `Output`
+    """
+    OPEN = '{"event_list": ['
+    SEPARATOR = ', '
+    CLOSE_EVENT = '"}'
+    CLOSE = '}'
+
+    def __init__(self)->None:
+        self.event_literals = _event_literals()
+        self.fields = [name for _, name in self.event_literals]
+
+    @property
+    def start(self)->State:
+        return ("lit", self.OPEN, 0)
+
+    def _after_literal(self, literal: str)->State:
+        if literal == self.OPEN:
+            return ("list",)
+        if literal == self.CLOSE_EVENT:
+            return ("next",)
+        if literal == self.SEPARATOR:
+            return ("lit", self.event_literals[0][0], 0)
+        if literal == self.CLOSE:
+            return ("done",)
+        for text, name in self.event_literals:
+            if literal == text:
+                return ("str", name, 0)
+        raise ValueError(literal)
+
+    def _after_string(self, name: str)->State:
+        position = self.fields.index(name)
+        if position + 1 < len(self.fields):
+            return ("lit", self.event_literals[position + 1][0], 1)  # the closing quote is consumed
+        return ("lit", self.CLOSE_EVENT, 1)
+
+    def step(self, state: State, char: str)->Optional[State]:
+        kind = state[0]
+        if kind == "lit":
+            _, literal, index = state
+            if literal[index] != char:
+                return None
+            if index + 1 == len(literal):
+                return self._after_literal(literal)
+            return ("lit", literal, index + 1)
+
+        if kind == "str":
+            _, name, escape = state
+            if escape == 1:
+                if char == "u":
+                    return ("str", name, 5)
+                return ("str", name, 0) if char in '"\\/bfnrt' else None
+            if escape > 1:
+                if char not in "0123456789abcdefABCDEF":
+                    return None
+                return ("str", name, escape - 1 if escape > 2 else 0)
+            if char == '"':
+                return self._after_string(name)
+            if char == "\\":
+                return ("str", name, 1)
+            return None if ord(char) < 0x20 else state
+
+        if kind == "list":
+            if char == "]":
+                return ("lit", self.CLOSE, 0)
+            return self.step(("lit", self.event_literals[0][0], 0), char)
+
+        if kind == "next":
+            if char == "]":
+                return ("lit", self.CLOSE, 0)
+            return self.step(("lit", self.SEPARATOR, 0), char)
+
+        return None
+
+    def walk(self, state: State, text: str)->Optional[State]:
+        for char in text:
+            state = self.step(state, char)
+            if state is None:
+                return None
+        return state
+
+
+class JsonSchemaLogitsProcessor(LogitsProcessor):
+    r"""
+    Mask tokens that would break the `Output` JSON layout
+    Args:
+        tokenizer: tokenizer of the generating model
+        prompt_length (int): length of the (padded) prompt, generated tokens
+            start after it
+    """
+    def __init__(self, tokenizer, prompt_length: int = 0)->None:
+        self.grammar = OutputGrammar()
+        self.prompt_length = prompt_length
+        self.eos_token_id = tokenizer.eos_token_id
+
+        special_ids = set(tokenizer.all_special_ids)
+        self.token_texts: List[str] = []
+        for token_id in range(len(tokenizer)):
+            text = "" if token_id in special_ids else tokenizer.decode([token_id])
+            # partial utf-8 byte tokens decode to the replacement character
+            self.token_texts.append("" if "�" in text else text)
+
+        self._by_first_char: Dict[str, List[int]] = {}
+        self._string_special: List[int] = []
+        plain = []
+        for token_id, text in enumerate(self.token_texts):
+            if not text:
+                continue
+            self._by_first_char.setdefault(text[0], []).append(token_id)
+            if '"' in text or "\\" in text or any(ord(char) < 0x20 for char in text):
+                self._string_special.append(token_id)
+            else:
+                plain.append(token_id)
+        self._string_plain = torch.tensor(plain, dtype = torch.long)
+
+        self._masks: Dict[Tuple[State, int], torch.Tensor] = {}
+        self._transitions: Dict[Tuple[State, int], Optional[State]] = {}
+        self._states: Dict[Tuple[int, ...], State] = {}
+
+    def reset(self, prompt_length: int)->None:
+        r"""
+        Prepare for a new `generate` call, the per-state masks are kept
+        """
+        self.prompt_length = prompt_length
+        self._states = {}
+
+    def next_state(self, state: State, token_id: int)->Optional[State]:
+        key = (state, token_id)
+        if key not in self._transitions:
+            if state == ("done",):
+                self._transitions[key] = state
+            elif token_id >= len(self.token_texts) or not self.token_texts[token_id]:
+                self._transitions[key] = None
+            else:
+                self._transitions[key] = self.grammar.walk(state, self.token_texts[token_id])
+        return self._transitions[key]
+
+    def allowed_mask(self, state: State, vocab_size: int)->torch.Tensor:
+        r"""
+        Boolean mask of the tokens allowed in `state`, cached per state
+        """
+        key = (state, vocab_size)
+        if key in self._masks:
+            return self._masks[key]
+
+        mask = torch.zeros(vocab_size, dtype = torch.bool)
+        if state == ("done",):
+            mask[self.eos_token_id] = True
+        else:
+            if state[0] == "str" and state[2] == 0:
+                mask[self._string_plain[self._string_plain < vocab_size]] = True
+                candidates = self._string_special
+            elif state[0] == "str":
+                candidates = [i for ids in self._by_first_char.values() for i in ids]
+            else:
+                first_chars = {char for char in self._first_chars(state)}
+                candidates = [i for char in first_chars for i in self._by_first_char.get(char, [])]
+            for token_id in candidates:
+                if token_id < vocab_size and self.next_state(state, token_id) is not None:
+                    mask[token_id] = True
+        self._masks[key] = mask
+        return mask
+
+    def _first_chars(self, state: State)->List[str]:
+        if state[0] == "lit":
+            return [state[1][state[2]]]
+        if state[0] == "list":
+            return ["]", self.grammar.event_literals[0][0][0]]
+        if state[0] == "next":
+            return ["]", self.grammar.SEPARATOR[0]]
+        return []
+
+    def state_of(self, generated: Sequence[int])->State:
+        r"""
+        Automaton state after `generated`, reusing the state of its prefix
+        computed at the previous step (rows may be reordered by beam search)
+        """
+        key = tuple(generated)
+        if key in self._states:
+            return self._states[key]
+
+        previous = self._states.get(key[:-1]) if key else None
+        if previous is not None:
+            state = self.next_state(previous, key[-1])
+        else:
+            state = self.grammar.start
+            for token_id in key:
+                state = self.next_state(state, token_id)
+                if state is None:
+                    break
+        # a token outside the grammar (e.g. padding) ends the document
+        return state if state is not None else ("done",)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor)->torch.FloatTensor:
+        vocab_size = scores.shape[-1]
+        states = {}
+        for row in range(input_ids.shape[0]):
+            generated = input_ids[row, self.prompt_length:].tolist()
+            state = self.state_of(generated)
+            states[tuple(generated)] = state
+            mask = self.allowed_mask(state, vocab_size)
+            if not mask.any():
+                mask = self.allowed_mask(("done",), vocab_size)
+            scores[row, ~mask.to(scores.device)] = -float("inf")
+        # only the states of this step are needed at the next one
+        self._states = states
+        return scores
+
+
+def parse_output(text: str)->Optional[Output]:
+    r"""
+    Parse a generated string into `Output`, None if it is not valid
+    """
+    try:
+        return TypeAdapter(Output).validate_json(text.strip())
+    except ValidationError:
+        return None
+
+
+@dataclass
+class ExtractionMetrics:
+    articles: int = 0
+    valid: int = 0
+    generated_tokens: int = 0
+
+    def add(self, output: Optional[Output], generated_tokens: int)->None:
+        self.articles += 1
+        self.valid += int(output is not None)
+        self.generated_tokens += generated_tokens
+
+    @property
+    def validity_rate(self)->float:
+        return self.valid / self.articles if self.articles else 0.0
+
+    @property
+    def tokens_per_article(self)->float:
+        return self.generated_tokens / self.articles if self.articles else 0.0
+
+    def __str__(self)->str:
+        return (
+            f"{self.articles} articles, validity {self.validity_rate:.1%}, "
+            f"{self.tokens_per_article:.1f} generated tokens per article"
+        )
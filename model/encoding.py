@@ -0,0 +1,240 @@
+r"""
+Bulk sentence embedding of day corpora.
+
+`SentenceTransformer.encode` truncates every text to the model's
+`max_seq_length`, so on busy days most of `merge_corpus` never reaches the
+encoder, and the callers encode a handful of texts per call. `BulkEncoder`:
+
+1. tokenizes all the texts once and splits the ones longer than the model
+   limit into overlapping token windows,
+2. sorts the chunks by token length and encodes them in length buckets
+   sized by a token budget (many short chunks per batch, few long ones),
+   or spreads them over a pool of CPU worker processes,
+3. mean-pools the chunk embeddings of every text, weighted by chunk length.
+
+Usage:
+    python -m model.encoding --dataset stage_4_data/dataset --symbol ACB --workers 1 2 4
+"""
+import argparse
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EMBEDDING_MODEL = "dangvantuan/vietnamese-document-embedding"
+
+
+class BulkEncoder(object):
+    r"""
+    Args:
+        model (SentenceTransformer): loaded model, `model_name` is loaded
+            on `device` when not given
+        max_tokens (int): chunk length, at most the model `max_seq_length`
+        chunk_overlap (int): tokens shared by consecutive chunks of a text
+        token_budget (int): padded tokens per batch of the bucketed encoding
+        max_batch_size (int): upper bound on the texts per batch
+        workers (int): CPU processes encoding in parallel, 1 encodes in
+            this process on the model device
+    """
+    def __init__(self,
+            model = None,
+            model_name: str = EMBEDDING_MODEL,
+            cache_folder: str = ".checkpoint",
+            device: Optional[str] = None,
+            max_tokens: Optional[int] = None,
+            chunk_overlap: int = 64,
+            token_budget: int = 16384,
+            max_batch_size: int = 64,
+            workers: int = 1
+        )->None:
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(
+                model_name,
+                cache_folder = cache_folder,
+                trust_remote_code = True,
+                device = device
+            )
+        self.model = model
+        self.tokenizer = model.tokenizer
+
+        limit = model.max_seq_length or 512
+        self.max_tokens = min(max_tokens or limit, limit)
+        self.chunk_overlap = min(chunk_overlap, self.max_tokens // 2)
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.workers = workers
+        self._pool = None
+        self.last_stats: Dict[str, float] = {}
+
+    @property
+    def embedding_dim(self)->int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def close(self)->None:
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    def __enter__(self)->"BulkEncoder":
+        return self
+
+    def __exit__(self, *exc_info: object)->None:
+        self.close()
+
+    def split(self, texts: Sequence[str])->Tuple[List[str], List[int], List[int]]:
+        r"""
+        Cut the texts longer than the model limit into overlapping windows
+        Returns:
+            chunks, the index of the text of every chunk, chunk token lengths
+        """
+        # room for the special tokens added by the model
+        window = self.max_tokens - 2
+        stride = window - self.chunk_overlap
+        token_ids = self.tokenizer(
+            list(texts),
+            add_special_tokens = False,
+            return_attention_mask = False
+        )["input_ids"]
+
+        chunks, owners, lengths = [], [], []
+        for ith, (text, ids) in enumerate(zip(texts, token_ids)):
+            if len(ids) <= window:
+                chunks.append(text)
+                owners.append(ith)
+                lengths.append(max(len(ids), 1))
+                continue
+            for start in range(0, len(ids), stride):
+                piece = ids[start:start + window]
+                chunks.append(self.tokenizer.decode(piece))
+                owners.append(ith)
+                lengths.append(len(piece))
+                if start + window >= len(ids):
+                    break
+        return chunks, owners, lengths
+
+    def buckets(self, lengths: Sequence[int])->List[List[int]]:
+        r"""
+        Chunk indices grouped by similar length, longest first, every
+        bucket holding at most `token_budget` padded tokens
+        """
+        order = sorted(range(len(lengths)), key = lambda ith: -lengths[ith])
+        batches: List[List[int]] = []
+        for ith in order:
+            # sorted descending: the first chunk of a bucket is its longest
+            if batches and len(batches[-1]) < self.max_batch_size \
+                    and (len(batches[-1]) + 1) * lengths[batches[-1][0]] <= self.token_budget:
+                batches[-1].append(ith)
+            else:
+                batches.append([ith])
+        return batches
+
+    def _encode_chunks(self, chunks: List[str], lengths: List[int])->np.ndarray:
+        if self.workers > 1:
+            if self._pool is None:
+                self._pool = self.model.start_multi_process_pool(target_devices = ["cpu"] * self.workers)
+            order = sorted(range(len(chunks)), key = lambda ith: -lengths[ith])
+            # sorted input: every piece handed to a worker is length homogeneous
+            sorted_embeddings = self.model.encode_multi_process(
+                [chunks[ith] for ith in order],
+                self._pool,
+                batch_size = self.max_batch_size,
+                precision = "float32"
+            )
+            embeddings = np.empty_like(sorted_embeddings)
+            embeddings[order] = sorted_embeddings
+            return embeddings
+
+        embeddings = np.zeros((len(chunks), self.embedding_dim), dtype = np.float32)
+        for bucket in self.buckets(lengths):
+            embeddings[bucket] = self.model.encode(
+                [chunks[ith] for ith in bucket],
+                batch_size = len(bucket),
+                show_progress_bar = False,
+                precision = "float32",
+                convert_to_numpy = True
+            )
+        return embeddings
+
+    def encode(self, texts: Sequence[str])->np.ndarray:
+        r"""
+        One embedding per text, long texts are the length weighted mean of
+        their chunk embeddings
+        Returns:
+            float32 array of shape (len(texts), embedding_dim)
+        """
+        started = time.perf_counter()
+        if len(texts) == 0:
+            return np.zeros((0, self.embedding_dim), dtype = np.float32)
+
+        chunks, owners, lengths = self.split(texts)
+        chunk_embeddings = self._encode_chunks(chunks, lengths)
+
+        weights = np.asarray(lengths, dtype = np.float32)
+        pooled = np.zeros((len(texts), chunk_embeddings.shape[1]), dtype = np.float32)
+        totals = np.zeros(len(texts), dtype = np.float32)
+        np.add.at(pooled, owners, chunk_embeddings * weights[:, None])
+        np.add.at(totals, owners, weights)
+        pooled /= totals[:, None]
+
+        seconds = time.perf_counter() - started
+        self.last_stats = {
+            "texts": len(texts),
+            "chunks": len(chunks),
+            "tokens": int(weights.sum()),
+            "seconds": seconds,
+            "texts_per_sec": len(texts) / seconds,
+            "tokens_per_sec": float(weights.sum()) / seconds,
+        }
+        return pooled
+
+    def encode_unique(self, texts: Sequence[str])->Dict[str, np.ndarray]:
+        r"""
+        Embedding of every distinct text, each encoded once
+        """
+        unique = list(dict.fromkeys(texts))
+        return dict(zip(unique, self.encode(unique)))
+
+
+def benchmark(
+        texts: List[str],
+        worker_counts: Sequence[int] = (1, 2, 4),
+        **encoder_kwargs
+    )->List[Dict[str, float]]:
+    r"""
+    Texts/sec and tokens/sec of `BulkEncoder` for every worker count
+    (the first run also warms the model up)
+    """
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(EMBEDDING_MODEL, cache_folder = ".checkpoint", trust_remote_code = True)
+    reports = []
+    for workers in worker_counts:
+        with BulkEncoder(model = model, workers = workers, **encoder_kwargs) as encoder:
+            encoder.encode(texts[:8])
+            encoder.encode(texts)
+            report = {"workers": workers, **encoder.last_stats}
+        print(f"[encoding] {report}")
+        reports.append(report)
+    return reports
+
+
+def main()->None:
+    from .LSTM.data_io import load_aligned_dataset
+
+    parser = argparse.ArgumentParser(description = "Bulk encoder benchmark")
+    parser.add_argument("--dataset", default = "stage_4_data/dataset")
+    parser.add_argument("--symbol", default = "ACB")
+    parser.add_argument("--limit", type = int, default = 200, help = "day corpora to encode")
+    parser.add_argument("--workers", type = int, nargs = "+", default = [1, 2, 4])
+    parser.add_argument("--token-budget", type = int, default = 16384)
+    args = parser.parse_args()
+
+    frame = load_aligned_dataset(args.dataset, symbol = args.symbol, columns = ["merge_corpus"])
+    texts = frame["merge_corpus"].dropna().unique().tolist()[:args.limit]
+    benchmark(texts, args.workers, token_budget = args.token_budget)
+
+
+if __name__ == "__main__":
+    main()
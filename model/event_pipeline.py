@@ -0,0 +1,206 @@
+r"""
+Sentence-chunked event extraction over the stage 4 corpora.
+
+`Inference` truncates whole day corpora to the tokenizer limit, so most of a
+busy day is never read. This pipeline:
+
+1. splits every corpus into sentences with VnCoreNLP (as in `extract.py`)
+   and packs consecutive sentences into chunks of at most `max_chars`,
+2. hashes every chunk and skips the ones already extracted (the same day
+   corpus is shared by every symbol of the dataset),
+3. extracts the remaining chunks in batches with `ExtractionRunner`,
+4. stores the normalized, deduplicated events in an `EventStore`.
+
+Usage:
+    python -m model.event_pipeline run --dataset stage_4_data/dataset --symbol ACB
+    python -m model.event_pipeline query --entity "giá vàng" --start 2024-01-01
+"""
+import argparse
+import hashlib
+import re
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from .constrained import parse_output
+from .event_store import EventStore, normalize
+
+DEFAULT_DB = Path(__file__).resolve().parent.parent / "stage_4_data" / "events.sqlite"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-ZÀ-Ỹ0-9\"“])")
+
+# (chunk hash, chunk text, article date)
+Chunk = Tuple[str, str, Optional[str]]
+
+
+def regex_sentences(text: str)->List[str]:
+    r"""
+    Fallback sentence splitter on end punctuation, used without VnCoreNLP
+    """
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def vncorenlp_sentences(save_dir: Optional[str] = None)->Callable[[str], List[str]]:
+    r"""
+    Sentence splitter backed by the shared VnCoreNLP word segmenter: every
+    segmented sentence is turned back into plain text
+    """
+    from extract import DEFAULT_SAVE_DIR, get_segmenter
+
+    segmenter = get_segmenter(save_dir or DEFAULT_SAVE_DIR)
+
+    def split(text: str)->List[str]:
+        return [sentence.replace("_", " ") for sentence in segmenter.segment(text)]
+
+    return split
+
+
+def chunk_sentences(sentences: Iterable[str], max_chars: int = 800)->List[str]:
+    r"""
+    Pack consecutive sentences into chunks of at most `max_chars` characters
+    (a longer sentence is a chunk on its own)
+    """
+    chunks, current = [], []
+    length = 0
+    for sentence in sentences:
+        if current and length + len(sentence) + 1 > max_chars:
+            chunks.append(" ".join(current))
+            current, length = [], 0
+        current.append(sentence)
+        length += len(sentence) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def chunk_hash(text: str)->str:
+    return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()
+
+
+def iter_chunks(
+        documents: Iterable[Tuple[Optional[str], str]],
+        split_sentences: Callable[[str], List[str]] = regex_sentences,
+        max_chars: int = 800
+    )->Iterator[Chunk]:
+    r"""
+    Yield unique chunks of (date, corpus) documents
+    """
+    seen = set()
+    for date, corpus in documents:
+        if not corpus:
+            continue
+        for paragraph in corpus.split("\n"):
+            if not paragraph.strip():
+                continue
+            for text in chunk_sentences(split_sentences(paragraph), max_chars):
+                digest = chunk_hash(text)
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                yield digest, text, date
+
+
+def extract_chunks(
+        chunks: Iterable[Chunk],
+        runner,
+        store: EventStore,
+        batch_size: int = 64,
+        source: Optional[str] = None
+    )->dict:
+    r"""
+    Extract events for the chunks not processed yet and store them
+    Args:
+        chunks (Iterable[Chunk]): chunks from `iter_chunks`
+        runner (ExtractionRunner): batched extraction runner
+        store (EventStore): destination store
+        batch_size (int): chunks handed to the runner at once, the runner
+            splits them further into token-budgeted batches
+    Returns:
+        counts of chunks seen, skipped, extracted and invalid, and new events
+    """
+    stats = {"chunks": 0, "skipped": 0, "extracted": 0, "invalid": 0, "events": 0}
+    pending: List[Chunk] = []
+
+    def flush()->None:
+        done = store.processed_hashes(digest for digest, _, _ in pending)
+        todo = [chunk for chunk in pending if chunk[0] not in done]
+        stats["skipped"] += len(pending) - len(todo)
+        dates = {digest: date for digest, _, date in todo}
+        for result in runner.iter_results([text for _, text, _ in todo], [digest for digest, _, _ in todo]):
+            output = parse_output(result["output"])
+            stats["extracted"] += 1
+            stats["invalid"] += int(output is None)
+            stats["events"] += store.add_chunk(
+                result["id"],
+                output.event_list if output is not None else None,
+                source = source,
+                date = dates[result["id"]]
+            )
+        pending.clear()
+        print(f"[event_pipeline] {stats}")
+
+    for chunk in chunks:
+        stats["chunks"] += 1
+        pending.append(chunk)
+        if len(pending) >= batch_size:
+            flush()
+    if pending:
+        flush()
+    return stats
+
+
+def dataset_documents(dataset_path: str, symbol: str)->List[Tuple[str, str]]:
+    r"""
+    (date, merge_corpus) pairs of one symbol of the stage 4 dataset
+    """
+    from .LSTM.data_io import load_aligned_dataset
+
+    frame = load_aligned_dataset(dataset_path, symbol = symbol, columns = ["time", "merge_corpus"])
+    frame = frame.dropna(subset = ["merge_corpus"])
+    return [(str(time.date()), corpus) for time, corpus in zip(frame["time"], frame["merge_corpus"])]
+
+
+def main()->None:
+    parser = argparse.ArgumentParser(description = "Sentence-chunked event extraction")
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+
+    run_parser = subparsers.add_parser("run", help = "extract events from the stage 4 dataset")
+    run_parser.add_argument("--dataset", default = "stage_4_data/dataset")
+    run_parser.add_argument("--symbol", default = "ACB")
+    run_parser.add_argument("--db", default = str(DEFAULT_DB))
+    run_parser.add_argument("--model-id", default = "google/gemma-3-1b-it")
+    run_parser.add_argument("--quantization", default = "None", choices = ["8_bits", "4_bits", "None"])
+    run_parser.add_argument("--max-chars", type = int, default = 800)
+    run_parser.add_argument("--batch-size", type = int, default = 64)
+    run_parser.add_argument("--no-vncorenlp", action = "store_true", help = "split sentences with a regex")
+
+    query_parser = subparsers.add_parser("query", help = "look up stored events")
+    query_parser.add_argument("--db", default = str(DEFAULT_DB))
+    query_parser.add_argument("--entity")
+    query_parser.add_argument("--relation")
+    query_parser.add_argument("--start")
+    query_parser.add_argument("--end")
+    query_parser.add_argument("--limit", type = int, default = 100)
+
+    args = parser.parse_args()
+
+    with EventStore(args.db) as store:
+        if args.command == "query":
+            for event in store.find(args.entity, args.relation, args.start, args.end, args.limit):
+                print(event)
+            return
+
+        from .extraction_runner import ExtractionRunner
+        from .inference import Inference
+
+        runner = ExtractionRunner.from_inference(
+            Inference(args.model_id, args.quantization),
+            constrained = True
+        )
+        split_sentences = regex_sentences if args.no_vncorenlp else vncorenlp_sentences()
+        chunks = iter_chunks(dataset_documents(args.dataset, args.symbol), split_sentences, args.max_chars)
+        extract_chunks(chunks, runner, store, batch_size = args.batch_size, source = args.symbol)
+        print(f"[event_pipeline] store: {store.summary()}")
+
+
+if __name__ == "__main__":
+    main()
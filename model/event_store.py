@@ -0,0 +1,181 @@
+r"""
+Local knowledge-graph store for extracted S - R - O events.
+
+Events are kept in SQLite together with the text chunks they come from:
+
+    chunks(hash, source, date, valid, processed_at)
+    events(subject, relation, object, time, date, chunk_hash, ...)
+
+Subject, relation and object are stored as extracted and in a normalized
+form (unicode NFC, lower case, collapsed whitespace, trimmed punctuation);
+an event is unique on its normalized triple and date, so the same fact
+reported by several articles of a day is stored once. The normalized
+columns and the date are indexed for lookups by entity, relation and date.
+"""
+import re
+import sqlite3
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from .data_model import Event
+
+_SPACES = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " .,;:!?\"'“”()[]-–"
+
+
+def normalize(text: str)->str:
+    text = unicodedata.normalize("NFC", text or "")
+    return _SPACES.sub(" ", text).strip(_EDGE_PUNCTUATION).lower()
+
+
+class EventStore(object):
+    r"""
+    Args:
+        path (Path): SQLite database file
+    """
+    _schema = """
+        CREATE TABLE IF NOT EXISTS chunks (
+            hash TEXT PRIMARY KEY,
+            source TEXT,
+            date TEXT,
+            valid INTEGER NOT NULL,
+            processed_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            subject TEXT NOT NULL,
+            relation TEXT NOT NULL,
+            object TEXT NOT NULL,
+            time TEXT,
+            date TEXT,
+            subject_norm TEXT NOT NULL,
+            relation_norm TEXT NOT NULL,
+            object_norm TEXT NOT NULL,
+            chunk_hash TEXT NOT NULL,
+            UNIQUE (subject_norm, relation_norm, object_norm, date)
+        );
+        CREATE INDEX IF NOT EXISTS idx_events_subject ON events (subject_norm, date);
+        CREATE INDEX IF NOT EXISTS idx_events_object ON events (object_norm, date);
+        CREATE INDEX IF NOT EXISTS idx_events_relation ON events (relation_norm, date);
+        CREATE INDEX IF NOT EXISTS idx_events_date ON events (date);
+        -- UNIQUE treats NULL dates as distinct: undated events get their own
+        -- partial index (duplicates written before it existed are dropped first)
+        DELETE FROM events WHERE date IS NULL AND id NOT IN (
+            SELECT MIN(id) FROM events WHERE date IS NULL GROUP BY subject_norm, relation_norm, object_norm
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_events_undated
+            ON events (subject_norm, relation_norm, object_norm) WHERE date IS NULL;
+    """
+
+    def __init__(self, path: Union[str, Path])->None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self._schema)
+        self._conn.commit()
+
+    def close(self)->None:
+        self._conn.close()
+
+    def __enter__(self)->"EventStore":
+        return self
+
+    def __exit__(self, *exc_info: object)->None:
+        self.close()
+
+    def processed_hashes(self, hashes: Iterable[str])->set:
+        r"""
+        The subset of `hashes` already extracted with a valid output
+        """
+        hashes = list(hashes)
+        done = set()
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT hash FROM chunks WHERE valid = 1 AND hash IN ({', '.join('?' * len(batch))})",
+                batch
+            ).fetchall()
+            done.update(row[0] for row in rows)
+        return done
+
+    def add_chunk(self,
+            chunk_hash: str,
+            events: Optional[List[Event]],
+            source: Optional[str] = None,
+            date: Optional[str] = None
+        )->int:
+        r"""
+        Record a processed chunk and its events in one transaction
+        Args:
+            events (Optional[List[Event]]): None when the output was not valid,
+                the chunk is then retried on the next run
+        Returns:
+            number of new (not duplicated) events
+        """
+        rows = []
+        for event in events or []:
+            subject, relation, obj = normalize(event.S), normalize(event.R), normalize(event.O)
+            if not subject or not relation:
+                continue
+            rows.append((event.S, event.R, event.O, event.time, date, subject, relation, obj, chunk_hash))
+
+        with self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                """
+                INSERT OR IGNORE INTO events
+                    (subject, relation, object, time, date, subject_norm, relation_norm, object_norm, chunk_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            added = self._conn.total_changes - before
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks (hash, source, date, valid, processed_at) VALUES (?, ?, ?, ?, ?)",
+                (chunk_hash, source, date, int(events is not None), datetime.utcnow().isoformat())
+            )
+        return added
+
+    def find(self,
+            entity: Optional[str] = None,
+            relation: Optional[str] = None,
+            start: Optional[str] = None,
+            end: Optional[str] = None,
+            limit: int = 100
+        )->List[Dict[str, str]]:
+        r"""
+        Events whose subject or object is `entity`, with `relation`, dated
+        between `start` and `end` (ISO dates, inclusive). Matching is done on
+        the normalized forms
+        """
+        clauses, params = [], []
+        if entity is not None:
+            clauses.append("(subject_norm = ? OR object_norm = ?)")
+            params += [normalize(entity), normalize(entity)]
+        if relation is not None:
+            clauses.append("relation_norm = ?")
+            params.append(normalize(relation))
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("date <= ?")
+            params.append(end)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn.execute(
+            f"SELECT subject, relation, object, time, date FROM events {where} ORDER BY date, id LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return [
+            {"S": subject, "R": relation, "O": obj, "time": time, "date": date}
+            for subject, relation, obj, time, date in rows
+        ]
+
+    def summary(self)->Dict[str, int]:
+        chunks = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(valid), 0) FROM chunks").fetchone()
+        events = self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        return {"chunks": chunks[0], "valid_chunks": chunks[1], "events": events}
@@ -4,14 +4,16 @@ from transformers import (
     AutoModelForCausalLM, 
     Gemma3ForCausalLM,
     DynamicCache,
-    GenerationConfig
+    GenerationConfig,
+    LogitsProcessorList
 )
 import torch
-from typing import Literal, List
+from typing import Literal, List, Dict, Optional, Tuple
 from functools import partial
 
 from .example import get_total_example
-from .data_model import get_schema
+from .data_model import get_schema, Output
+from .constrained import JsonSchemaLogitsProcessor, ExtractionMetrics, parse_output
 
 
 class Inference(object):
@@ -44,7 +46,13 @@ Bây giờ, hãy đưa ra output cho đoạn văn bản dưới đây
             model_id_list: Literal["google/gemma-2-2b-it", "google/gemma-3-1b-it"],
             quantization: Literal["8_bits", "4_bits", "None"],
             tokenizer_max_length:int = 4000,
+            constrained: bool = False,
         )->None:
+        r"""
+        Args:
+            constrained (bool): mask tokens that would break the `Output` JSON
+                layout and stop as soon as the top-level object is closed
+        """
         model_id = model_id_list
         self.tokenizer = AutoTokenizer.from_pretrained(model_id)
 
@@ -86,22 +94,55 @@ Bây giờ, hãy đưa ra output cho đoạn văn bản dưới đây
         )
 
         self.tokenizer_max_length = tokenizer_max_length
+        self.json_processor = JsonSchemaLogitsProcessor(self.tokenizer) if constrained else None
+        self.metrics = ExtractionMetrics()
+
+    @classmethod
+    def build_messages(cls, user_prompt: str)->List[Dict[str, object]]:
+        return [
+            {
+                "role": "system",
+                "content": [{"type": "text", "text": cls.system_instruction},]
+            },
+            {
+                "role": "user",
+                "content": [{"type": "text", "text": user_prompt},]
+            },
+        ]
+
+    @classmethod
+    def render_prompt_parts(cls, tokenizer)->Tuple[str, str]:
+        r"""
+        Render the full chat prompt once and split it around the statement.
+        Everything before the statement (instructions, JSON schema, examples)
+        is identical for every input, so its KV cache can be shared
+        Returns:
+            (prefix, suffix) so that a prompt is prefix + statement + suffix
+        """
+        marker = "<<statement>>"
+        user_prompt = cls._prompt_template.format(
+            example = get_total_example(),
+            response_schema = get_schema(),
+            statement = marker
+        )
+        if getattr(tokenizer, "chat_template", None):
+            rendered = tokenizer.apply_chat_template(
+                cls.build_messages(user_prompt),
+                add_generation_prompt = True,
+                tokenize = False
+            )
+        else:
+            rendered = f"{cls.system_instruction}\n{user_prompt}"
+
+        prefix, suffix = rendered.split(marker)
+        return prefix, suffix
+
+    def prompt_parts(self)->Tuple[str, str]:
+        return self.render_prompt_parts(self.tokenizer)
 
     def forward(self, corpus:List[str])->List[str]:
         batch_msgs = [
-            [
-                {
-                    "role": "system",
-                    "content": [{"type": "text", "text": self.system_instruction},]
-                },
-                {
-                    "role": "user",
-                    "content": [{
-                        "type": "text", 
-                        "text": self.pre_built_template(statement = statement)
-                        },]
-                },
-            ]
+            self.build_messages(self.pre_built_template(statement = statement))
             for statement in corpus
         ]
 
@@ -118,13 +159,34 @@ Bây giờ, hãy đưa ra output cho đoạn văn bản dưới đây
             return_tensors="pt",
         ).to(self.model.device)
 
+        logits_processor = LogitsProcessorList()
+        if self.json_processor is not None:
+            self.json_processor.reset(prompt_length = inputs['input_ids'].shape[-1])
+            logits_processor.append(self.json_processor)
+
         with torch.inference_mode():
             outputs = self.model.generate(
                 **inputs, 
-                generation_config = self.generation_config
+                generation_config = self.generation_config,
+                logits_processor = logits_processor
             )
 
+        new_tokens = outputs[:, inputs['input_ids'].shape[-1]:]
+        self._last_generated = (new_tokens != self.tokenizer.pad_token_id).sum(dim = 1).tolist()
         return  self.tokenizer.batch_decode(
-            outputs[:, inputs['input_ids'].shape[-1]:], 
+            new_tokens, 
             skip_special_tokens = True
-        )
\ No newline at end of file
+        )
+
+    def extract(self, corpus:List[str])->List[Optional[Output]]:
+        r"""
+        Run `forward` and parse every generation into `Output` (None when the
+        output is not valid). Validity and generated tokens are accumulated
+        in `self.metrics`
+        """
+        results = []
+        for text, generated in zip(self.forward(corpus), self._last_generated):
+            output = parse_output(text)
+            self.metrics.add(output, generated)
+            results.append(output)
+        return results
\ No newline at end of file
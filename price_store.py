@@ -0,0 +1,161 @@
+r"""
+Local OHLCV price cache.
+
+Daily price history is kept per symbol as Parquet files partitioned by year:
+
+    price_data/symbol=ACB/year=2024/data.parquet
+
+The first `load` of a symbol downloads the full history from `start_date`;
+later loads only request the missing tail (from the last cached day up to
+`end`) and rewrite the affected year partitions. The price provider is
+pluggable: `VnstockSource` talks to TCBS through vnstock3, `FrameSource`
+serves in-memory frames for offline runs and tests.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Protocol, Union
+
+import pandas as pd
+
+from Automation.ledger import atomic_open
+
+DEFAULT_ROOT = Path(__file__).resolve().parent / "price_data"
+PRICE_COLUMNS = ["time", "open", "high", "low", "close", "volume"]
+
+
+class PriceSource(Protocol):
+    def history(self, symbol: str, start: str, end: str) -> pd.DataFrame:
+        ...
+
+
+class VnstockSource(object):
+    def __init__(self, source: str = "TCBS"):
+        self.source = source
+
+    def history(self, symbol: str, start: str, end: str) -> pd.DataFrame:
+        from vnstock3 import Vnstock
+
+        stocks = Vnstock().stock(symbol=symbol, source=self.source)
+        return stocks.quote.history(start=start, end=end, interval="1D")
+
+
+class FrameSource(object):
+    r"""
+    Serve price history from in-memory frames, keyed by symbol
+    """
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        self.frames = frames
+
+    def history(self, symbol: str, start: str, end: str) -> pd.DataFrame:
+        frame = self.frames.get(symbol, pd.DataFrame(columns=PRICE_COLUMNS))
+        times = pd.to_datetime(frame["time"])
+        mask = (times >= pd.Timestamp(start)) & (times <= pd.Timestamp(end))
+        return frame.loc[mask].copy()
+
+
+class PriceStore(object):
+    r"""
+    Args:
+        root (Path): directory holding the partitioned Parquet files
+        source (PriceSource): provider used to fill missing dates,
+            defaults to TCBS through vnstock3
+        start_date (str): first day downloaded for a symbol not cached yet
+    """
+    def __init__(self,
+            root: Union[str, Path] = DEFAULT_ROOT,
+            source: Optional[PriceSource] = None,
+            start_date: str = "2022-01-01"
+        )->None:
+        self.root = Path(root)
+        self.source = source if source is not None else VnstockSource()
+        self.start_date = start_date
+
+    def _symbol_dir(self, symbol: str) -> Path:
+        return self.root / f"symbol={symbol}"
+
+    def _read_cached(self, symbol: str) -> pd.DataFrame:
+        files = sorted(self._symbol_dir(symbol).glob("year=*/data.parquet"))
+        if not files:
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        return pd.concat([pd.read_parquet(path) for path in files], ignore_index=True)
+
+    def _write_years(self, symbol: str, frame: pd.DataFrame, years: Iterable[int]) -> None:
+        for year in years:
+            partition = frame.loc[frame["time"].dt.year == year]
+            year_dir = self._symbol_dir(symbol) / f"year={year}"
+            year_dir.mkdir(parents=True, exist_ok=True)
+
+            # unique temp file renamed over the target: readers never see a torn
+            # file and concurrent writers do not share a temp path
+            with atomic_open(year_dir / "data.parquet", "wb") as fp:
+                partition.to_parquet(fp, index=False)
+
+    def update(self, symbol: str, end: Optional[str] = None) -> pd.DataFrame:
+        r"""
+        Fetch the dates missing from the cache and return the full cached history
+        """
+        end = end or str(datetime.now().date())
+        cached = self._read_cached(symbol)
+
+        if cached.empty:
+            fetch_start = self.start_date
+        else:
+            last_day = cached["time"].max()
+            if last_day > pd.Timestamp(end):
+                return cached
+            # re-fetch the last cached day as well, it may have been an intraday
+            # snapshot (when it is `end` itself, only that day is fetched again)
+            fetch_start = str(last_day.date())
+
+        fresh = self.source.history(symbol=symbol, start=fetch_start, end=end)
+        if fresh is None or fresh.empty:
+            return cached
+
+        fresh = fresh.loc[:, [col for col in PRICE_COLUMNS if col in fresh.columns]].copy()
+        fresh["time"] = pd.to_datetime(fresh["time"])
+
+        merged = pd.concat([cached, fresh], ignore_index=True)
+        merged["time"] = pd.to_datetime(merged["time"])
+        merged = merged.drop_duplicates(subset="time", keep="last")
+        merged = merged.sort_values(by="time").reset_index(drop=True)
+
+        self._write_years(symbol, merged, years=sorted(fresh["time"].dt.year.unique()))
+        print(f"[price_store] {symbol}: cached {len(cached)} rows, fetched {len(fresh)} rows from {fetch_start}")
+        return merged
+
+    def load(self,
+            symbol: str,
+            start: Optional[str] = None,
+            end: Optional[str] = None,
+            refresh: bool = True
+        )->pd.DataFrame:
+        r"""
+        Return daily OHLCV rows of `symbol` between `start` and `end` (inclusive)
+        Args:
+            refresh (bool): fetch the missing tail from the source first,
+                otherwise only the local cache is read
+        """
+        frame = self.update(symbol, end=end) if refresh else self._read_cached(symbol)
+        if frame.empty:
+            return frame
+
+        frame["time"] = pd.to_datetime(frame["time"])
+        if start is not None:
+            frame = frame.loc[frame["time"] >= pd.Timestamp(start)]
+        if end is not None:
+            frame = frame.loc[frame["time"] <= pd.Timestamp(end)]
+        return frame.reset_index(drop=True)
+
+    def load_many(self,
+            symbols: Iterable[str],
+            max_workers: int = 8,
+            **load_kwargs
+        )->Dict[str, pd.DataFrame]:
+        r"""
+        Load several symbols concurrently, returns a mapping symbol -> frame
+        """
+        symbols = list(symbols)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = executor.map(lambda symbol: self.load(symbol, **load_kwargs), symbols)
+            return dict(zip(symbols, frames))
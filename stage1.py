@@ -1,7 +1,23 @@
+import argparse
 import urllib3
 from bs4 import BeautifulSoup
 import pickle
 import time
+from dataclasses import asdict
+from typing import Optional
+
+from stage2 import item_record, write_records
+
+
+class FetchError(Exception):
+    def __init__(self, status:Optional[int], url:str, retry_after:Optional[str] = None):
+        self.status = status
+        self.url = url
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return f"status {self.status} for {self.url}"
+
 
 def url_extract(
         url = 'https://cafef.vn/timelinelist/18831/{key}.chn', 
@@ -9,8 +25,17 @@ def url_extract(
         user_agent = 'Mozilla/5.0 (Windows NT 10.0; WOW64; rv:11.0) Gecko/20100101',
         host = 'cafef.vn',
         referer = 'https://cafef.vn/thi-truong-chung-khoan.chn',
-        connection = 'keep-alive'
+        connection = 'keep-alive',
+        raise_for_status: bool = False,
+        compact: bool = False
         ):
+    r"""
+    Fetch one timeline page
+    Args:
+        compact (bool): return the link records of the items (link, title,
+            sapo, published_at) extracted in this parse instead of their
+            raw HTML, so stage2 does not parse the page again
+    """
 
     reponse = urllib3.request(
         method= "GET", 
@@ -25,24 +50,49 @@ def url_extract(
 
     if reponse.status == 200:
         soup = BeautifulSoup(reponse.data, 'html.parser')
+        items = soup.find_all(
+            name= 'div',
+            attrs= {'class': 'tlitem box-category-item'}
+        )
+        if compact:
+            records = []
+            for ith, tag in enumerate(items):
+                # one malformed item must not fail the whole page fetch
+                try:
+                    records.append(asdict(item_record(tag, key, ith)))
+                except Exception as ex:
+                    print(f'[stage1] skip item: {ex}')
+            return {
+                'key': key,
+                'records': records
+            }
         return {
             'key': key,
             'list_tags': [
                 str(tag) 
-                for tag in 
-                soup.find_all(
-                name= 'div',
-                attrs= {'class': 'tlitem box-category-item'}
-                )
+                for tag in items
             ] 
         }
+    elif raise_for_status:
+        raise FetchError(
+            status = reponse.status,
+            url = url.format(key = key),
+            retry_after = reponse.headers.get('Retry-After')
+        )
     else:
         return None
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--compact', action = 'store_true', help = 'write link records ({key}.jsonl) instead of HTML pickles')
+    args = parser.parse_args()
+
     for i in range(500, 1000):
-        output = url_extract(key= i)
+        output = url_extract(key= i, compact = args.compact)
         if output is not None:
-            with open(f'stage_1_data/{i}.pkl','wb') as fp:
-                pickle.dump(output, fp)
+            if args.compact:
+                write_records(f'stage_1_data/{i}.jsonl', output['records'])
+            else:
+                with open(f'stage_1_data/{i}.pkl','wb') as fp:
+                    pickle.dump(output, fp)
         time.sleep(3)
\ No newline at end of file
@@ -1,41 +1,307 @@
+import argparse
 import glob
-from typing import Dict, Any, List
+import os
+import re
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, Any, List, Optional
 import pickle
 from bs4 import BeautifulSoup
+from bs4.element import Tag
 import json
 
-def process_each_file(data:Dict[str,str])->List[Dict[str,str]]:
-    total_link = []
-
-    for ith, soup_as_str in enumerate(data['list_tags']):
-        soup = BeautifulSoup(soup_as_str, 'html.parser')
-        
-        link = None
-        for tag in soup.find_all('a',href=True):
-            if tag.get("class")==None:
-                link = tag['href']
-
-        if link is None:
-            raise Exception(f"cannot find link in ith: {ith}, key: {data['key']}")
-        else:
-            total_link.append({
-                'key': data['key'],
-                'link': link
-            })
-    
+# news for ACB and other banks only, shared with the article filter of stage4
+KEYWORD_PATTERN = re.compile(r"\bACB\b|\bNgân hàng\b|\bngân hàng\b|\bgiá vàng\b|\bvàng\b")
+
+# the same keywords as they appear in an (unaccented) article slug
+SLUG_KEYWORD_PATTERN = re.compile(r"(?:^|[/-])(?:acb|ngan-hang|gia-vang|vang)(?=-|\.chn|$)")
+
+# cafef article ids start with the publish time: 188 + yymmddHHMMSS or yyyymmddHHMMSS
+_LINK_ID = re.compile(r"-(\d{14,18})\.chn$")
+
+_TIMESTAMP_FORMATS = ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M", "%d-%m-%Y - %H:%M")
+
+
+def is_relevant(text: Optional[str])->bool:
+    r"""
+    Whether a text mentions ACB, banks or gold
+    """
+    return bool(text) and KEYWORD_PATTERN.search(text) is not None
+
+
+def link_timestamp(link: str)->Optional[str]:
+    r"""
+    Publish time encoded in a cafef article id (ISO format), None if the id
+    does not carry one
+    """
+    match = _LINK_ID.search(link)
+    if match is None:
+        return None
+
+    digits = match.group(1)
+    candidates = [(digits[3:15], "%y%m%d%H%M%S")] if digits.startswith("188") else []
+    candidates.append((digits[:14], "%Y%m%d%H%M%S"))
+    for value, date_format in candidates:
+        try:
+            return datetime.strptime(value, date_format).isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_timestamp(value: Optional[str])->Optional[str]:
+    if not value:
+        return None
+    value = value.strip()
+    for date_format in _TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def snippet_fields(soup: Tag, link: str)->Dict[str, Optional[str]]:
+    r"""
+    Title, sapo and publish time of a timeline item. The publish time comes
+    from the item's time tag when it has one, else from the article id
+    """
+    title = None
+    heading = soup.find(['h2', 'h3'])
+    if heading is not None:
+        title = heading.get_text(" ", strip = True) or None
+    if title is None:
+        for tag in soup.find_all('a', href = True):
+            if tag.get('title'):
+                title = tag['title'].strip()
+                break
+
+    sapo_tag = soup.find(class_ = re.compile(r"sapo"))
+    sapo = sapo_tag.get_text(" ", strip = True) if sapo_tag is not None else None
+
+    published_at = None
+    for time_tag in soup.find_all(class_ = re.compile(r"\btime")):
+        published_at = _parse_timestamp(time_tag.get('title')) or _parse_timestamp(time_tag.get_text())
+        if published_at is not None:
+            break
+
+    return {
+        'title': title,
+        'sapo': sapo or None,
+        'published_at': published_at or link_timestamp(link)
+    }
+
+
+def is_likely_relevant(entry: Dict[str, Any])->bool:
+    r"""
+    Relevance prefilter on what the timeline already gives: title, sapo and
+    the article slug. It is looser than the article filter of stage4, which
+    still runs on the downloaded body
+    """
+    if is_relevant(entry.get('title')) or is_relevant(entry.get('sapo')):
+        return True
+    return SLUG_KEYWORD_PATTERN.search(entry.get('link', '').lower()) is not None
+
+
+@dataclass
+class LinkRecord:
+    r"""
+    Compact stage 1/2 record of one timeline item
+    """
+    key: int
+    link: str
+    title: Optional[str] = None
+    sapo: Optional[str] = None
+    published_at: Optional[str] = None
+
+
+def item_record(item: Tag, key: int, ith: int = 0)->LinkRecord:
+    r"""
+    Link and snippet of one parsed `tlitem box-category-item` block
+    """
+    link = None
+    for tag in item.find_all('a',href=True):
+        if tag.get("class")==None:
+            link = tag['href']
+
+    if link is None:
+        raise Exception(f"cannot find link in ith: {ith}, key: {key}")
+    return LinkRecord(key = key, link = link, **snippet_fields(item, link))
+
+
+def process_each_file(data:Dict[str,str], relevant_only: bool = False)->List[Dict[str,str]]:
+    r"""
+    Links of one timeline page with their snippet (title, sapo, published_at).
+    Pages fetched in compact mode already carry their `records`, legacy
+    pages are parsed from their `list_tags`
+    Args:
+        relevant_only (bool): keep only the links passing `is_likely_relevant`,
+            the others are not worth downloading
+    """
+    if 'records' in data:
+        total_link = [dict(record) for record in data['records']]
+    else:
+        total_link = [
+            asdict(item_record(BeautifulSoup(soup_as_str, 'html.parser'), data['key'], ith))
+            for ith, soup_as_str in enumerate(data['list_tags'])
+        ]
+
+    if relevant_only:
+        total_link = [entry for entry in total_link if is_likely_relevant(entry)]
     return total_link
 
-if __name__ == '__main__':
-    stage_data = []
-    for _path in glob.glob('stage_1_data/*.pkl'):
+
+def read_records(path: str)->Dict[str, Any]:
+    r"""
+    Load a compact stage 1 page (`{key}.jsonl`, one `LinkRecord` per line)
+    in the shape of a fetched page
+    """
+    with open(path, 'r', encoding = 'utf-8') as fp:
+        records = [json.loads(line) for line in fp if line.strip()]
+    key = int(os.path.splitext(os.path.basename(path))[0])
+    return {'key': key, 'records': records}
+
+
+def write_records(path: str, records: List[Dict[str, Any]])->None:
+    with open(path, 'w', encoding = 'utf-8') as fp:
+        for record in records:
+            fp.write(json.dumps(record, ensure_ascii = False) + "\n")
+
+
+def convert_pickles(stage1_dir: str = 'stage_1_data', remove: bool = False)->int:
+    r"""
+    Convert legacy `{key}.pkl` pages (raw HTML fragments) into compact
+    `{key}.jsonl` records
+    Args:
+        remove (bool): delete every pickle once converted
+    """
+    converted = 0
+    for _path in sorted(glob.glob(os.path.join(stage1_dir, '*.pkl'))):
         with open(_path, 'rb') as fp:
             data = pickle.load(fp)
-            
+        try:
+            records = process_each_file(data)
+        except Exception as e:
+            print(f'cannot convert {_path}: {e}')
+            continue
+
+        write_records(os.path.splitext(_path)[0] + '.jsonl', records)
+        if remove:
+            os.remove(_path)
+        converted += 1
+    return converted
+
+
+def load_stage1_pages(stage1_dir: str = 'stage_1_data')->List[Dict[str, Any]]:
+    r"""
+    Every stored timeline page, a compact `.jsonl` page taking precedence over
+    the legacy pickle of the same key
+    """
+    pages = {}
+    for _path in glob.glob(os.path.join(stage1_dir, '*.pkl')):
+        try:
+            with open(_path, 'rb') as fp:
+                data = pickle.load(fp)
+        except Exception as e:
+            print(f'cannot read {_path}: {e}')
+            continue
+        pages[data['key']] = data
+    for _path in glob.glob(os.path.join(stage1_dir, '*.jsonl')):
+        data = read_records(_path)
+        pages[data['key']] = data
+    return [pages[key] for key in sorted(pages)]
+
+
+def article_snippet(page_data: str, url: str)->Dict[str, Optional[str]]:
+    r"""
+    Title and sapo of a downloaded article page, standing in for the timeline
+    snippet when labeling pages fetched before snippets were kept
+    """
+    soup = BeautifulSoup(page_data, 'html.parser')
+    title = soup.find("h1", attrs = {"class": "title"})
+    sapo = soup.find(class_ = re.compile(r"sapo"))
+    return {
+        'link': url,
+        'title': title.get_text(" ", strip = True) if title is not None else None,
+        'sapo': sapo.get_text(" ", strip = True) if sapo is not None else None,
+    }
+
+
+def build_fixture(stage3_glob: str, output_path: str)->int:
+    r"""
+    Label downloaded stage 3 pages for `evaluate_prefilter`: one JSON line per
+    article with its snippet and `relevant`, the verdict of the stage4 filter
+    on the full body
+    """
+    from stage4 import NonmatchException, pre_processing_page_data
+
+    count = 0
+    with open(output_path, 'w', encoding = 'utf-8') as out:
+        for json_file in sorted(glob.glob(stage3_glob)):
+            with open(json_file, 'r', encoding = 'utf-8') as fp:
+                pages = json.load(fp)
+            for page in pages:
+                try:
+                    pre_processing_page_data(page_data = page['page_data'], url = page['url'])
+                    relevant = True
+                except NonmatchException:
+                    relevant = False
+                except IndexError:
+                    continue
+                record = {**article_snippet(page['page_data'], page['url']), 'relevant': relevant}
+                out.write(json.dumps(record, ensure_ascii = False) + "\n")
+                count += 1
+    return count
+
+
+def evaluate_prefilter(fixture_path: str)->Dict[str, float]:
+    r"""
+    Downloads skipped by the prefilter versus relevant articles it misses,
+    on a labeled fixture (see `build_fixture`)
+    """
+    with open(fixture_path, 'r', encoding = 'utf-8') as fp:
+        items = [json.loads(line) for line in fp if line.strip()]
+
+    relevant = sum(item['relevant'] for item in items)
+    kept = [item for item in items if is_likely_relevant(item)]
+    missed = sum(item['relevant'] for item in items if not is_likely_relevant(item))
+
+    report = {
+        'articles': len(items),
+        'relevant': relevant,
+        'downloads': len(kept),
+        'skipped': len(items) - len(kept),
+        'skip_rate': (len(items) - len(kept)) / len(items) if items else 0.0,
+        'missed': missed,
+        'recall': (relevant - missed) / relevant if relevant else 1.0,
+    }
+    print(report)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--relevant-only', action = 'store_true', help = 'keep only links whose snippet looks relevant')
+    parser.add_argument('--build-fixture', type = str, help = 'label stage 3 pages into this JSONL fixture')
+    parser.add_argument('--evaluate', type = str, help = 'report the prefilter on a labeled JSONL fixture')
+    parser.add_argument('--convert', action = 'store_true', help = 'convert stage_1_data/*.pkl into compact .jsonl records')
+    parser.add_argument('--remove-pickles', action = 'store_true', help = 'with --convert, delete the converted pickles')
+    args = parser.parse_args()
+
+    if args.build_fixture:
+        print(f'labeled articles: {build_fixture("stage_3_data/page_data_*.json", args.build_fixture)}')
+    elif args.evaluate:
+        evaluate_prefilter(args.evaluate)
+    elif args.convert:
+        print(f'converted pages: {convert_pickles(remove = args.remove_pickles)}')
+    else:
+        stage_data = []
+        for data in load_stage1_pages():
             try:
-                stage_data.extend(process_each_file(data))
+                stage_data.extend(process_each_file(data, relevant_only = args.relevant_only))
             except Exception as e:
                 print(f'has eception: {e}')
                 continue
-    
-    with open('stage_2_data/links.json','w') as fp:
-        json.dump(stage_data, fp, indent= 4)
\ No newline at end of file
+
+        with open('stage_2_data/links.json','w') as fp:
+            json.dump(stage_data, fp, indent= 4)
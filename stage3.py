@@ -3,6 +3,7 @@ from bs4 import BeautifulSoup
 import pickle
 import time
 import json
+from stage1 import FetchError
 
 def url_extract(
         url:str,
@@ -10,7 +11,9 @@ def url_extract(
         user_agent = 'Mozilla/5.0 (Windows NT 10.0; WOW64; rv:11.0) Gecko/20100101',
         host = 'cafef.vn',
         referer = 'https://cafef.vn/thi-truong-chung-khoan.chn',
-        connection = 'keep-alive'
+        connection = 'keep-alive',
+        raise_for_status: bool = False,
+        timeout: float = 30.0
         ):
 
     reponse = urllib3.request(
@@ -21,7 +24,8 @@ def url_extract(
             'Host': host,
             'Referer': referer,
             'Connection': connection
-            }
+            },
+        timeout= urllib3.Timeout(connect= 10.0, read= timeout)
     )
 
     if reponse.status == 200:
@@ -31,6 +35,12 @@ def url_extract(
             'url': 'https://cafef.vn' +url,
             'page_data': str(soup)
         }
+    elif raise_for_status:
+        raise FetchError(
+            status = reponse.status,
+            url = 'https://cafef.vn' +url,
+            retry_after = reponse.headers.get('Retry-After')
+        )
     else:
         return None
 
@@ -2,15 +2,15 @@ import json
 import glob
 from bs4 import BeautifulSoup
 import argparse
-from typing import Literal, List, Dict, Union
+from typing import Literal, List, Dict, Optional, Union
 from datetime import datetime
-import re
 from tqdm import tqdm
 from collections import defaultdict
-from vnstock3 import Vnstock
 import os
 import pandas as pd
 import numpy as np
+from price_store import PriceStore
+from stage2 import is_relevant
 
 class NonmatchException(Exception):
     def __init__(self, message:str):
@@ -42,9 +42,7 @@ def pre_processing_page_data(page_data:str, url:str)->Dict[str, Union[int, str]]
     main_corpus = "\n".join(lines[title_idx+1:end_corpus_idx-4])
 
     # find news for ACB and other banks only
-    regex_result = re.findall(r"\bACB\b|\bNgân hàng\b|\bngân hàng\b|\bgiá vàng\b|\bvàng\b", main_corpus)
-
-    if len(set(regex_result)) > 0:
+    if is_relevant(main_corpus):
         return {
             'url': url,
             'day': publish_data_datetime_object.day,
@@ -57,13 +55,33 @@ def pre_processing_page_data(page_data:str, url:str)->Dict[str, Union[int, str]]
 
 
 class PostProcessing(object):
-    def __init__(self):
+    r"""
+    Args:
+        drop_duplicates (bool): skip the articles listed in `duplicates_path`
+            (see `dedup.py`)
+        data_dir (str): directory of the stage 4 `page_data_*.json` files
+        duplicates_path (str): defaults to `duplicates.json` in `data_dir`
+    """
+    def __init__(self,
+            symbol:str = "ACB",
+            price_store:PriceStore = None,
+            drop_duplicates: bool = True,
+            data_dir: str = 'stage_4_data',
+            duplicates_path: Optional[str] = None
+        ):
         total_data = []
-        for json_file in glob.glob('stage_4_data/page_data_*.json'):
+        for json_file in glob.glob(os.path.join(data_dir, 'page_data_*.json')):
             with open(json_file,'r') as fp:
                 stage3_data = json.load(fp)
                 total_data.extend(stage3_data)
 
+        if drop_duplicates:
+            from dedup import load_duplicate_urls
+
+            if duplicates_path is None:
+                duplicates_path = os.path.join(data_dir, 'duplicates.json')
+            duplicate_urls = load_duplicate_urls(duplicates_path)
+            total_data = [item for item in total_data if item['url'] not in duplicate_urls]
 
         self.grouped_data = defaultdict(list)
         for item in total_data:
@@ -73,16 +91,27 @@ class PostProcessing(object):
                 'corpus':item['corpus']
             })
 
-        self.stock_values = self._post_processing_vnstock()
+        self.symbol = symbol
+        self.price_store = price_store if price_store is not None else PriceStore()
+        self._stock_values = None
 
+    @property
+    def stock_values(self)->pd.DataFrame:
+        # loaded on first use, `align_many` loads its own symbols
+        if self._stock_values is None:
+            self._stock_values = self._post_processing_vnstock()
+        return self._stock_values
 
     def _post_processing_vnstock(self)->pd.DataFrame:
-        acb_stocks = Vnstock().stock(symbol="ACB", source= "TCBS")
-        stock_values =  acb_stocks.quote.history(
-            start = "2022-01-01", 
-            end = str(datetime.now().date()),
-            interval = '1D'
+        stock_values = self.price_store.load(
+            self.symbol,
+            start = "2022-01-01",
+            end = str(datetime.now().date())
         )
+        return self._prepare_prices(stock_values)
+
+    @staticmethod
+    def _prepare_prices(stock_values: pd.DataFrame)->pd.DataFrame:
         stock_values = stock_values.sort_values(by = 'time')
 
         stock_values['year'] = stock_values['time'].dt.year
@@ -100,38 +129,118 @@ class PostProcessing(object):
         return stock_values
 
 
-    def _get_corpus(self, row):
+    def _day_corpus(self)->Dict[tuple, str]:
         r"""
-        Merge corpus and get embedding
-        """    
-        query_key = (row.year, row.month, row.day)
-        
-        try:
-            merge_corpus = "\n".join([
-                element['corpus'] 
-                for element in self.grouped_data[query_key]
-            ])
-
-            return {
-                'merge_corpus': merge_corpus
-            }
-        except IndexError as err:
-            return {
-                'merge_corpus': ""
-            }
+        Merged corpus of every (year, month, day) with news
+        """
+        return {
+            query_key: "\n".join([element['corpus'] for element in elements])
+            for query_key, elements in self.grouped_data.items()
+            if len(elements) > 0
+        }
 
     def align(self):
         r"""
-        Align corpus with time in price dataframe
+        Align corpus with time in price dataframe. Days without news get a
+        null `merge_corpus`, like `align_many`
         """
-        self.stock_values['merge_corpus'] = self.stock_values.apply(
-            lambda x: self._get_corpus(x), 
-            axis = 1, 
-            result_type = "expand"
-        )
-        
+        day_corpus = self._day_corpus()
+        self.stock_values['merge_corpus'] = [
+            day_corpus.get(query_key)
+            for query_key in zip(self.stock_values.year, self.stock_values.month, self.stock_values.day)
+        ]
+
         return self.stock_values
 
+    def align_many(self, symbols: List[str])->pd.DataFrame:
+        r"""
+        Align the news corpus with the price history of several symbols
+        in one pass, returns a long dataframe with a `symbol` column.
+        Days without news get a null `merge_corpus`
+        """
+        price_frames = self.price_store.load_many(
+            symbols,
+            start = "2022-01-01",
+            end = str(datetime.now().date())
+        )
+
+        day_corpus = self._day_corpus()
+
+        aligned = []
+        for symbol, stock_values in price_frames.items():
+            if stock_values.empty:
+                print(f'no price data for {symbol}, skipped')
+                continue
+
+            stock_values = self._prepare_prices(stock_values)
+            stock_values['symbol'] = symbol
+            stock_values['merge_corpus'] = [
+                day_corpus.get(query_key)
+                for query_key in zip(stock_values.year, stock_values.month, stock_values.day)
+            ]
+            aligned.append(stock_values)
+
+        return pd.concat(aligned, ignore_index= True)
+
+
+def write_dataset(aligned: pd.DataFrame, output_dir: str)->str:
+    r"""
+    Write an aligned dataframe as a Parquet dataset partitioned by
+    symbol/year. Partitions present in `aligned` are replaced, others are kept
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    frame = aligned.drop(columns = ['time_diff'], errors = 'ignore').copy()
+    for column in ['open', 'high', 'low', 'close']:
+        frame[column] = frame[column].astype('float64')
+    # nullable: partial price rows (holidays, the current day) have no volume
+    frame['volume'] = frame['volume'].astype('Int64')
+    frame['merge_corpus'] = frame['merge_corpus'].astype('string')
+    if 'segmented_corpus' in frame.columns:
+        frame['segmented_corpus'] = frame['segmented_corpus'].astype('string')
+
+    pq.write_to_dataset(
+        pa.Table.from_pandas(frame, preserve_index= False),
+        root_path = output_dir,
+        partition_cols = ['symbol', 'year'],
+        existing_data_behavior = 'delete_matching'
+    )
+    return output_dir
+
+
+def segment_corpus(aligned: pd.DataFrame)->pd.DataFrame:
+    r"""
+    Add a `segmented_corpus` column with the VnCoreNLP word segmentation of
+    `merge_corpus` (compounds joined by '_'). Every distinct day corpus is
+    segmented once, in batched calls to a single JVM
+    """
+    from extract import get_segmenter
+
+    segmenter = get_segmenter()
+    corpora = aligned['merge_corpus'].dropna().unique().tolist()
+    segmented = dict(zip(corpora, [
+        " ".join(sentences) for sentences in segmenter.segment_many(corpora)
+    ]))
+    aligned['segmented_corpus'] = aligned['merge_corpus'].map(segmented)
+    return aligned
+
+
+def build_dataset(symbols: List[str], output_dir: str = 'stage_4_data/dataset', segment: bool = False)->str:
+    r"""
+    Align news with prices for every symbol and write the partitioned dataset
+    Args:
+        segment (bool): also store the word segmented corpus
+    """
+    engine = PostProcessing(symbol = symbols[0])
+    result_data = engine.align_many(symbols)
+    if segment:
+        result_data = segment_corpus(result_data)
+
+    print('result data length: ', len(result_data))
+
+    return write_dataset(result_data, output_dir)
+
 
 def main()->None:
     # for json_file in glob.glob('stage_3_data/*.json'):
@@ -154,13 +263,14 @@ def main()->None:
     #             json.dump(total_data, fp, indent= 4)
 
 
-    # post processing
-    engine = PostProcessing()
-    result_data = engine.align()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', nargs = '+', default = ['ACB'])
+    parser.add_argument('--output-dir', type = str, default = 'stage_4_data/dataset')
+    parser.add_argument('--segment', action = 'store_true', help = 'add a VnCoreNLP word segmented corpus column')
+    args = parser.parse_args()
 
-    print('result data length: ', len(result_data))
-
-    result_data.to_csv('stage_4_data/total.csv')
+    # post processing
+    build_dataset(symbols = args.symbols, output_dir = args.output_dir, segment = args.segment)
 
 
 if __name__ == '__main__':
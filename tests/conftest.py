@@ -0,0 +1,71 @@
+"""
+Fixtures for the tests against a MySQL/MariaDB server.
+
+The server is reached with the MYSQL_TEST_HOST, MYSQL_TEST_PORT,
+MYSQL_TEST_USER and MYSQL_TEST_PASSWORD environment variables (default
+root@127.0.0.1:3306, no password); every test works in a throwaway
+database. Tests using `mysql_config` are marked `mysql` and skipped when
+mysql-connector-python is missing or no server answers, e.g. with a local
+container:
+
+    docker run -d -p 3306:3306 -e MARIADB_ROOT_PASSWORD=test mariadb:11
+    MYSQL_TEST_PASSWORD=test python -m pytest -m mysql
+"""
+import os
+import uuid
+
+import pytest
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'mysql: needs a MySQL/MariaDB server (see tests/conftest.py)')
+
+
+def pytest_collection_modifyitems(items):
+    for item in items:
+        if 'mysql_config' in getattr(item, 'fixturenames', ()):
+            item.add_marker('mysql')
+
+
+def _server_config():
+    return {
+        'host': os.getenv('MYSQL_TEST_HOST', '127.0.0.1'),
+        'port': int(os.getenv('MYSQL_TEST_PORT', '3306')),
+        'user': os.getenv('MYSQL_TEST_USER', 'root'),
+        'password': os.getenv('MYSQL_TEST_PASSWORD', ''),
+    }
+
+
+@pytest.fixture
+def mysql_config():
+    """
+    Connection arguments of a fresh database, dropped after the test.
+    """
+    connector = pytest.importorskip('mysql.connector')
+    server = _server_config()
+    try:
+        conn = connector.connect(connection_timeout=3, **server)
+    except connector.Error as ex:
+        pytest.skip(f'no MySQL server at {server["host"]}:{server["port"]}: {ex}')
+
+    database = f'crawl_web_test_{uuid.uuid4().hex[:8]}'
+    cursor = conn.cursor()
+    cursor.execute(f'CREATE DATABASE {database}')
+    try:
+        # strict mode: bad values fail instead of being truncated
+        yield dict(server, database=database, sql_mode='STRICT_ALL_TABLES')
+    finally:
+        cursor.execute(f'DROP DATABASE {database}')
+        cursor.close()
+        conn.close()
+
+
+@pytest.fixture
+def mysql_conn(mysql_config):
+    import mysql.connector
+
+    conn = mysql.connector.connect(**mysql_config)
+    try:
+        yield conn
+    finally:
+        conn.close()
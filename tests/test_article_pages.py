@@ -0,0 +1,63 @@
+"""
+Automation/automation.py download_article_pages with a stubbed fetcher: every
+batch file holds the pages of all its links.
+"""
+import json
+
+import pytest
+
+pytest.importorskip('urllib3')
+pytest.importorskip('bs4')
+
+from Automation import automation  # noqa: E402
+from Automation.ledger import JobLedger  # noqa: E402
+from Automation.rate_control import AdaptiveRateController  # noqa: E402
+
+
+@pytest.fixture
+def stage_dirs(tmp_path, monkeypatch):
+    for name in ('STAGE1_DIR', 'STAGE2_DIR', 'STAGE3_DIR', 'STAGE4_DIR', 'DAILY_DIR'):
+        monkeypatch.setattr(automation, name, tmp_path / name.lower())
+    fetched = []
+
+    def fetch(url, key, raise_for_status=False):
+        fetched.append(url)
+        return {'key': key, 'url': automation.ARTICLE_BASE_URL + url, 'page_data': f'<p>{url}</p>'}
+
+    monkeypatch.setattr(automation, 'fetch_article_page', fetch)
+    return tmp_path, fetched
+
+
+def _download(tmp_path, links):
+    automation.ensure_directories()
+    (automation.STAGE2_DIR / 'links.json').write_text(json.dumps(links), encoding='utf-8')
+    with JobLedger(tmp_path / 'ledger.sqlite') as ledger:
+        automation.download_article_pages(
+            step=2, ledger=ledger, controller=AdaptiveRateController(initial_rate=1000.0, max_rate=1000.0)
+        )
+
+
+def _batch(start):
+    with (automation.STAGE3_DIR / f'page_data_{start}.json').open(encoding='utf-8') as fp:
+        return [page['url'] for page in json.load(fp)]
+
+
+def test_link_of_an_earlier_batch_is_kept_in_later_batches(stage_dirs):
+    tmp_path, fetched = stage_dirs
+    links = [{'link': '/a.chn', 'key': 1}, {'link': '/b.chn', 'key': 1}, {'link': '/a.chn', 'key': 2}]
+    _download(tmp_path, links)
+
+    assert _batch(0) == ['https://cafef.vn/a.chn', 'https://cafef.vn/b.chn']
+    assert _batch(2) == ['https://cafef.vn/a.chn']
+    assert fetched == ['/a.chn', '/b.chn', '/a.chn']
+
+
+def test_page_after_a_torn_spool_line_is_kept(stage_dirs):
+    tmp_path, _ = stage_dirs
+    automation.ensure_directories()
+    spool = automation.STAGE3_DIR / '.page_data_0.spool.jsonl'
+    spool.write_text('{"key": 1, "url": "https://cafef.vn/a.chn", "page_data": "<p', encoding='utf-8')
+
+    _download(tmp_path, [{'link': '/a.chn', 'key': 1}, {'link': '/b.chn', 'key': 1}])
+    assert _batch(0) == ['https://cafef.vn/a.chn', 'https://cafef.vn/b.chn']
+    assert not spool.exists()
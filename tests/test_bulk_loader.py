@@ -0,0 +1,55 @@
+"""
+etl_finance_data/bulk_loader.py against its sqlite3 stand-in.
+"""
+import sqlite3
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from etl_finance_data.bulk_loader import build_insert_sql, bulk_insert  # noqa: E402
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE ratio (ticker TEXT NOT NULL, year INTEGER, quarter INTEGER, pe REAL)')
+    yield conn
+    conn.close()
+
+
+def test_rows_are_inserted_in_batches(conn):
+    frame = pd.DataFrame({
+        'ticker': ['ACB'] * 7,
+        'year': [2024] * 7,
+        'quarter': range(1, 8),
+        'pe': [1.5, None, 2.5, 3.0, 3.5, 4.0, 4.5],
+    })
+    stats = bulk_insert(conn, 'ratio', frame, batch_size=3)
+
+    assert stats.rows == 7
+    rows = conn.execute('SELECT quarter, pe FROM ratio ORDER BY quarter').fetchall()
+    assert [quarter for quarter, _ in rows] == list(range(1, 8))
+    assert rows[1] == (2, None)
+    assert isinstance(rows[0][0], int)
+
+
+def test_explicit_columns(conn):
+    frame = pd.DataFrame({'quarter': [1], 'ticker': ['VCB']})
+    bulk_insert(conn, 'ratio', frame, columns=['quarter', 'ticker'])
+    assert conn.execute('SELECT ticker, year, quarter FROM ratio').fetchall() == [('VCB', None, 1)]
+
+
+def test_failed_batch_rolls_back_the_whole_call(conn):
+    frame = pd.DataFrame({'ticker': ['ACB', 'ACB', None], 'year': [2024] * 3, 'quarter': [1, 2, 3], 'pe': [1.0] * 3})
+    with pytest.raises(sqlite3.IntegrityError):
+        bulk_insert(conn, 'ratio', frame, batch_size=2)
+    assert conn.execute('SELECT COUNT(*) FROM ratio').fetchone()[0] == 0
+
+
+def test_on_duplicate_update_clause():
+    sql = build_insert_sql('ratio', 2, 2, columns=['ticker', 'pe'], on_duplicate_update=['pe'])
+    assert sql == (
+        'INSERT INTO ratio (`ticker`, `pe`) VALUES (%s, %s), (%s, %s) '
+        'ON DUPLICATE KEY UPDATE `pe` = VALUES(`pe`)'
+    )
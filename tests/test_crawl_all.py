@@ -0,0 +1,81 @@
+"""
+etl_finance_data/crawl_all.py crawl_task retry policy, without a server.
+"""
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from etl_finance_data.crawl_all import TableState, crawl_task  # noqa: E402
+
+COLUMNS = ['ticker', 'year', 'quarter', 'code']
+
+
+class _Limiter:
+    def __init__(self):
+        self.statuses = []
+
+    def acquire(self):
+        pass
+
+    def record(self, status, latency):
+        self.statuses.append(status)
+
+
+class _Database:
+    """
+    Stand-in for Automation.db.Database whose first `failures` runs fail.
+    """
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.runs = 0
+
+    def run(self, kind, operation, rows=None, idempotent=False):
+        self.runs += 1
+        if self.runs <= self.failures:
+            raise RuntimeError('upsert failed')
+
+
+class _Fetcher:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self, ticker):
+        self.calls += 1
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result.copy()
+
+
+def _frame(columns=4):
+    return pd.DataFrame([['ACB', 2024, 1, 'a'][:columns]])
+
+
+def _crawl(fetch, db, limiter):
+    state = TableState(columns=COLUMNS, watermarks={})
+    return crawl_task('ratio', 'ACB', fetch, state, db, limiter, retries=2, retry_delay=0)
+
+
+def test_column_mismatch_fails_without_retry_or_throttle():
+    fetch, limiter = _Fetcher(_frame(columns=3)), _Limiter()
+    result = _crawl(fetch, _Database(), limiter)
+    assert fetch.calls == 1
+    assert limiter.statuses == [200]
+    assert result.error.startswith('ValueError')
+
+
+def test_only_network_errors_count_as_throttles():
+    fetch, limiter = _Fetcher(ConnectionError('reset'), KeyError('data'), _frame()), _Limiter()
+    result = _crawl(fetch, _Database(), limiter)
+    assert fetch.calls == 3
+    assert limiter.statuses == [None, 200]
+    assert result.error is None and result.rows == 1
+
+
+def test_failed_upsert_is_retried_without_refetching():
+    fetch, db = _Fetcher(_frame()), _Database(failures=1)
+    result = _crawl(fetch, db, _Limiter())
+    assert fetch.calls == 1
+    assert db.runs == 2
+    assert result.error is None and result.keys == {('ACB', 2024, 1)}
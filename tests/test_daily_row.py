@@ -0,0 +1,48 @@
+"""
+Automation/automation.py daily row writes against MySQL/MariaDB (see
+conftest.py): one row per (symbol, day), however often it is written.
+"""
+import pytest
+
+pytest.importorskip('urllib3')
+pytest.importorskip('bs4')
+
+from Automation.automation import update_daily_news, upsert_daily_row  # noqa: E402
+from Automation.db import get_database  # noqa: E402
+
+
+def _record(news_count, close=10.0, hour=9):
+    return {
+        'symbol': 'ACB',
+        'time': f'2024-03-04T{hour:02d}:00:00',
+        'close': close,
+        'year': 2024,
+        'month': 3,
+        'day': 4,
+        'merge_corpus': 'tin' * news_count,
+        'news_count': news_count,
+    }
+
+
+def _rows(db):
+    return db.query('read', 'SELECT symbol, close, news_count FROM fact_price_stock ORDER BY time')[1]
+
+
+def test_daily_row_is_written_once_per_day(mysql_config):
+    db = get_database(mysql_config)
+    db.execute(
+        'create',
+        'CREATE TABLE fact_price_stock (symbol VARCHAR(8), time DATETIME, close DOUBLE, year INT, month INT, '
+        'day INT, merge_corpus TEXT, news_count INT, INDEX idx_symbol_time (symbol, time))',
+    )
+
+    update_daily_news(_record(1), 'fact_price_stock', mysql_config)
+    # identical values: MySQL reports 0 changed rows, which must not insert again
+    update_daily_news(_record(1), 'fact_price_stock', mysql_config)
+    assert _rows(db) == [('ACB', 10.0, 1)]
+
+    update_daily_news(_record(3, close=11.0, hour=14), 'fact_price_stock', mysql_config)
+    assert _rows(db) == [('ACB', 10.0, 3)]
+
+    assert upsert_daily_row(_record(3, close=11.0), 'fact_price_stock', mysql_config, ['close']) == 'updated'
+    assert _rows(db) == [('ACB', 11.0, 3)]
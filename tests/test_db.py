@@ -0,0 +1,157 @@
+"""
+Automation/db.py: retry policy without a server, pool, batching and
+metrics against MySQL/MariaDB (see conftest.py).
+"""
+import time
+
+import pytest
+
+from Automation.db import BatchWriter, Database, is_transient
+
+
+class _Error(Exception):
+    def __init__(self, errno):
+        super().__init__(f'errno {errno}')
+        self.errno = errno
+
+
+class _Connection:
+    def close(self):
+        pass
+
+
+class _FlakyDatabase(Database):
+    """
+    Database without a server whose first `failures` operations fail.
+    """
+    def __init__(self, errno, failures=1):
+        super().__init__({}, retry_delay=0.0)
+        self.errno = errno
+        self.failures = failures
+        self.calls = 0
+
+    def get_connection(self):
+        return _Connection()
+
+    def operation(self, conn):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise _Error(self.errno)
+        return 'ok'
+
+
+def test_lost_connection_is_only_transient_for_idempotent_statements():
+    assert is_transient(_Error(2013), idempotent=True)
+    assert not is_transient(_Error(2013), idempotent=False)
+    # deadlock and lock wait timeout roll the statement back: always safe
+    assert is_transient(_Error(1213), idempotent=False)
+    assert not is_transient(_Error(1062))
+
+
+def test_run_does_not_retry_plain_insert_after_lost_connection():
+    db = _FlakyDatabase(errno=2013)
+    with pytest.raises(_Error):
+        db.run('insert', db.operation)
+    assert db.calls == 1
+
+    db = _FlakyDatabase(errno=2013)
+    assert db.run('upsert', db.operation, idempotent=True) == 'ok'
+    assert db.calls == 2
+    assert db.metrics['upsert'].retries == 1
+
+
+def test_query_and_execute_share_the_pool(mysql_config):
+    db = Database(mysql_config, pool_size=2)
+    db.execute('create', 'CREATE TABLE prices (symbol VARCHAR(8), close DOUBLE)')
+    for close in (1.0, 2.0, 3.0):
+        db.execute('insert', 'INSERT INTO prices (symbol, close) VALUES (%s, %s)', ('ACB', close))
+
+    columns, rows = db.query('read', 'SELECT close FROM prices WHERE symbol = %s ORDER BY close', ('ACB',))
+    assert columns == ['close']
+    assert [row[0] for row in rows] == [1.0, 2.0, 3.0]
+    assert db.metrics['insert'].calls == 3
+    assert db.metrics['read'].rows == 3
+    assert 'insert' in db.report()
+
+
+def test_batch_writer_flushes_by_size_and_interval(mysql_config):
+    db = Database(mysql_config)
+    db.execute('create', 'CREATE TABLE items (id INT PRIMARY KEY)')
+    count = lambda: db.query('count', 'SELECT COUNT(*) FROM items')[1][0][0]
+
+    with BatchWriter(db, 'items', 'INSERT INTO items (id) VALUES (%s)', batch_size=3, flush_interval=0.2) as writer:
+        writer.extend([(1,), (2,)])
+        assert count() == 0
+        time.sleep(0.6)
+        assert count() == 2
+        writer.extend([(3,), (4,), (5,)])
+        assert count() == 5
+        writer.add((6,))
+    assert count() == 6
+    assert writer.written == 6
+
+
+def test_batch_writer_drops_only_the_rejected_rows(mysql_config):
+    db = Database(mysql_config)
+    db.execute('create', 'CREATE TABLE items (id INT PRIMARY KEY, code VARCHAR(3) NOT NULL)')
+
+    with BatchWriter(db, 'items', 'INSERT INTO items (id, code) VALUES (%s, %s)', batch_size=4, flush_interval=0) as writer:
+        writer.extend([(1, 'a'), (2, 'too long'), (3, 'c'), (4, 'd')])
+        writer.extend([(5, 'e'), (6, 'f')])
+
+    ids = [row[0] for row in db.query('read', 'SELECT id FROM items ORDER BY id')[1]]
+    assert ids == [1, 3, 4, 5, 6]
+    assert writer.written == 5
+    assert [row for row, _ in writer.failed] == [(2, 'too long')]
+
+
+def test_sync_tickers_isolates_a_bad_ticker(mysql_config):
+    pd = pytest.importorskip('pandas')
+    from etl_finance_data.incremental_sync import sync_tickers
+
+    db = Database(mysql_config)
+    db.execute(
+        'create',
+        'CREATE TABLE ratio (ticker VARCHAR(8), year INT, quarter INT, code VARCHAR(3), '
+        'PRIMARY KEY (ticker, year, quarter))',
+    )
+    frames = {
+        'ACB': pd.DataFrame([['ACB', 2024, 1, 'a'], ['ACB', 2024, 2, 'b']]),
+        'BAD': pd.DataFrame([['BAD', 2024, 1, 'too long']]),
+        'VCB': pd.DataFrame([['VCB', 2024, 1, 'c']]),
+    }
+    refreshed = []
+
+    written = sync_tickers(
+        'ratio',
+        ['ACB', 'BAD', 'VCB'],
+        lambda ticker: frames[ticker].copy(),
+        refresh=lambda conn, keys: refreshed.append(set(keys)),
+        db=db,
+        flush_interval=0,
+    )
+
+    assert written == {('ACB', 2024, 1), ('ACB', 2024, 2), ('VCB', 2024, 1)}
+    assert refreshed == [written]
+    tickers = [row[0] for row in db.query('read', 'SELECT ticker FROM ratio ORDER BY ticker, quarter')[1]]
+    assert tickers == ['ACB', 'ACB', 'VCB']
+
+
+def test_get_database_applies_options_until_the_pool_is_open(capsys):
+    from Automation.db import get_database
+
+    config = {'host': 'pool-options-test', 'database': 'stock'}
+    db = get_database(config)
+    assert get_database(config, pool_size=8, retries=5) is db
+    assert (db.pool_size, db.retries) == (8, 5)
+    # the pool never shrinks for a later, smaller caller
+    get_database(config, pool_size=2)
+    assert db.pool_size == 8
+
+    db._pool = object()  # opened
+    get_database(config, pool_size=16)
+    assert db.pool_size == 8
+    assert 'ignoring {\'pool_size\': 16}' in capsys.readouterr().out
+
+    with pytest.raises(TypeError):
+        get_database(config, pool=4)
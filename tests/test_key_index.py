@@ -0,0 +1,37 @@
+"""
+Automation/key_index.py: only the newest keys go stale.
+"""
+from datetime import datetime, timedelta
+
+from Automation.key_index import KeyIndex
+
+
+def _entries(day):
+    return [{'link': '/a.chn', 'published_at': f'{day}T09:00:00'}]
+
+
+def test_only_recent_keys_go_stale(tmp_path):
+    long_ago = datetime.utcnow() - timedelta(days=30)
+    with KeyIndex(tmp_path / 'index.sqlite', max_age_hours=12.0, recent_keys=5) as index:
+        index.record(3, _entries('2024-03-04'), indexed_at=long_ago)
+        index.record(400, _entries('2023-01-02'), indexed_at=long_ago)
+        index.record(4, _entries('2024-03-04'))
+
+        assert index.get(3) is None
+        assert index.get(3, include_stale=True) is not None
+        assert index.get(4) is not None
+        assert index.get(400).min_published == '2023-01-02T09:00:00'
+
+
+def test_archive_is_not_probed_again(tmp_path):
+    probed = []
+
+    def probe(key):
+        probed.append(key)
+        return _entries('2024-03-04')
+
+    with KeyIndex(tmp_path / 'index.sqlite', recent_keys=5) as index:
+        index.record(400, _entries('2023-01-02'), indexed_at=datetime.utcnow() - timedelta(days=30))
+        assert index.dates(400, probe).items == 1
+        assert index.dates(2, probe).items == 1
+    assert probed == [2]
@@ -0,0 +1,65 @@
+"""
+price_store.py with a FrameSource: incremental refetch from the last cached
+day and replacement of the touched symbol/year partitions.
+"""
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('pyarrow')
+
+from price_store import FrameSource, PriceStore  # noqa: E402
+
+
+class _RecordingSource(FrameSource):
+    def __init__(self, frames):
+        super().__init__(frames)
+        self.requests = []
+
+    def history(self, symbol, start, end):
+        self.requests.append((symbol, start, end))
+        return super().history(symbol, start, end)
+
+
+def _prices(days, close):
+    return pd.DataFrame({
+        'time': pd.to_datetime(days),
+        'open': close, 'high': close, 'low': close, 'close': close,
+        'volume': 100,
+    })
+
+
+def _partition(root, year):
+    return pd.read_parquet(root / 'symbol=ACB' / f'year={year}' / 'data.parquet')
+
+
+def test_update_refetches_from_the_last_cached_day(tmp_path):
+    source = _RecordingSource({'ACB': _prices(['2022-12-30', '2023-12-28', '2023-12-29'], 1.0)})
+    store = PriceStore(root=tmp_path, source=source, start_date='2022-01-01')
+    assert len(store.load('ACB', end='2023-12-29')) == 3
+    untouched = (tmp_path / 'symbol=ACB' / 'year=2022' / 'data.parquet').stat().st_mtime_ns
+
+    # the 29th was an intraday snapshot; the provider now has its close and the next days
+    source.frames['ACB'] = _prices(['2022-12-30', '2023-12-28', '2023-12-29', '2024-01-02', '2024-01-03'], 2.0)
+    frame = store.load('ACB', end='2024-01-03')
+
+    assert source.requests == [('ACB', '2022-01-01', '2023-12-29'), ('ACB', '2023-12-29', '2024-01-03')]
+    assert frame['time'].dt.strftime('%Y-%m-%d').tolist() == [
+        '2022-12-30', '2023-12-28', '2023-12-29', '2024-01-02', '2024-01-03',
+    ]
+    assert frame['close'].tolist() == [1.0, 1.0, 2.0, 2.0, 2.0]
+
+    # 2023 is rewritten with the corrected day, 2024 added, 2022 left alone
+    assert _partition(tmp_path, 2023)['close'].tolist() == [1.0, 2.0]
+    assert len(_partition(tmp_path, 2024)) == 2
+    assert (tmp_path / 'symbol=ACB' / 'year=2022' / 'data.parquet').stat().st_mtime_ns == untouched
+
+
+def test_update_refetches_when_the_cache_ends_on_end(tmp_path):
+    source = _RecordingSource({'ACB': _prices(['2024-01-02', '2024-01-03'], 1.0)})
+    store = PriceStore(root=tmp_path, source=source, start_date='2024-01-01')
+    store.load('ACB', end='2024-01-03')
+    store.load('ACB', end='2024-01-03')
+    assert source.requests[-1] == ('ACB', '2024-01-03', '2024-01-03')
+
+    store.load('ACB', end='2024-01-02')
+    assert len(source.requests) == 2
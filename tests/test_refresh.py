@@ -0,0 +1,89 @@
+"""
+etl_finance_data/refresh.py against MySQL/MariaDB (see conftest.py): a
+refresh for a subset of keys rebuilds exactly those Stage/Fact rows.
+"""
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('pandas')
+
+from etl_finance_data.refresh import (  # noqa: E402
+    FINANCIAL_STATEMENT_INDEXES, STAGE_SELECT, refresh_financial_statement,
+)
+
+RAW_TABLES_SQL = Path(__file__).resolve().parents[1] / 'etl_finance_data' / 'Create_dwh' / 'create_raw_table.sql'
+KEYS = [('ACB', 2024, 1), ('ACB', 2024, 2), ('VCB', 2024, 1), ('VCB', 2024, 2)]
+# one metric per raw table
+SEEDED = {'balance_sheet': 'asset', 'income': 'revenue', 'cash_flow': 'freeCashFlow'}
+
+
+def _create_schema(conn):
+    cursor = conn.cursor()
+    for statement in RAW_TABLES_SQL.read_text(encoding='utf-8').split(';'):
+        lines = [line for line in statement.splitlines() if not line.strip().startswith('--')]
+        sql = '\n'.join(lines).strip()
+        if any(sql.startswith(f'CREATE TABLE {table} ') for table in SEEDED):
+            cursor.execute(sql)
+
+    # same shape as the production tables: Stage is the refresh join, Fact its unpivot
+    cursor.execute('CREATE TEMPORARY TABLE refresh_keys (ticker VARCHAR(10), year INT, quarter INT)')
+    cursor.execute('CREATE TABLE Stage_FinancialStatement AS ' + STAGE_SELECT)
+    cursor.execute(
+        'CREATE TABLE Fact_FinancialStatement (ticker VARCHAR(10), year INT, quarter INT, '
+        'financial_index VARCHAR(64), value DECIMAL(20, 2), PRIMARY KEY (ticker, year, quarter, financial_index))'
+    )
+    conn.commit()
+    cursor.close()
+
+
+def _seed(conn, value):
+    cursor = conn.cursor()
+    for table, metric in SEEDED.items():
+        cursor.executemany(
+            f'INSERT INTO {table} (ticker, year, quarter, {metric}) VALUES (%s, %s, %s, %s) '
+            f'ON DUPLICATE KEY UPDATE {metric} = VALUES({metric})',
+            [key + (value,) for key in KEYS],
+        )
+    conn.commit()
+    cursor.close()
+
+
+def _snapshot(conn):
+    cursor = conn.cursor()
+    cursor.execute('SELECT ticker, year, quarter, asset, revenue, freeCashFlow FROM Stage_FinancialStatement')
+    stage = {tuple(row[:3]): tuple(float(value) for value in row[3:]) for row in cursor.fetchall()}
+    cursor.execute('SELECT ticker, year, quarter, financial_index, value FROM Fact_FinancialStatement')
+    fact = {tuple(row[:4]): row[4] for row in cursor.fetchall()}
+    cursor.close()
+    return stage, fact
+
+
+def test_refresh_rebuilds_only_the_given_keys(mysql_conn):
+    _create_schema(mysql_conn)
+    _seed(mysql_conn, 1)
+    refresh_financial_statement(mysql_conn, KEYS)
+    stage_before, fact_before = _snapshot(mysql_conn)
+    assert set(stage_before) == set(KEYS)
+    assert len(fact_before) == len(KEYS) * len(FINANCIAL_STATEMENT_INDEXES)
+
+    _seed(mysql_conn, 2)
+    subset = {('ACB', 2024, 2), ('VCB', 2024, 1)}
+    refresh_financial_statement(mysql_conn, subset)
+    stage_after, fact_after = _snapshot(mysql_conn)
+
+    assert set(stage_after) == set(KEYS)
+    assert set(fact_after) == set(fact_before)
+    for key in KEYS:
+        assert stage_after[key] == ((2.0, 2.0, 2.0) if key in subset else (1.0, 1.0, 1.0))
+
+    changed = {fact_key for fact_key, value in fact_after.items() if value != fact_before[fact_key]}
+    expected = {key + (metric,) for key in subset for metric in SEEDED.values()}
+    assert changed == expected
+
+
+def test_refresh_without_keys_is_a_no_op(mysql_conn):
+    _create_schema(mysql_conn)
+    _seed(mysql_conn, 1)
+    refresh_financial_statement(mysql_conn, [])
+    assert _snapshot(mysql_conn) == ({}, {})
@@ -0,0 +1,69 @@
+"""
+stage4.py PostProcessing with a stub price store: duplicates listed by
+dedup.py are left out of the aligned corpus, and both align paths agree.
+"""
+import json
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('bs4')
+pytest.importorskip('tqdm')
+
+from stage4 import PostProcessing  # noqa: E402
+
+
+class _PriceStore:
+    def load(self, symbol, start=None, end=None):
+        return pd.DataFrame({
+            'time': pd.to_datetime(['2024-03-04', '2024-03-05']),
+            'open': [1.0, 1.0], 'high': [1.0, 1.0], 'low': [1.0, 1.0], 'close': [1.0, 1.0],
+            'volume': [100, 100],
+        })
+
+    def load_many(self, symbols, **load_kwargs):
+        return {symbol: self.load(symbol) for symbol in symbols}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    articles = [
+        {'url': 'https://cafef.vn/a.chn', 'year': 2024, 'month': 3, 'day': 4, 'corpus': 'original'},
+        {'url': 'https://cafef.vn/b.chn', 'year': 2024, 'month': 3, 'day': 4, 'corpus': 'copy'},
+    ]
+    (tmp_path / 'page_data_0.json').write_text(json.dumps(articles), encoding='utf-8')
+    duplicates_path = tmp_path / 'dups.json'
+    duplicates_path.write_text(json.dumps([{'url': 'https://cafef.vn/b.chn'}]), encoding='utf-8')
+    return PostProcessing(
+        price_store=_PriceStore(), data_dir=str(tmp_path), duplicates_path=str(duplicates_path)
+    )
+
+
+def test_align_drops_listed_duplicates(engine):
+    aligned = engine.align()
+    assert aligned['merge_corpus'].tolist()[0] == 'original'
+
+
+def test_align_many_drops_listed_duplicates(engine):
+    aligned = engine.align_many(['ACB', 'VCB'])
+    assert aligned.loc[aligned['day'] == 4, 'merge_corpus'].tolist() == ['original', 'original']
+
+
+def test_align_and_align_many_agree_on_days_without_news(engine):
+    single = engine.align()
+    many = engine.align_many(['ACB'])
+    for aligned in (single, many):
+        assert aligned['merge_corpus'].iloc[0] == 'original'
+        assert aligned['merge_corpus'].isna().tolist() == [False, True]
+
+
+def test_write_dataset_keeps_rows_without_volume(engine, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    from stage4 import write_dataset
+
+    aligned = engine.align_many(['ACB'])
+    aligned['volume'] = [100, None]
+    write_dataset(aligned, str(tmp_path / 'dataset'))
+
+    volumes = pq.read_table(str(tmp_path / 'dataset')).column('volume').to_pylist()
+    assert sorted(volumes, key=lambda value: value is None) == [100, None]
@@ -0,0 +1,75 @@
+"""
+Automation/automation.py run_watch with stubbed fetchers: an article is
+marked seen only once it is saved, and one failing article or database
+write does not lose the rest of the poll.
+"""
+import json
+from datetime import date
+
+import pytest
+
+pytest.importorskip('urllib3')
+pytest.importorskip('bs4')
+pytest.importorskip('tqdm')
+
+import urllib3  # noqa: E402
+
+import stage4  # noqa: E402
+from Automation import automation  # noqa: E402
+from Automation.ledger import JobLedger  # noqa: E402
+
+TODAY = date.today()
+
+
+@pytest.fixture
+def watch(tmp_path, monkeypatch):
+    monkeypatch.setattr(automation, 'DAILY_DIR', tmp_path / 'daily')
+    for name in ('STAGE1_DIR', 'STAGE2_DIR', 'STAGE3_DIR', 'STAGE4_DIR'):
+        monkeypatch.setattr(automation, name, tmp_path / name.lower())
+    monkeypatch.setattr(automation, 'LEDGER_PATH', tmp_path / 'ledger.sqlite')
+
+    entries = [{'link': f'/{name}.chn', 'key': 1, 'published_at': None} for name in ('good', 'slow', 'other')]
+    monkeypatch.setattr(automation, 'fetch_timeline_page', lambda key, compact: {'key': key} if key == 1 else None)
+    monkeypatch.setattr(automation, 'process_each_file', lambda response, relevant_only=False: entries)
+
+    def fetch(url, key, raise_for_status=False):
+        if url == '/slow.chn':
+            raise urllib3.exceptions.ReadTimeoutError(None, url, 'read timed out')
+        return {'key': key, 'url': 'https://cafef.vn' + url, 'page_data': url}
+
+    def pre_processing(page_data, url):
+        return {'url': url, 'day': TODAY.day, 'month': TODAY.month, 'year': TODAY.year, 'corpus': page_data}
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('database is down')
+
+    monkeypatch.setattr(automation, 'fetch_article_page', fetch)
+    monkeypatch.setattr(stage4, 'pre_processing_page_data', pre_processing)
+    monkeypatch.setattr(automation, 'fetch_daily_price', lambda symbol: None)
+    monkeypatch.setattr(automation, 'compose_daily_record', lambda symbol, price_row, news_events: {'symbol': symbol})
+    monkeypatch.setattr(automation, 'update_daily_news', fail)
+    return tmp_path
+
+
+def test_poll_keeps_the_fetched_articles_when_one_fails(watch):
+    automation.run_watch(iterations=1, db_config={'host': 'db'})
+
+    with (watch / 'daily' / f'{TODAY.isoformat()}.json').open(encoding='utf-8') as fp:
+        saved = [article['url'] for article in json.load(fp)['news_events']]
+    assert saved == ['https://cafef.vn/good.chn', 'https://cafef.vn/other.chn']
+
+    with JobLedger(watch / 'ledger.sqlite') as ledger:
+        assert ledger.items(automation.WATCH_JOB, 'fetched') == {'/good.chn', '/other.chn'}
+        assert ledger.should_fetch(automation.WATCH_JOB, '/slow.chn')
+
+
+def test_links_are_not_marked_when_saving_fails(watch, monkeypatch):
+    def crash(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(automation, 'append_daily_news', crash)
+    with pytest.raises(OSError):
+        automation.run_watch(iterations=1)
+
+    with JobLedger(watch / 'ledger.sqlite') as ledger:
+        assert ledger.items(automation.WATCH_JOB, 'fetched') == set()
@@ -0,0 +1,89 @@
+"""
+Automation/work_queue.py against a temporary SQLite queue file.
+"""
+import json
+import threading
+import time
+
+import pytest
+
+from Automation import work_queue
+from Automation.work_queue import ARTICLE_KIND, DEAD, TIMELINE_KIND, WorkQueue
+
+
+def test_two_workers_never_lease_the_same_item(tmp_path):
+    path = tmp_path / 'queue.sqlite'
+    with WorkQueue(path) as queue:
+        queue.enqueue(TIMELINE_KIND, ((key, {'key': key}) for key in range(200)))
+
+    leased = {'a': [], 'b': []}
+
+    def worker(owner):
+        with WorkQueue(path) as queue:
+            while True:
+                leases = queue.lease(owner, limit=3)
+                if not leases:
+                    return
+                leased[owner].extend(lease.item for lease in leases)
+
+    threads = [threading.Thread(target=worker, args=(owner,)) for owner in leased]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    items = leased['a'] + leased['b']
+    assert len(items) == len(set(items)) == 200
+
+
+def test_expired_lease_is_leased_again_then_dead_lettered(tmp_path):
+    with WorkQueue(tmp_path / 'queue.sqlite', visibility_timeout=0.05, max_attempts=2) as queue:
+        queue.enqueue(TIMELINE_KIND, [(1, {'key': 1})])
+
+        first = queue.lease('a')[0]
+        assert queue.lease('b') == []
+        time.sleep(0.1)
+
+        second = queue.lease('b')[0]
+        assert (second.item, second.attempts) == ('1', 2)
+        # the first owner lost its lease
+        assert not queue.ack(first, 'a')
+        assert not queue.extend(first, 'a')
+
+        time.sleep(0.1)
+        assert queue.lease('a') == []
+        assert queue.stats() == {TIMELINE_KIND: {DEAD: 1}}
+
+
+def test_nack_on_429_pauses_the_shared_bucket(tmp_path, monkeypatch):
+    pytest.importorskip('urllib3')
+    pytest.importorskip('bs4')
+    from stage1 import FetchError
+
+    def throttled(lease, queue, relevant_only):
+        raise FetchError(status=429, url=lease.item, retry_after='30')
+
+    monkeypatch.setattr(work_queue, '_process', throttled)
+    with WorkQueue(tmp_path / 'queue.sqlite', visibility_timeout=0.4) as queue:
+        queue.enqueue(ARTICLE_KIND, [('/a.chn', {'link': '/a.chn', 'key': 1})])
+        counts = work_queue.run_worker(queue, 'a', rate=100.0, idle_exit=0.2)
+
+        assert counts['retried'] == 1
+        assert queue.stats() == {ARTICLE_KIND: {'ready': 1}}
+        assert queue.acquire(rate=100.0) > 25
+
+
+def test_collect_does_not_overwrite_a_batch(tmp_path, monkeypatch):
+    pytest.importorskip('urllib3')
+    pytest.importorskip('bs4')
+    from Automation import automation
+
+    monkeypatch.setattr(automation, 'STAGE3_DIR', tmp_path)
+    for index in (0, 2):  # batch 1 was deleted
+        (tmp_path / f'page_data_queue_{index}.json').write_text(json.dumps([index]), encoding='utf-8')
+    (tmp_path / 'queue').mkdir()
+    (tmp_path / 'queue' / 'a.json').write_text(json.dumps({'url': 'a'}), encoding='utf-8')
+
+    assert work_queue.collect() == [tmp_path / 'page_data_queue_3.json']
+    assert json.loads((tmp_path / 'page_data_queue_2.json').read_text(encoding='utf-8')) == [2]
+    assert json.loads((tmp_path / 'page_data_queue_3.json').read_text(encoding='utf-8')) == [{'url': 'a'}]